@@ -0,0 +1,36 @@
+import timeit
+from insulin_pump_simulator.cgm import CGM
+from insulin_pump_simulator.patient import Patient
+from insulin_pump_simulator.pdm import PDM
+
+
+def legacy_measure_glucose(cgm: CGM, patient: Patient):
+    # Ancien chemin : un PDM complet (pompes, contrôleur, CGM) construit à chaque mesure
+    pdm = PDM(target_glucose=120)
+    cgm.current_glucose = patient.glucose_level
+    if cgm.current_glucose > cgm.glucose_critical_limit:
+        pdm.add_alarm("High glucose alert")
+    return cgm.current_glucose, pdm.pump.last_message, pdm.pump.alarms
+
+
+def per_call(statement, number: int) -> float:
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number
+
+
+def main():
+    patient = Patient(initial_glucose=300)
+    sink = []
+    cgm = CGM(alert_sink=sink.append)
+    patients = [Patient(initial_glucose=100 + i % 200) for i in range(10_000)]
+
+    legacy = per_call(lambda: legacy_measure_glucose(cgm, patient), 2_000)
+    current = per_call(lambda: cgm.measure_glucose(patient), 200_000)
+    batch = per_call(lambda: cgm.measure_many(patients), 20) / len(patients)
+
+    print(f"PDM par mesure      : {legacy * 1e6:10.3f} µs/mesure")
+    print(f"measure_glucose     : {current * 1e6:10.3f} µs/mesure  (x{legacy / current:,.0f})")
+    print(f"measure_many (10k)  : {batch * 1e6:10.3f} µs/mesure  (x{legacy / batch:,.0f})")
+
+
+if __name__ == "__main__":
+    main()
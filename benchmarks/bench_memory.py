@@ -0,0 +1,33 @@
+import tracemalloc
+from insulin_pump_simulator.insulin_pump import InsulinPump
+from insulin_pump_simulator.patient import Patient
+from insulin_pump_simulator.registry import load_config
+
+
+def bytes_per_instance(factory, count: int = 10_000) -> float:
+    # Mémoire allouée par instance (objet et tout ce qu'il possède en propre), mesurée par tracemalloc
+    load_config()
+    tracemalloc.start()
+    try:
+        instances = [factory() for _ in range(count)]
+        allocated, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del instances
+    return allocated / count
+
+
+def pump_with_modes() -> InsulinPump:
+    # Pompe dont les modes ont été consultés : copie des modes propre à l'instance
+    pump = InsulinPump()
+    pump.config.modes
+    return pump
+
+
+def main():
+    for name, factory in (("Patient", Patient), ("InsulinPump", InsulinPump), ("InsulinPump + modes", pump_with_modes)):
+        print(f"{name:20s} : {bytes_per_instance(factory):8.0f} octets/instance")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import argparse
+import json
+import platform
+import sys
+import timeit
+from pathlib import Path
+from typing import Callable
+import numpy as np
+from insulin_pump_simulator.cgm import CGM
+from insulin_pump_simulator.cohort import CohortSimulator
+from insulin_pump_simulator.config import PumpConfig
+from insulin_pump_simulator.controller import ClosedLoopController
+from insulin_pump_simulator.insulin_pump import InsulinPump
+from insulin_pump_simulator.patient import Patient
+from insulin_pump_simulator.pdm import PDM
+from insulin_pump_simulator.simulator import Simulator
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+DEFAULT_THRESHOLD = 0.25
+REPEAT = 5
+
+BENCHMARKS: dict[str, Callable[[bool], tuple[Callable[[], object], int]]] = {}
+
+
+def benchmark(name: str):
+    # Chaque fonction enregistrée prépare son état et renvoie (appel mesuré, nombre d'appels par répétition)
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+@benchmark("pdm.construct")
+def bench_pdm_construct(quick: bool):
+    return lambda: PDM(target_glucose=120), 20 if quick else 500
+
+
+@benchmark("cgm.measure_glucose")
+def bench_measure_glucose(quick: bool):
+    cgm = CGM(alert_sink=lambda alarm: None)
+    patient = Patient(initial_glucose=260)
+    return lambda: cgm.measure_glucose(patient), 1_000 if quick else 200_000
+
+
+@benchmark("controller.control_loop")
+def bench_control_loop(quick: bool):
+    # Glycémie dans la cible : aucune alarme, la liste d'alarmes de la pompe ne grossit pas
+    controller = ClosedLoopController(target_glucose=120)
+    patient = Patient(initial_glucose=120)
+    return lambda: controller.control_loop(patient), 1_000 if quick else 100_000
+
+
+@benchmark("pump.meal_bolus")
+def bench_meal_bolus(quick: bool):
+    pump = InsulinPump()
+    return lambda: pump.calculate_meal_bolus(60), 1_000 if quick else 200_000
+
+
+@benchmark("pump.correction_bolus")
+def bench_correction_bolus(quick: bool):
+    pump = InsulinPump()
+    return lambda: pump.calculate_correction_bolus(220, 120, 1.5), 1_000 if quick else 200_000
+
+
+@benchmark("pump.correction_boluses[10k]")
+def bench_correction_boluses(quick: bool):
+    pump = InsulinPump()
+    glucose = np.linspace(40, 400, 10_000)
+    return lambda: pump.calculate_correction_boluses(glucose, 120, 1.5), 10 if quick else 200
+
+
+def simulator_benchmark(hours: int, patients: int):
+    def setup(quick: bool):
+        def run():
+            for _ in range(patients):
+                Simulator(hours).run_simulation()
+        return run, 1
+    return setup
+
+
+def cohort_benchmark(hours: int, patients: int):
+    def setup(quick: bool):
+        cohort = [Patient() for _ in range(patients)]
+        configs = [PumpConfig() for _ in range(patients)]
+        return lambda: CohortSimulator.from_patients(cohort, configs).run(hours * 60, record=False), 1
+    return setup
+
+
+for _hours in (1, 6, 24):
+    benchmark(f"simulator.run[{_hours}h,1]")(simulator_benchmark(_hours, 1))
+benchmark("simulator.run[24h,10]")(simulator_benchmark(24, 10))
+for _patients in (1_000, 10_000):
+    benchmark(f"cohort.run[24h,{_patients}]")(cohort_benchmark(24, _patients))
+
+
+def run_benchmarks(names: list[str] = None, quick: bool = False, repeat: int = REPEAT) -> dict[str, float]:
+    # Temps par appel (secondes) : minimum des répétitions, le moins sensible au bruit de la machine
+    results = {}
+    for name in names if names is not None else BENCHMARKS:
+        if name not in BENCHMARKS:
+            raise ValueError(f"Benchmark inconnu : {name}")
+        call, number = BENCHMARKS[name](quick)
+        results[name] = min(timeit.repeat(call, number=number, repeat=1 if quick else repeat)) / number
+    return results
+
+
+def compare(results: dict[str, float], baseline: dict[str, float], threshold: float = DEFAULT_THRESHOLD) -> dict[str, float]:
+    # Benchmarks plus lents que la référence de plus de `threshold` (0.25 = +25 %) : nom -> rapport de temps
+    regressions = {}
+    for name, seconds in results.items():
+        reference = baseline.get(name)
+        if reference and seconds / reference > 1 + threshold:
+            regressions[name] = seconds / reference
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH) -> dict[str, float]:
+    with open(path, "r") as file:
+        return json.load(file)["results"]
+
+
+def save_baseline(results: dict[str, float], path=BASELINE_PATH) -> None:
+    data = {"python": platform.python_version(), "machine": platform.machine(), "results": results}
+    with open(path, "w") as file:
+        json.dump(data, file, indent=2)
+        file.write("\n")
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks des chemins critiques du simulateur")
+    parser.add_argument("names", nargs="*", help="benchmarks à exécuter (tous par défaut)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="fichier JSON de référence")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="ralentissement toléré (0.25 = +25 %%)")
+    parser.add_argument("--save", action="store_true", help="enregistre les résultats comme nouvelle référence")
+    parser.add_argument("--quick", action="store_true", help="peu d'itérations, pour vérifier que tout s'exécute")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.names or None, quick=args.quick)
+    baseline = {} if args.save or not Path(args.baseline).exists() else load_baseline(args.baseline)
+    for name, seconds in results.items():
+        reference = baseline.get(name)
+        ratio = f"  (x{seconds / reference:.2f})" if reference else ""
+        print(f"{name:28s} {seconds * 1e6:14.3f} µs{ratio}")
+
+    if args.save:
+        save_baseline(results, args.baseline)
+        print(f"Référence enregistrée : {args.baseline}")
+        return 0
+    regressions = compare(results, baseline, args.threshold)
+    for name, ratio in regressions.items():
+        print(f"Régression : {name} x{ratio:.2f} (seuil x{1 + args.threshold:.2f})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Callable, Iterator, NamedTuple
+
+# Capacité du journal circulaire des alarmes levées
+ALARM_CAPACITY = 256
+# Une alarme active reste active tant qu'elle est relevée à moins de HYSTERESIS_MINUTES d'intervalle ;
+# elle se lève de nouveau au plus une fois par RATE_LIMIT_MINUTES après s'être éteinte. Une occurrence limitée
+# reste inactive : la première occurrence après la fin du délai est levée
+HYSTERESIS_MINUTES = 30
+RATE_LIMIT_MINUTES = 60
+
+
+class AlarmCode(IntEnum):
+    HIGH_GLUCOSE = 0
+    LOW_GLUCOSE = 1
+    LOW_BATTERY = 2
+    # Tout autre message : dédoublonné par texte
+    OTHER = 3
+
+
+ALARM_MESSAGES = {
+    AlarmCode.HIGH_GLUCOSE: "High glucose alert",
+    AlarmCode.LOW_GLUCOSE: "Low glucose alert",
+    AlarmCode.LOW_BATTERY: "Low battery alert",
+}
+_CODES = {message: code for code, message in ALARM_MESSAGES.items()}
+
+
+def alarm_code(alarm) -> AlarmCode:
+    if isinstance(alarm, AlarmCode):
+        return alarm
+    return _CODES.get(alarm, AlarmCode.OTHER)
+
+
+class Alarm(NamedTuple):
+    time: float
+    code: AlarmCode
+    message: str
+
+
+def _wall_clock_minutes() -> float:
+    return time.monotonic() / 60
+
+
+class AlarmManager:
+    # Alarmes d'une pompe. Une alarme relevée alors qu'elle est déjà active (même condition, tick suivant) est
+    # comptée comme supprimée sans rien allouer ; seules les alarmes effectivement levées entrent dans le journal
+    # circulaire de `capacity` entrées et sont notifiées aux abonnés. La mémoire reste constante quelle que soit
+    # la durée de la simulation. Le temps est en minutes, donné par `clock` (minutes simulées en simulation).
+    # Itérer ou comparer à une liste donne les messages du journal, comme l'ancienne liste `alarms`.
+    # Les messages libres (AlarmCode.OTHER) sont dédoublonnés par texte ; seuls les `capacity` derniers
+    # textes sont suivis (les plus anciens sont oubliés en premier).
+    # Journal, états et compteurs ne sont alloués qu'à la première alarme : une pompe sans alarme reste légère.
+    __slots__ = ("capacity", "hysteresis", "rate_limit", "clock", "_log", "_states", "_counts", "_subscribers")
+
+    def __init__(self, capacity: int = ALARM_CAPACITY, hysteresis: float = HYSTERESIS_MINUTES,
+                 rate_limit: float = RATE_LIMIT_MINUTES, clock: Callable[[], float] = None):
+        self.capacity = capacity
+        self.hysteresis = hysteresis
+        self.rate_limit = rate_limit
+        self.clock = clock if clock is not None else _wall_clock_minutes
+        self._log: deque[Alarm] | None = None
+        # Clé (code, ou message pour AlarmCode.OTHER) -> [active, dernière occurrence, dernière levée]
+        self._states: dict | None = None
+        # Alarmes levées puis supprimées, par code
+        self._counts: list[int] | None = None
+        self._subscribers: list[tuple[Callable[[Alarm], None], frozenset | None]] | None = None
+
+    def _allocate(self) -> None:
+        self._log = deque(maxlen=self.capacity)
+        self._states = {}
+        self._counts = [0] * (2 * len(AlarmCode))
+
+    def raise_alarm(self, alarm, now: float = None) -> bool:
+        # True si l'alarme est levée, False si elle est supprimée (déjà active ou limitée en fréquence)
+        code = alarm_code(alarm)
+        message = ALARM_MESSAGES[code] if code is not AlarmCode.OTHER else alarm
+        key = code if code is not AlarmCode.OTHER else message
+        if now is None:
+            now = self.clock()
+        if self._states is None:
+            self._allocate()
+        states = self._states
+        if code is AlarmCode.OTHER:
+            # Texte récemment vu remis en fin d'ordre d'insertion : le premier texte rencontré est le plus ancien
+            state = states.pop(key, None)
+            if state is not None:
+                states[key] = state
+        else:
+            state = states.get(key)
+        if state is None:
+            states[key] = [True, now, now]
+            if code is AlarmCode.OTHER and len(states) > self.capacity + len(AlarmCode):
+                del states[next(name for name in states if isinstance(name, str))]
+        else:
+            active, last_seen, last_raised = state
+            state[1] = now
+            if active and now - last_seen <= self.hysteresis:
+                self._counts[len(AlarmCode) + code] += 1
+                return False
+            if now - last_raised < self.rate_limit:
+                # Occurrence limitée : l'alarme reste inactive pour être levée après le délai
+                state[0] = False
+                self._counts[len(AlarmCode) + code] += 1
+                return False
+            state[0] = True
+            state[2] = now
+        self._counts[code] += 1
+        entry = Alarm(now, code, message)
+        self._log.append(entry)
+        if self._subscribers:
+            for callback, codes in self._subscribers:
+                if codes is None or code in codes:
+                    callback(entry)
+        return True
+
+    def _state(self, alarm) -> list | None:
+        if self._states is None:
+            return None
+        code = alarm_code(alarm)
+        return self._states.get(code if code is not AlarmCode.OTHER else alarm)
+
+    def clear(self, alarm) -> None:
+        # Condition résolue (ou alarme acquittée) : la prochaine occurrence peut être levée, sous réserve du
+        # délai RATE_LIMIT_MINUTES
+        state = self._state(alarm)
+        if state is not None:
+            state[0] = False
+
+    def is_active(self, alarm, now: float = None) -> bool:
+        state = self._state(alarm)
+        if state is None or not state[0]:
+            return False
+        return (self.clock() if now is None else now) - state[1] <= self.hysteresis
+
+    def active(self, now: float = None) -> list:
+        if self._states is None:
+            return []
+        now = self.clock() if now is None else now
+        return [key for key, (active, last_seen, _) in self._states.items() if active and now - last_seen <= self.hysteresis]
+
+    def subscribe(self, callback: Callable[[Alarm], None], codes=None) -> Callable[[], None]:
+        # `callback(alarm)` à chaque alarme levée (codes : filtre optionnel) ; renvoie la fonction de désabonnement
+        subscriber = (callback, None if codes is None else frozenset(alarm_code(code) for code in codes))
+        if self._subscribers is None:
+            self._subscribers = []
+        self._subscribers.append(subscriber)
+        return lambda: self._subscribers.remove(subscriber)
+
+    @property
+    def raised(self) -> dict[AlarmCode, int]:
+        counts = self._counts or [0] * (2 * len(AlarmCode))
+        return {code: counts[code] for code in AlarmCode}
+
+    @property
+    def suppressed(self) -> dict[AlarmCode, int]:
+        counts = self._counts or [0] * (2 * len(AlarmCode))
+        return {code: counts[len(AlarmCode) + code] for code in AlarmCode}
+
+    @property
+    def suppressed_total(self) -> int:
+        return sum(self._counts[len(AlarmCode):]) if self._counts else 0
+
+    def entries(self) -> list[Alarm]:
+        return list(self._log or ())
+
+    def __iter__(self) -> Iterator[str]:
+        return (entry.message for entry in self._log or ())
+
+    def __len__(self) -> int:
+        return len(self._log) if self._log is not None else 0
+
+    def __getitem__(self, index: int) -> str:
+        if self._log is None:
+            raise IndexError("Aucune alarme")
+        return self._log[index].message
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (AlarmManager, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"AlarmManager({list(self)})"
+
+    def state(self) -> tuple | None:
+        # État sérialisable (sans l'horloge ni les abonnés), pour les snapshots
+        if self._states is None:
+            return None
+        return tuple(self._log), tuple((key, tuple(value)) for key, value in self._states.items()), tuple(self._counts)
+
+    def set_state(self, state: tuple | None) -> None:
+        if state is None:
+            self._log = self._states = self._counts = None
+            return
+        log, states, counts = state
+        self._log = deque(log, maxlen=self.capacity)
+        self._states = {key: list(value) for key, value in states}
+        self._counts = list(counts)
@@ -0,0 +1,52 @@
+from functools import lru_cache
+import numpy as np
+
+# Grilles courantes pour les tables de doses : glucides en g, glycémie en mg/dL
+DEFAULT_CARB_GRID = tuple(range(0, 151, 5))
+DEFAULT_GLUCOSE_GRID = tuple(range(40, 401, 10))
+TABLE_CACHE_SIZE = 256
+
+
+def round2(values: np.ndarray) -> np.ndarray:
+    # np.round arrondit x * 100 au pair le plus proche, alors que round() travaille sur la valeur
+    # décimale exacte du float : on reprend round() pour les rares valeurs proches d'un demi-centième
+    rounded = np.round(values, 2)
+    scaled = np.asarray(values) * 100
+    ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if ties.any():
+        rounded = np.array(rounded, dtype=float)
+        rounded[ties] = [round(value, 2) for value in np.asarray(values)[ties].tolist()]
+    return rounded
+
+
+def meal_boluses(carbs, insulin_to_carb_ratio, max_bolus=None) -> np.ndarray:
+    # InsulinPump.calculate_meal_bolus pour des tableaux (diffusés entre eux) ; avec max_bolus, la dose est
+    # plafonnée comme dans deliver_alim_bolus
+    bolus = round2(np.asarray(carbs, dtype=float) / insulin_to_carb_ratio)
+    if max_bolus is not None:
+        bolus = np.minimum(bolus, max_bolus)
+    return bolus
+
+
+def correction_boluses(current_glucose, target_glucose, insulin_sensitivity_factor, insulin_on_board=None, max_bolus=None) -> np.ndarray:
+    # InsulinPump.calculate_correction_bolus pour des tableaux ; l'insuline active n'est déduite que là où elle
+    # est non nulle, exactement comme le calcul scalaire
+    correction = (np.asarray(current_glucose, dtype=float) - target_glucose) / insulin_sensitivity_factor
+    if insulin_on_board is not None:
+        correction = np.where(np.asarray(insulin_on_board) != 0, np.maximum(0.0, correction - insulin_on_board), correction)
+    correction = round2(correction)
+    if max_bolus is not None:
+        correction = np.minimum(correction, max_bolus)
+    return correction
+
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def bolus_table(carbs: tuple = DEFAULT_CARB_GRID, glucose: tuple = DEFAULT_GLUCOSE_GRID, target_glucose: float = 120,
+                insulin_to_carb_ratio: float = 10, insulin_sensitivity_factor: float = 50, max_bolus: float = None) -> tuple[np.ndarray, np.ndarray]:
+    # Doses de repas (une par valeur de `carbs`) et de correction (une par valeur de `glucose`), calculées une
+    # fois par profil et partagées : les tableaux sont en lecture seule
+    meal = meal_boluses(np.array(carbs, dtype=float), insulin_to_carb_ratio, max_bolus)
+    correction = correction_boluses(np.array(glucose, dtype=float), target_glucose, insulin_sensitivity_factor, max_bolus=max_bolus)
+    meal.flags.writeable = False
+    correction.flags.writeable = False
+    return meal, correction
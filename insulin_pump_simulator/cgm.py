@@ -1,27 +1,55 @@
-import json
+from typing import Callable
+import numpy as np
 from insulin_pump_simulator.patient import Patient
+from insulin_pump_simulator.registry import load_config
 
-with open('data/sample_input_data.json', 'r') as file:
-    data = json.load(file)
-    measurement_interval = data['continuous_glucose_measurement']['measurement_interval']
-    glucose_critical_limit = data['patient_alerts']['glucose_limits']['upper_critical_limit']
-
+HIGH_GLUCOSE_ALARM = "High glucose alert"
+# Tuples partagés : une mesure n'alloue pas de nouvelle liste d'alarmes
+_HIGH_GLUCOSE_ALARMS = (HIGH_GLUCOSE_ALARM,)
+_NO_ALARMS = ()
 
 
 class CGM:
-    def __init__(self, measurement_interval: int = measurement_interval):
+    def __init__(self, measurement_interval: int = None, config_path: str = None, alert_sink=None):
+        data = load_config(config_path)
+        if measurement_interval is None:
+            measurement_interval = data['continuous_glucose_measurement']['measurement_interval']
         self.measurement_interval = measurement_interval
+        self.glucose_critical_limit = data['patient_alerts']['glucose_limits']['upper_critical_limit']
         self.current_glucose = 0
         self.last_message = ""
+        self.set_alert_sink(alert_sink)
 
-    def measure_glucose(self, patient: Patient) -> float:
-        from insulin_pump_simulator.pdm import PDM
-        pdm = PDM(target_glucose=120)
+    def set_alert_sink(self, alert_sink) -> None:
+        # Le destinataire des alertes peut être un PDM, une pompe (add_alarm), ou un callable (ex. queue.put)
+        self.alert_sink = alert_sink
+        if alert_sink is None:
+            self._emit_alert: Callable[[str], None] | None = None
+        elif hasattr(alert_sink, "add_alarm"):
+            self._emit_alert = alert_sink.add_alarm
+        elif callable(alert_sink):
+            self._emit_alert = alert_sink
+        else:
+            raise TypeError("alert_sink must define add_alarm() or be callable")
 
-        self.current_glucose = patient.glucose_level
+    def measure_glucose(self, patient: Patient, noise: float = 0.0) -> float:
+        # `noise` : erreur du capteur ajoutée à la glycémie réelle (la mesure reste positive)
+        self.current_glucose = max(0.0, patient.glucose_level + noise) if noise else patient.glucose_level
         self.last_message = "Données de glycémie transmises au contrôleur"
-        
-        if self.current_glucose > glucose_critical_limit:
-            pdm.add_alarm("High glucose alert")
-            pdm.pump.last_message = f"Alerte : glycémie critique de {self.current_glucose} mg/dL"
-        return self.current_glucose, pdm.pump.last_message, pdm.pump.alarms
\ No newline at end of file
+
+        if self.current_glucose > self.glucose_critical_limit:
+            if self._emit_alert is not None:
+                self._emit_alert(HIGH_GLUCOSE_ALARM)
+            return self.current_glucose, f"Alerte : glycémie critique de {self.current_glucose} mg/dL", _HIGH_GLUCOSE_ALARMS
+        return self.current_glucose, "", _NO_ALARMS
+
+    def measure_many(self, patients: list[Patient]) -> tuple[np.ndarray, np.ndarray]:
+        glucose = np.fromiter((patient.glucose_level for patient in patients), dtype=float, count=len(patients))
+        alerts = glucose > self.glucose_critical_limit
+        if len(patients):
+            self.current_glucose = patients[-1].glucose_level
+            self.last_message = "Données de glycémie transmises au contrôleur"
+        if self._emit_alert is not None:
+            for _ in range(int(np.count_nonzero(alerts))):
+                self._emit_alert(HIGH_GLUCOSE_ALARM)
+        return glucose, alerts
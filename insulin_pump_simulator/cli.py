@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from .config import PumpConfig
+from .export import FORMATS
+from .patient import Patient
+from .registry import set_default_path
+from .scenario import generate_scenario, DEFAULT_PARAMETERS
+
+OUTPUT_FORMATS = FORMATS + ("trace",)
+EXTENSIONS = {"text": ".txt", "csv": ".csv", "jsonl": ".jsonl", "trace": ".trace"}
+SUMMARY_FILE = "summary.jsonl"
+# Tâches soumises d'avance par processus : assez pour ne jamais laisser un processus inactif, sans tout soumettre
+TASKS_PER_WORKER = 4
+
+
+def load_scenario(path) -> dict:
+    # Fichier JSON : {"seed": ..., "target_glucose": ..., "parameters": {paramètres de generate_scenario}}
+    if path is None:
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        scenario = json.load(file)
+    unknown = set(scenario.get("parameters", {})) - set(DEFAULT_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Paramètres de scénario inconnus : {sorted(unknown)}")
+    return scenario
+
+
+def output_path(directory: Path, index: int, format: str, compress: bool) -> Path:
+    suffix = EXTENSIONS[format] + (".gz" if compress and format != "trace" else "")
+    return directory / f"patient_{index:06d}{suffix}"
+
+
+def run_patient(task: tuple) -> dict:
+    # Exécutée dans un processus de calcul : le journal est écrit directement sur disque, seule la synthèse revient
+    index, seed, hours, parameters, config_path, target_glucose, directory, format, compress = task
+    if config_path is not None:
+        # Aussi pour la pompe, le CGM et le PDM construits par le simulateur (processus lancés sans fork compris)
+        set_default_path(config_path)
+    scenario = generate_scenario(seed, index, hours * 60, **parameters)
+    patient = Patient(config_path=config_path) if config_path is not None else None
+    config = PumpConfig(config_path=config_path) if config_path is not None else None
+    simulator = scenario.simulator(target_glucose, patient=patient, config=config)
+    simulator.run_simulation()
+    result = {"patient": index, "seed": seed, **simulator.metrics.summary()}
+    if directory is not None:
+        path = output_path(Path(directory), index, format, compress)
+        if format == "trace":
+            simulator.export_trace(path)
+        else:
+            simulator.export_log(path, format=format, compress=compress)
+        result["output"] = str(path)
+    return result
+
+
+def run_batch(tasks: list[tuple], jobs: int, on_result) -> None:
+    # Résultats transmis à `on_result` dans l'ordre où les processus les terminent
+    if jobs == 1:
+        for task in tasks:
+            on_result(run_patient(task))
+        return
+    pending = iter(tasks)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        running = {executor.submit(run_patient, task) for task in _take(pending, jobs * TASKS_PER_WORKER)}
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                on_result(future.result())
+            running |= {executor.submit(run_patient, task) for task in _take(pending, len(done))}
+
+
+def _take(iterator, count: int) -> list:
+    return [task for _, task in zip(range(count), iterator)]
+
+
+class Progress:
+    # Avancement et débit (heures-patient simulées par seconde) sur la sortie d'erreur
+    def __init__(self, total: int, hours: int, interval: float = 1.0, stream=sys.stderr):
+        self.total = total
+        self.hours = hours
+        self.interval = interval
+        self.stream = stream
+        self.done = 0
+        self.start = time.perf_counter()
+        self._last_report = self.start
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    @property
+    def throughput(self) -> float:
+        elapsed = self.elapsed
+        return self.done * self.hours / elapsed if elapsed > 0 else 0.0
+
+    def update(self) -> None:
+        self.done += 1
+        now = time.perf_counter()
+        if self.stream is not None and (now - self._last_report >= self.interval or self.done == self.total):
+            self._last_report = now
+            self.stream.write(f"[{self.done}/{self.total}] {self.done / self.total * 100:5.1f} % - "
+                              f"{self.throughput:,.0f} heures-patient/s\n")
+            self.stream.flush()
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="insulin-pump-sim", description="Simulations par lots de patients sous pompe à insuline")
+    parser.add_argument("--scenario", help="fichier JSON du scénario (graine, glycémie cible, paramètres de generate_scenario)")
+    parser.add_argument("--config", help="fichier de configuration de la pompe et du patient (format de insulin_pump_simulator/data/sample_input_data.json)")
+    parser.add_argument("--patients", type=int, default=1, help="nombre de patients simulés")
+    parser.add_argument("--hours", type=int, default=24, help="durée de chaque simulation en heures")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="nombre de processus de calcul")
+    parser.add_argument("--seed", type=int, help="graine (remplace celle du scénario)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="text", help="format du journal de chaque patient")
+    parser.add_argument("--compress", action="store_true", help="journaux compressés en gzip (sauf trace)")
+    parser.add_argument("--output", help="dossier de sortie : un journal par patient et summary.jsonl")
+    parser.add_argument("--quiet", action="store_true", help="sans affichage de l'avancement")
+    args = parser.parse_args(argv)
+    if args.patients < 1 or args.hours < 1 or args.jobs < 1:
+        parser.error("--patients, --hours et --jobs doivent être positifs")
+
+    try:
+        scenario = load_scenario(args.scenario)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    if args.config is not None:
+        if not os.path.isfile(args.config):
+            parser.error(f"Fichier de configuration introuvable : {args.config}")
+        set_default_path(args.config)
+    seed = args.seed if args.seed is not None else scenario.get("seed", 0)
+    target_glucose = scenario.get("target_glucose", 120)
+    directory = None
+    if args.output is not None:
+        directory = Path(args.output)
+        directory.mkdir(parents=True, exist_ok=True)
+    tasks = [(index, seed, args.hours, scenario.get("parameters", {}), args.config, target_glucose, directory, args.format, args.compress)
+             for index in range(args.patients)]
+
+    progress = Progress(args.patients, args.hours, stream=None if args.quiet else sys.stderr)
+    summary = open(directory / SUMMARY_FILE, "w", encoding="utf-8") if directory is not None else sys.stdout
+    try:
+        def on_result(result: dict) -> None:
+            # Une ligne par patient dès qu'il est terminé
+            summary.write(json.dumps(result) + "\n")
+            progress.update()
+        run_batch(tasks, min(args.jobs, args.patients), on_result)
+    finally:
+        if summary is not sys.stdout:
+            summary.close()
+    if not args.quiet:
+        sys.stderr.write(f"{args.patients} patients, {args.patients * args.hours} heures-patient en {progress.elapsed:.1f} s\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
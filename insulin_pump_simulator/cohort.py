@@ -0,0 +1,243 @@
+import numpy as np
+from .patient import Patient
+from .config import PumpConfig
+from .kinetics import Absorption
+from .bolus import round2, meal_boluses, correction_boluses
+from .metrics import CohortMetrics
+from .mpc import mpc_model, HORIZON_MINUTES, BLOCK_MINUTES, REGULARIZATION
+from .simulator import HIGH_GLUCOSE_THRESHOLD, MEAL_INTERVAL, MEAL_CARBS
+
+
+class CohortSimulator:
+    # Même modèle que Simulator.run, mais l'état des N patients est stocké dans des tableaux
+    # et chaque minute est une seule mise à jour vectorisée.
+    def __init__(self, initial_glucose, insulin_sensitivity, carb_sensitivity, basal_rates, target_glucose,
+                 insulin_sensitivity_factor, insulin_to_carb_ratio, insulin_peak=None, carb_peak=None, max_bolus=None, gain=1.0,
+                 basal_multipliers=None):
+        self.glucose = np.array(initial_glucose, dtype=float).reshape(-1)
+        n = self.glucose.size
+        self.insulin_sensitivity = self._per_patient(insulin_sensitivity, n)
+        self.carb_sensitivity = self._per_patient(carb_sensitivity, n)
+        self.target_glucose = self._per_patient(target_glucose, n)
+        self.insulin_sensitivity_factor = self._per_patient(insulin_sensitivity_factor, n)
+        self.insulin_to_carb_ratio = self._per_patient(insulin_to_carb_ratio, n)
+        self.gain = self._per_patient(gain, n)
+        # Planning programmé, ajusté par le contrôleur ; les multiplicateurs horaires du mode appliqué (NaN : heure
+        # hors de la fenêtre du mode, None : aucun mode) s'y appliquent à l'administration, comme PumpConfig
+        self.basal_rates = np.array(np.broadcast_to(np.asarray(basal_rates, dtype=float), (n, 24)))
+        self.basal_multipliers = None
+        if basal_multipliers is not None:
+            self.basal_multipliers = np.array(np.broadcast_to(np.asarray(basal_multipliers, dtype=float), (n, 24)))
+        # Borne haute des taux du mode prédictif (None : sans borne)
+        self.max_bolus = self._per_patient(np.inf if max_bolus is None else max_bolus, n)
+        # Modèles d'absorption optionnels (None : effet immédiat, comme Patient sans cinétique)
+        self.insulin_absorption = Absorption(self._peaks(insulin_peak, n), size=n) if insulin_peak is not None else None
+        self.carb_absorption = Absorption(self._peaks(carb_peak, n), size=n) if carb_peak is not None else None
+        self.simulation_time = 0
+        self.glucose_log = None
+        self.insulin_log = None
+        # Métriques de chaque patient, tenues à jour à chaque minute (même sans journal)
+        self.metrics = CohortMetrics(n)
+        # Mode prédictif (voir enable_mpc) : un modèle par cinétique, avec les patients concernés
+        self.mpc_groups = None
+        self.mpc_reference = None
+        self.mpc_regularization = REGULARIZATION
+
+    @staticmethod
+    def _per_patient(values, n: int) -> np.ndarray:
+        return np.array(np.broadcast_to(np.asarray(values, dtype=float), (n,)))
+
+    @staticmethod
+    def _peaks(peak, n: int):
+        return peak if np.ndim(peak) == 0 else CohortSimulator._per_patient(peak, n)
+
+    @classmethod
+    def from_patients(cls, patients: list[Patient], configs: list[PumpConfig] = None, target_glucose=120) -> "CohortSimulator":
+        if configs is None:
+            configs = [PumpConfig() for _ in patients]
+        if len(configs) != len(patients):
+            raise ValueError("Un PumpConfig est requis pour chaque patient")
+        # Une cohorte a une cinétique pour tous les patients ou pour aucun (voir __init__)
+        absorptions = {}
+        for name in ("insulin_absorption", "carb_absorption"):
+            models = [getattr(patient, name) for patient in patients]
+            if any(model is None for model in models) and not all(model is None for model in models):
+                raise ValueError(f"Tous les patients d'une cohorte doivent avoir un modèle {name}, ou aucun")
+            absorptions[name] = models if patients and models[0] is not None else None
+        cohort = cls(
+            initial_glucose=[patient.glucose_level for patient in patients],
+            insulin_sensitivity=[patient.insulin_sensitivity for patient in patients],
+            carb_sensitivity=[patient.carb_sensitivity for patient in patients],
+            basal_rates=[config.programmed_basal_rates for config in configs],
+            target_glucose=target_glucose,
+            insulin_sensitivity_factor=[config.insulin_sensitivity_factor for config in configs],
+            insulin_to_carb_ratio=[config.insulin_to_carb_ratio for config in configs],
+            insulin_peak=[model.peak_minutes for model in absorptions["insulin_absorption"]] if absorptions["insulin_absorption"] else None,
+            carb_peak=[model.peak_minutes for model in absorptions["carb_absorption"]] if absorptions["carb_absorption"] else None,
+            max_bolus=[config.max_bolus for config in configs],
+            basal_multipliers=cls._multipliers(configs),
+        )
+        # Insuline et glucides en cours d'absorption de chaque patient
+        for name, models in absorptions.items():
+            if models is not None:
+                absorption = getattr(cohort, name)
+                absorption.depot[:] = [model.depot for model in models]
+                absorption.active[:] = [model.active for model in models]
+        return cohort
+
+    @staticmethod
+    def _multipliers(configs: list[PumpConfig]):
+        if all(config.basal_multipliers is None for config in configs):
+            return None
+        return [[np.nan if multiplier is None else multiplier for multiplier in config.basal_multipliers or (None,) * 24]
+                for config in configs]
+
+    @property
+    def size(self) -> int:
+        return self.glucose.size
+
+    @property
+    def insulin_on_board(self) -> np.ndarray:
+        if self.insulin_absorption is None:
+            return np.zeros(self.size)
+        return self.insulin_absorption.on_board
+
+    @property
+    def carbs_on_board(self) -> np.ndarray:
+        if self.carb_absorption is None:
+            return np.zeros(self.size)
+        return self.carb_absorption.on_board
+
+    @staticmethod
+    def _peak_list(absorption: Absorption | None, n: int) -> list:
+        if absorption is None:
+            return [None] * n
+        return np.broadcast_to(np.asarray(absorption.peak_minutes, dtype=float), (n,)).tolist()
+
+    def enable_mpc(self, horizon: int = HORIZON_MINUTES, block_minutes: int = BLOCK_MINUTES,
+                   regularization: float = REGULARIZATION, reference_rate=None) -> None:
+        # ClosedLoopController.enable_mpc pour tous les patients. Les matrices ne dépendent que de la cinétique :
+        # les patients sont regroupés par pics d'absorption et chaque groupe est résolu en un seul appel
+        n = self.size
+        self.mpc_groups = self._mpc_groups(horizon, block_minutes)
+        self.mpc_reference = self._per_patient(self.basal_rates.mean(axis=1) if reference_rate is None else reference_rate, n)
+        self.mpc_regularization = regularization
+
+    def _mpc_groups(self, horizon: int, block_minutes: int) -> list:
+        n = self.size
+        groups = {}
+        for index, key in enumerate(zip(self._peak_list(self.insulin_absorption, n), self._peak_list(self.carb_absorption, n))):
+            groups.setdefault(key, []).append(index)
+        return [
+            (mpc_model(insulin_peak, carb_peak, horizon, block_minutes),
+             slice(None) if len(groups) == 1 else np.array(indices))
+            for (insulin_peak, carb_peak), indices in groups.items()
+        ]
+
+    def disable_mpc(self) -> None:
+        self.mpc_groups = None
+
+    def _predictive_rates(self, current_glucose: np.ndarray) -> np.ndarray:
+        rates = np.empty(self.size)
+        insulin, carbs = self.insulin_absorption, self.carb_absorption
+        for model, index in self.mpc_groups:
+            insulin_state = (insulin.depot[index], insulin.active[index]) if insulin is not None else None
+            carb_state = (carbs.depot[index], carbs.active[index]) if carbs is not None else None
+            rates[index] = model.solve(current_glucose[index], self.target_glucose[index], self.insulin_sensitivity[index],
+                                       self.mpc_reference[index], self.max_bolus[index], self.carb_sensitivity[index],
+                                       insulin_state, carb_state, self.mpc_regularization)[:, 0]
+        return rates
+
+    def adjust_basal_rate(self, current_glucose: np.ndarray, insulin_on_board: np.ndarray = None) -> np.ndarray:
+        # ClosedLoopController.adjust_basal_rate pour tous les patients
+        if self.mpc_groups is not None:
+            new_basal_rate = round2(self._predictive_rates(current_glucose))
+            adjustment = round2((new_basal_rate - self.basal_rates[:, 0]) * 24)
+            self.basal_rates[:] = new_basal_rate[:, None]
+            return adjustment
+        difference = current_glucose - self.target_glucose
+        if insulin_on_board is not None:
+            difference = np.where(insulin_on_board != 0, difference - insulin_on_board * self.insulin_sensitivity_factor, difference)
+        adjustment = round2(self.gain * difference / self.insulin_sensitivity_factor)
+        new_basal_rate = round2(self.basal_rates[:, 0] + adjustment / 24)
+        self.basal_rates[:] = new_basal_rate[:, None]
+        return adjustment
+
+    def delivered_basal(self, hour: int) -> np.ndarray:
+        # InsulinPump.deliver_basal pour tous les patients : taux programmé, multiplié et arrondi dans la fenêtre du mode
+        rates = self.basal_rates[:, hour]
+        if self.basal_multipliers is None:
+            return rates
+        multipliers = self.basal_multipliers[:, hour]
+        return np.where(np.isnan(multipliers), rates, round2(rates * multipliers))
+
+    def keep(self, indices) -> None:
+        # Ne garde que les patients `indices` (tableau d'indices ou masque), avec leur état, leurs métriques et
+        # leur journal : pour retirer d'un lot les patients dont la simulation est arrêtée
+        for name in ("glucose", "insulin_sensitivity", "carb_sensitivity", "target_glucose", "insulin_sensitivity_factor",
+                     "insulin_to_carb_ratio", "gain", "basal_rates", "max_bolus"):
+            setattr(self, name, getattr(self, name)[indices])
+        if self.basal_multipliers is not None:
+            self.basal_multipliers = self.basal_multipliers[indices]
+        for absorption in (self.insulin_absorption, self.carb_absorption):
+            if absorption is not None:
+                absorption.depot = absorption.depot[indices]
+                absorption.active = absorption.active[indices]
+                if np.ndim(absorption.peak_minutes):
+                    absorption.peak_minutes = absorption.peak_minutes[indices]
+                    absorption.rate = absorption.rate[indices]
+        if self.glucose_log is not None:
+            self.glucose_log = self.glucose_log[:, indices]
+            self.insulin_log = self.insulin_log[:, indices]
+        self.metrics.keep(indices)
+        if self.mpc_groups is not None:
+            model = self.mpc_groups[0][0]
+            self.mpc_groups = self._mpc_groups(model.horizon, model.block_minutes)
+            self.mpc_reference = self.mpc_reference[indices]
+
+    def calculate_correction_bolus(self, current_glucose: np.ndarray, insulin_on_board: np.ndarray = None) -> np.ndarray:
+        # InsulinPump.calculate_correction_bolus pour tous les patients
+        return correction_boluses(current_glucose, self.target_glucose, self.insulin_sensitivity_factor, insulin_on_board)
+
+    def calculate_meal_bolus(self, carbs: float) -> np.ndarray:
+        return meal_boluses(carbs, self.insulin_to_carb_ratio)
+
+    def update_glucose_level(self, insulin, carbs=0) -> None:
+        # Patient.update_glucose_level : glucides d'abord, puis insuline, plancher à 0
+        if self.insulin_absorption is not None:
+            insulin = self.insulin_absorption.step(insulin)
+        if self.carb_absorption is not None:
+            carbs = self.carb_absorption.step(carbs)
+        self.glucose += carbs * self.carb_sensitivity
+        self.glucose -= insulin * self.insulin_sensitivity
+        np.maximum(self.glucose, 0, out=self.glucose)
+
+    def step(self) -> tuple[np.ndarray, np.ndarray]:
+        self.simulation_time += 1
+        glucose = self.glucose.copy()
+        insulin_on_board = self.insulin_on_board if self.insulin_absorption is not None else None
+        self.adjust_basal_rate(glucose, insulin_on_board)
+        insulin = self.delivered_basal((self.simulation_time // 60) % 24) / 60
+
+        high = glucose > HIGH_GLUCOSE_THRESHOLD
+        if high.any():
+            insulin = insulin + np.where(high, self.calculate_correction_bolus(glucose, insulin_on_board), 0)
+
+        carbs = 0
+        if self.simulation_time % MEAL_INTERVAL == 0:
+            carbs = MEAL_CARBS
+            insulin = insulin + self.calculate_meal_bolus(carbs)
+
+        self.update_glucose_level(insulin, carbs)
+        return glucose, insulin
+
+    def run(self, duration: int, record: bool = True) -> None:
+        if record:
+            self.glucose_log = np.empty((duration, self.size))
+            self.insulin_log = np.empty((duration, self.size))
+        for minute in range(duration):
+            glucose, insulin = self.step()
+            self.metrics.add(glucose, insulin)
+            if record:
+                self.glucose_log[minute] = glucose
+                self.insulin_log[minute] = insulin
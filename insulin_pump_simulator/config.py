@@ -1,24 +1,182 @@
-from insulin_pump_simulator.patient import Patient
-import json
+from array import array
+from insulin_pump_simulator.registry import load_config
 
-with open('data/sample_input_data.json', 'r') as file:
-    data = json.load(file)
-    config = data['pump_configuration']
 
-Patient = Patient()
+class BasalSchedule(array):
+    # Taux basaux horaires stockés en doubles contigus (24 × 8 octets) ; se compare à une liste ou un tuple
+    __slots__ = ()
+
+    def __new__(cls, rates=()):
+        return super().__new__(cls, "d", rates)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple)):
+            return self.tolist() == list(other)
+        return super().__eq__(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def fill(self, rate: float) -> None:
+        # Même taux pour toutes les heures, sans réallouer le planning
+        self[:] = array("d", (rate,)) * len(self)
+
+    def __repr__(self) -> str:
+        return f"BasalSchedule({self.tolist()})"
+
+    def __reduce__(self):
+        return BasalSchedule, (self.tolist(),)
+
+
+class EffectiveSchedule(BasalSchedule):
+    # Planning effectif d'une PumpConfig dont un mode est appliqué : une heure écrite en place
+    # (config.basal_rates[h] = taux) devient le taux programmé de cette heure (voir PumpConfig.set_basal_rate)
+    __slots__ = ("config",)
+
+    def __setitem__(self, hour, rate) -> None:
+        if isinstance(hour, slice):
+            for index, value in zip(range(*hour.indices(len(self))), list(rate)):
+                self.config.set_basal_rate(index, value)
+        else:
+            self.config.set_basal_rate(hour, rate)
+
+    def __reduce__(self):
+        return BasalSchedule, (self.tolist(),)
+
+
+def mode_multipliers(settings: dict, hours: int = 24) -> tuple[float | None, ...] | None:
+    # Multiplicateur de chaque heure (None hors de la fenêtre start_hour/end_hour, qui peut passer minuit) ;
+    # None si le mode ne modifie pas le basal
+    adjustment = settings.get("basal_rate_adjustment")
+    if adjustment is None:
+        return None
+    start, end = settings.get("start_hour"), settings.get("end_hour")
+    if start is None or end is None or start == end:
+        return (adjustment,) * hours
+    if start < end:
+        return tuple(adjustment if start <= hour < end else None for hour in range(hours))
+    return tuple(adjustment if hour >= start or hour < end else None for hour in range(hours))
 
 
 class PumpConfig:
-    def __init__(self, basal_rates: list[float] = config["basal_rates"], insulin_to_carb_ratio: float = config["insulin_to_carb_ratio"], max_bolus: float = config["max_bolus"], insulin_sensitivity_factor: float = Patient.insulin_sensitivity, modes: dict[str, dict] = config["personalized_modes"]):
-        self.basal_rates: list[float] = basal_rates
+    __slots__ = ("_basal_rates", "_effective_rates", "_multipliers", "applied_mode", "insulin_to_carb_ratio",
+                 "insulin_sensitivity_factor", "max_bolus", "_modes", "_default_modes", "active_mode")
+
+    def __init__(self, basal_rates: list[float] = None, insulin_to_carb_ratio: float = None, max_bolus: float = None, insulin_sensitivity_factor: float = None, modes: dict[str, dict] = None, config_path: str = None):
+        data = load_config(config_path)
+        config = data['pump_configuration']
+        # Les valeurs par défaut viennent d'une vue en lecture seule : chaque instance en garde sa propre copie
+        if basal_rates is None:
+            basal_rates = config["basal_rates"]
+        if insulin_to_carb_ratio is None:
+            insulin_to_carb_ratio = config["insulin_to_carb_ratio"]
+        if max_bolus is None:
+            max_bolus = config["max_bolus"]
+        if insulin_sensitivity_factor is None:
+            insulin_sensitivity_factor = data['basal_insulin_administration']['cgm_correction']['insulin_sensitivity_factor']
+        # Aucun multiplicateur de mode appliqué : le planning effectif est le planning programmé
+        self._multipliers: tuple[float | None, ...] | None = None
+        self.applied_mode: str | None = None
+        # Copie propre à l'instance : un ajustement ne modifie jamais le planning d'une autre pompe
+        self.basal_rates = basal_rates
         self.insulin_to_carb_ratio: float = insulin_to_carb_ratio
         self.insulin_sensitivity_factor: float = insulin_sensitivity_factor
         self.max_bolus: float = max_bolus
-        self.modes: dict[str, dict] = modes if modes is not None else {}
+        # Modes par défaut : vue partagée en lecture seule, copiée pour l'instance au premier accès
+        self._default_modes = config["personalized_modes"]
+        self._modes: dict[str, dict] | None = modes
         self.active_mode: str = "Day"
 
+    @property
+    def basal_rates(self) -> BasalSchedule:
+        # Planning effectif, celui qui est administré : planning programmé et multiplicateurs du mode appliqué.
+        # Une heure écrite en place devient le taux programmé de cette heure (voir set_basal_rate)
+        return self._effective_rates
+
+    @basal_rates.setter
+    def basal_rates(self, rates) -> None:
+        # Remplace le planning programmé ; le mode appliqué reste appliqué
+        self._basal_rates = BasalSchedule(rates)
+        self._rebuild_effective_rates()
+
+    @property
+    def programmed_basal_rates(self) -> BasalSchedule:
+        return self._basal_rates
+
+    @property
+    def effective_basal_rates(self) -> BasalSchedule:
+        # Planning administré (même objet que basal_rates)
+        return self._effective_rates
+
+    @property
+    def basal_multipliers(self) -> tuple[float | None, ...] | None:
+        # Multiplicateurs horaires du mode appliqué (None : aucun), voir mode_multipliers
+        return self._multipliers
+
+    def set_basal_rate(self, hour: int, rate: float) -> None:
+        # Taux programmé d'une heure ; seule cette heure du planning effectif est recalculée
+        self._basal_rates[hour] = rate
+        if self._effective_rates is not self._basal_rates:
+            multiplier = self._multipliers[hour]
+            BasalSchedule.__setitem__(self._effective_rates, hour, rate if multiplier is None else round(rate * multiplier, 2))
+
+    def fill_basal_rates(self, rate: float) -> None:
+        # Même taux programmé pour toutes les heures (boucle fermée), sans réallouer aucun des deux plannings
+        self._basal_rates.fill(rate)
+        if self._effective_rates is not self._basal_rates:
+            for hour, multiplier in enumerate(self._multipliers):
+                BasalSchedule.__setitem__(self._effective_rates, hour, rate if multiplier is None else round(rate * multiplier, 2))
+
+    def apply_mode(self, mode: str, settings: dict = None) -> None:
+        # Les fenêtres et multiplicateurs du mode sont résolus une fois en une table horaire ; le planning
+        # effectif est recalculé à partir du planning programmé, donc sans cumul d'un mode à l'autre
+        if settings is None:
+            if mode not in self.modes:
+                raise ValueError(f"Mode {mode} not found")
+            settings = self.modes[mode]
+        self.active_mode = mode
+        self.applied_mode = mode
+        self._multipliers = mode_multipliers(settings, len(self._basal_rates))
+        self._rebuild_effective_rates()
+
+    def _rebuild_effective_rates(self) -> None:
+        # Seulement quand le planning programmé est remplacé ou qu'un mode est appliqué ; les modifications
+        # d'heures (set_basal_rate, fill_basal_rates) mettent à jour le planning effectif en place
+        if self._multipliers is None:
+            self._effective_rates = self._basal_rates
+            return
+        self._effective_rates = EffectiveSchedule([
+            rate if multiplier is None else round(rate * multiplier, 2)
+            for rate, multiplier in zip(self._basal_rates, self._multipliers)
+        ])
+        self._effective_rates.config = self
+
+    @property
+    def modes(self) -> dict[str, dict]:
+        if self._modes is None:
+            self._modes = {name: dict(mode) for name, mode in self._default_modes.items()}
+        return self._modes
+
+    @modes.setter
+    def modes(self, modes: dict[str, dict]) -> None:
+        self._modes = modes
+
+    def __getstate__(self) -> dict:
+        # La vue partagée des modes par défaut n'est pas sérialisable : on transmet la copie de l'instance
+        state = {name: getattr(self, name) for name in self.__slots__ if name not in ("_default_modes", "_effective_rates")}
+        state["_modes"] = self.modes
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self._default_modes = None
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._rebuild_effective_rates()
+
     def validate(self) -> bool:
-        if len(self.basal_rates) != 24:
+        if len(self._basal_rates) != 24:
             raise ValueError("Basal rates must be defined for 24 hours")
         if self.insulin_to_carb_ratio <= 0:
             raise ValueError("Insulin to carb ratio must be positive")
@@ -26,4 +184,4 @@ class PumpConfig:
             raise ValueError("Insulin sensitivity factor must be positive")
         if self.max_bolus <= 0:
             raise ValueError("Max bolus must be positive")
-        return True
+        return True
\ No newline at end of file
@@ -1,27 +1,77 @@
 from .insulin_pump import InsulinPump
 from .cgm import CGM
 from .patient import Patient
+from .profiling import Profiler, instrument, uninstrument
+from .metrics import LOW_GLUCOSE, VERY_HIGH_GLUCOSE
+from .alarms import AlarmCode
+from .mpc import MPCPolicy
 
 class ClosedLoopController:
-    def __init__(self, target_glucose):
+    PROFILED_PHASES = {"control_loop": "control_loop", "adjust": "adjust_basal_rate", "deliver_basal": "_deliver"}
+
+    def __init__(self, target_glucose, pump: InsulinPump = None, config_path: str = None):
         self.target_glucose = target_glucose
-        self.pump = InsulinPump()
-        self.cgm = CGM()
+        self.pump = pump if pump is not None else InsulinPump(config_path)
+        self.cgm = CGM(config_path=config_path)
+        self.profiler = None
+        # Gain du contrôleur proportionnel (1 : l'écart à la cible est corrigé selon le facteur de sensibilité)
+        self.gain = 1.0
+        # Mode prédictif optionnel (None : contrôleur proportionnel)
+        self.mpc = None
+
+    def enable_mpc(self, patient: Patient, **options) -> MPCPolicy:
+        self.mpc = MPCPolicy(patient, self.pump.config, **options)
+        return self.mpc
+
+    def disable_mpc(self) -> None:
+        self.mpc = None
 
-    def adjust_basal_rate(self, current_glucose: float) -> float:
+    def adjust_basal_rate(self, current_glucose: float, insulin_on_board: float = 0.0) -> float:
+        if self.mpc is not None:
+            return self._adjust_predictive(current_glucose)
         difference = current_glucose - self.target_glucose
-        adjustment = round(difference / self.pump.config.insulin_sensitivity_factor, 2)
-        new_basal_rate = round(self.pump.config.basal_rates[0] + adjustment / 24, 2)  # Ajuster le taux basal sur 24 heures
-        self.pump.config.basal_rates = [new_basal_rate] * 24  # Mettre à jour tous les taux basaux
+        if insulin_on_board:
+            # L'insuline encore active fera baisser la glycémie : on ne la compense pas une seconde fois
+            difference -= insulin_on_board * self.pump.config.insulin_sensitivity_factor
+        adjustment = round(self.gain * difference / self.pump.config.insulin_sensitivity_factor, 2)
+        new_basal_rate = round(self.pump.config.programmed_basal_rates[0] + adjustment / 24, 2)  # Ajuster le taux basal sur 24 heures
+        self.pump.config.fill_basal_rates(new_basal_rate)  # Mettre à jour tous les taux basaux (le mode actif reste appliqué)
+        self.pump.last_message = f"Ajustement calculé : {adjustment} U d'insuline"
+        return adjustment
+
+    def _adjust_predictive(self, current_glucose: float) -> float:
+        # Taux basal optimal sur l'horizon (l'insuline active est dans la prédiction), appliqué comme le taux
+        # ajusté ; l'ajustement rapporté est l'écart au taux précédent, sur 24 heures
+        config = self.pump.config
+        new_basal_rate = round(self.mpc.basal_rate(current_glucose, self.target_glucose, config), 2)
+        adjustment = round((new_basal_rate - config.programmed_basal_rates[0]) * 24, 2)
+        config.fill_basal_rates(new_basal_rate)
         self.pump.last_message = f"Ajustement calculé : {adjustment} U d'insuline"
         return adjustment
 
     def control_loop(self, patient: Patient) -> None:
-        current_glucose = self.cgm.measure_glucose(patient)
-        adjustment = self.adjust_basal_rate(current_glucose)
-        self.pump.deliver_basal(int(adjustment))
+        current_glucose = self.cgm.measure_glucose(patient)[0]
+        adjustment = self.adjust_basal_rate(current_glucose, patient.insulin_on_board)
+        self._deliver(adjustment)
         
-        if current_glucose > 250:
-            self.pump.add_alarm("High glucose alert")
-        elif current_glucose < 70:
-            self.pump.add_alarm("Low glucose alert")
\ No newline at end of file
+        if current_glucose > VERY_HIGH_GLUCOSE:
+            self.pump.add_alarm(AlarmCode.HIGH_GLUCOSE)
+        elif current_glucose < LOW_GLUCOSE:
+            self.pump.add_alarm(AlarmCode.LOW_GLUCOSE)
+        else:
+            self.pump.alarms.clear(AlarmCode.HIGH_GLUCOSE)
+            self.pump.alarms.clear(AlarmCode.LOW_GLUCOSE)
+
+    def _deliver(self, adjustment: float) -> None:
+        self.pump.deliver_basal(int(adjustment))
+
+    def enable_profiling(self, profiler: Profiler = None) -> Profiler:
+        self.profiler = profiler if profiler is not None else Profiler()
+        instrument(self, self.PROFILED_PHASES, self.profiler)
+        instrument(self.cgm, {"measure": "measure_glucose"}, self.profiler)
+        return self.profiler
+
+    def disable_profiling(self) -> None:
+        uninstrument(self, self.PROFILED_PHASES)
+        uninstrument(self.cgm, {"measure": "measure_glucose"})
+        self.profiler = None
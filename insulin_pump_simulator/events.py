@@ -0,0 +1,78 @@
+import heapq
+import numpy as np
+from datetime import timedelta
+from .simulator import Simulator
+
+# Événements récurrents du simulateur, dans l'ordre où ils sont traités à une même minute
+MEASUREMENT = "measurement"
+HOURLY_BASAL = "hourly_basal"
+MEAL = "meal"
+ACTION = "action"
+
+
+class EventDrivenSimulator(Simulator):
+    # Même modèle que Simulator.run, mais seules les minutes où un événement a lieu (mesure CGM, changement
+    # d'heure basale, repas, action planifiée) sont simulées complètement. Entre deux événements, seul le
+    # basal est administré, avec exactement les mêmes opérations que la boucle minute par minute.
+    PROFILED_PHASES = {**Simulator.PROFILED_PHASES, "basal_interval": "deliver_basal_until"}
+
+    def run(self, duration: int):
+        end = self.simulation_time + duration
+        queue = []
+        self._push_recurring(queue, MEASUREMENT, self.simulation_time)
+        self._push_recurring(queue, HOURLY_BASAL, self.simulation_time)
+        if self.meal_interval:
+            self._push_recurring(queue, MEAL, self.simulation_time)
+
+        while self.simulation_time < end:
+            next_time = min(queue[0][0], end)
+            action_time = self.next_action_time()
+            if action_time is not None:
+                next_time = min(next_time, max(action_time, self.simulation_time + 1))
+            self.deliver_basal_until(next_time - 1)
+            self.step()
+            while queue and queue[0][0] <= self.simulation_time:
+                _, kind = heapq.heappop(queue)
+                self._push_recurring(queue, kind, self.simulation_time)
+
+        self.last_message = "Simulation terminée, résultats disponibles"
+
+    def _next_occurrence(self, kind: str, after: int) -> int:
+        if kind == MEASUREMENT:
+            time = after + 1
+            return time + (1 - time) % self.measurement_interval
+        if kind == HOURLY_BASAL:
+            return (after // 60 + 1) * 60
+        return (after // self.meal_interval + 1) * self.meal_interval
+
+    def _push_recurring(self, queue: list, kind: str, after: int) -> None:
+        heapq.heappush(queue, (self._next_occurrence(kind, after), kind))
+
+    def deliver_basal_until(self, time: int) -> None:
+        # Minutes sans événement : ni mesure, ni bolus, et une même heure basale (les changements d'heure
+        # sont des événements), donc une dose constante
+        minutes = time - self.simulation_time
+        if minutes <= 0:
+            return
+        basal_dose = self.pump.deliver_basal(((self.simulation_time + 1) // 60) % 24) / 60
+        if self.patient.insulin_absorption is not None or self.patient.carb_absorption is not None:
+            # Les compartiments d'absorption doivent avancer minute par minute
+            for _ in range(minutes):
+                self.patient.update_glucose_level(insulin=basal_dose)
+        else:
+            self._apply_constant_basal(basal_dose, minutes)
+        self.simulation_time = time
+        if self.record_history:
+            self.pdm.record_insulin_dose(self.start_time + timedelta(minutes=time), basal_dose * minutes)
+        self.metrics.add_insulin(basal_dose * minutes, minutes)
+
+    def _apply_constant_basal(self, basal_dose: float, minutes: int) -> None:
+        # Même effet soustrait à chaque minute : la glycémie décroît jusqu'au plancher de 0 puis y reste. Les
+        # soustractions successives sont faites d'un coup (accumulate est séquentiel : mêmes arrondis que la
+        # boucle minute par minute, contrairement à glycémie - minutes * effet)
+        insulin_effect = basal_dose * self.patient.insulin_sensitivity
+        if not insulin_effect:
+            return
+        steps = np.full(minutes + 1, -insulin_effect)
+        steps[0] = self.patient.glucose_level
+        self.patient.glucose_level = max(0, float(np.add.accumulate(steps)[-1]))
@@ -0,0 +1,85 @@
+import csv
+import gzip
+import io
+import json
+import os
+from contextlib import contextmanager
+from typing import IO, Iterator
+from .recorder import SimulationRecorder, RENDER_CHUNK
+
+FORMATS = ("text", "csv", "jsonl")
+CSV_FIELDS = ("time", "glucose", "adjustment", "basal", "correction", "meal", "insulin", "events")
+
+
+def iter_final_log(recorder: SimulationRecorder) -> Iterator[str]:
+    # Mêmes lignes que Simulator.generate_final_log, produites une à une
+    yield "Événements:"
+    yield from recorder.iter_event_lines()
+    yield "\nValeurs de glycémie:"
+    yield from recorder.iter_glucose_lines()
+    yield "\nDoses d'insuline administrées:"
+    yield from recorder.iter_insulin_lines()
+
+
+def iter_text(recorder: SimulationRecorder) -> Iterator[str]:
+    # Blocs de texte dont la concaténation est identique à generate_final_log()
+    lines = iter_final_log(recorder)
+    block = [next(lines)]
+    for line in lines:
+        block.append(line)
+        if len(block) >= RENDER_CHUNK:
+            yield "\n".join(block)
+            block = [""]
+    yield "\n".join(block)
+
+
+def iter_csv(recorder: SimulationRecorder) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(CSV_FIELDS)
+    for chunk in recorder.iter_chunks():
+        writer.writerows(zip(*(chunk[field] for field in CSV_FIELDS)))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_jsonl(recorder: SimulationRecorder) -> Iterator[str]:
+    for chunk in recorder.iter_chunks():
+        yield "".join(json.dumps(dict(zip(CSV_FIELDS, row))) + "\n" for row in zip(*(chunk[field] for field in CSV_FIELDS)))
+
+
+@contextmanager
+def _open_destination(destination, compress: bool) -> Iterator[IO[str]]:
+    if isinstance(destination, (str, os.PathLike)):
+        if compress or os.fspath(destination).endswith(".gz"):
+            with gzip.open(destination, "wt", encoding="utf-8") as file:
+                yield file
+        else:
+            with open(destination, "w", encoding="utf-8") as file:
+                yield file
+    elif compress:
+        # Objet fichier binaire fourni par l'appelant : on le compresse sans le fermer
+        with gzip.GzipFile(fileobj=destination, mode="wb") as compressed:
+            text = io.TextIOWrapper(compressed, encoding="utf-8")
+            yield text
+            text.flush()
+            text.detach()
+    else:
+        yield destination
+
+
+def write_log(recorder: SimulationRecorder, destination, format: str = "text", compress: bool = False) -> None:
+    if format == "text":
+        blocks = iter_text(recorder)
+    elif format == "csv":
+        blocks = iter_csv(recorder)
+    elif format == "jsonl":
+        blocks = iter_jsonl(recorder)
+    else:
+        raise ValueError(f"Format d'export inconnu : {format}")
+
+    with _open_destination(destination, compress) as file:
+        for block in blocks:
+            file.write(block)
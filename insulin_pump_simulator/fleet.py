@@ -0,0 +1,362 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from array import array
+from collections import deque
+from datetime import datetime, timedelta
+import numpy as np
+from .cgm import CGM, HIGH_GLUCOSE_ALARM
+from .insulin_pump import InsulinPump
+from .patient import Patient
+from .pdm import PDM
+
+DEFAULT_TARGET_GLUCOSE = 120
+# Nombre d'appareils mis à jour entre deux passages par la boucle d'événements pendant un tick CGM
+TICK_BATCH = 256
+PERCENTILES = (50, 90, 99)
+# Latences conservées par commande côté serveur (les plus récentes) : la mémoire reste bornée sur un serveur qui dure
+LATENCY_WINDOW = 10000
+# Jours calendaires d'historique conservés par appareil, en plus du jour en cours
+HISTORY_DAYS = 30
+LOAD_COMMANDS = ("set_meal", "set_target_glucose", "activate_mode", "check_battery_level",
+                 "view_glucose_history", "view_insulin_dose_history", "glucose_summary")
+
+
+class VirtualDevice:
+    # Un patient équipé d'une pompe, d'un PDM et d'un CGM ; le contrôleur du PDM pilote la pompe
+    def __init__(self, device_id: int, patient: Patient, target_glucose: float, start_time: datetime,
+                 history_days: int = HISTORY_DAYS):
+        self.device_id = device_id
+        self.patient = patient
+        self.pump = InsulinPump()
+        self.pump.alarms.clock = self.current_minute
+        self.pdm = PDM(target_glucose, pump=self.pump)
+        self.cgm = CGM(alert_sink=self.pdm)
+        self.start_time = start_time
+        self.history_days = history_days
+        self.minutes = 0
+
+    def current_minute(self) -> int:
+        return self.minutes
+
+    def date(self) -> datetime:
+        return self.start_time + timedelta(minutes=self.minutes)
+
+    def tick(self, minutes: int, glucose: float, interval: int) -> None:
+        # Mesure CGM déjà faite pour toute la flotte : enregistrement, ajustement basal et basal de l'intervalle
+        previous = self.date()
+        self.minutes = minutes
+        date = self.date()
+        if date.date() != previous.date():
+            self.forget_history()
+        self.pdm.record_glucose(date, glucose)
+        self.pdm.controller.adjust_basal_rate(glucose, self.patient.insulin_on_board)
+        dose = self.pump.deliver_basal((minutes // 60) % 24) * interval / 60
+        self.pdm.record_insulin_dose(date, dose)
+        self.patient.update_glucose_level(insulin=dose)
+
+    def forget_history(self) -> None:
+        # Au changement de jour : seuls les `history_days` derniers jours restent en mémoire
+        oldest = self.date() - timedelta(days=self.history_days)
+        for store in self.pdm.history.values():
+            store.forget_before(oldest)
+
+    def set_meal(self, carbs: float) -> float:
+        bolus = self.pdm.set_meal(carbs)
+        self.pdm.record_insulin_dose(self.date(), bolus)
+        self.patient.update_glucose_level(insulin=bolus, carbs=carbs)
+        return bolus
+
+
+def _set_meal(device: VirtualDevice, carbs: float) -> float:
+    return device.set_meal(float(carbs))
+
+
+def _set_target_glucose(device: VirtualDevice, target: float) -> str:
+    device.pdm.set_target_glucose(float(target))
+    return device.pdm.last_message
+
+
+def _activate_mode(device: VirtualDevice, mode: str) -> str:
+    device.pdm.activate_mode(mode)
+    return device.pump.last_message
+
+
+def _get_mode(device: VirtualDevice) -> str:
+    return device.pdm.get_mode()[0]
+
+
+def _check_battery_level(device: VirtualDevice) -> dict:
+    message, alarms = device.pdm.check_battery_level()
+    return {"battery_level": device.pump.battery_level, "message": message, "alarms": len(alarms)}
+
+
+def _view_glucose_history(device: VirtualDevice, start: str = None, end: str = None) -> list[dict]:
+    return device.pdm.view_glucose_history(start, end)
+
+
+def _view_insulin_dose_history(device: VirtualDevice, start: str = None, end: str = None) -> list[dict]:
+    return device.pdm.view_insulin_dose_history(start, end)
+
+
+def _glucose_summary(device: VirtualDevice, days: int = None) -> dict:
+    return device.pdm.glucose_summary(days)
+
+
+def _measure_glucose(device: VirtualDevice) -> float:
+    return device.cgm.measure_glucose(device.patient)[0]
+
+
+COMMANDS = {
+    "set_meal": _set_meal,
+    "set_target_glucose": _set_target_glucose,
+    "activate_mode": _activate_mode,
+    "get_mode": _get_mode,
+    "check_battery_level": _check_battery_level,
+    "view_glucose_history": _view_glucose_history,
+    "view_insulin_dose_history": _view_insulin_dose_history,
+    "glucose_summary": _glucose_summary,
+    "measure_glucose": _measure_glucose,
+}
+
+
+def latency_summary(latencies: dict[str, array | deque], counts: dict[str, int] = None) -> dict[str, dict]:
+    # Percentiles de latence par commande, en millisecondes ; `counts` donne le nombre total de requêtes quand
+    # seules les latences les plus récentes sont conservées
+    summary = {}
+    for command, values in sorted(latencies.items()):
+        milliseconds = np.fromiter(values, dtype=np.float64, count=len(values)) / 1e6
+        count = len(milliseconds) if counts is None else counts[command]
+        summary[command] = {"count": count, "max": float(milliseconds.max())}
+        for percentile, value in zip(PERCENTILES, np.percentile(milliseconds, PERCENTILES).tolist()):
+            summary[command][f"p{percentile}"] = value
+    return summary
+
+
+class FleetServer:
+    # Flotte d'appareils virtuels servie par une seule boucle asyncio. Protocole : une requête JSON par ligne,
+    # {"id": ..., "device": n, "command": "...", "args": {...}}, et une réponse JSON par ligne dans le même ordre.
+    def __init__(self, devices: int = 1000, target_glucose: float = DEFAULT_TARGET_GLUCOSE, tick_seconds: float = 1.0,
+                 minutes_per_tick: int = None, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.start_time = datetime.now().replace(second=0, microsecond=0)
+        self.devices = [
+            VirtualDevice(index, Patient(initial_glucose=glucose), target_glucose, self.start_time)
+            for index, glucose in enumerate(np.round(rng.uniform(80, 250, devices), 1).tolist())
+        ]
+        self.patients = [device.patient for device in self.devices]
+        # Lecture groupée des glycémies : les alertes sont ensuite routées vers le PDM de chaque appareil
+        self.cgm = CGM()
+        self.minutes_per_tick = minutes_per_tick if minutes_per_tick is not None else self.cgm.measurement_interval
+        self.tick_seconds = tick_seconds
+        self.minutes = 0
+        self.ticks = 0
+        self.latencies: dict[str, deque] = {}
+        self.commands: dict[str, int] = {}
+        self.errors = 0
+        self._server = None
+        self._ticker = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0, path: str = None) -> asyncio.AbstractServer:
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle, path=path)
+        else:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        if self.tick_seconds:
+            self._ticker = asyncio.create_task(self._tick_loop())
+        return self._server
+
+    @property
+    def address(self):
+        return self._server.sockets[0].getsockname()
+
+    async def close(self) -> None:
+        if self._ticker is not None:
+            self._ticker.cancel()
+            try:
+                await self._ticker
+            except asyncio.CancelledError:
+                pass
+            self._ticker = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def tick(self) -> None:
+        self.minutes += self.minutes_per_tick
+        self.ticks += 1
+        glucose, alerts = self.cgm.measure_many(self.patients)
+        for index in np.flatnonzero(alerts).tolist():
+            self.devices[index].pdm.add_alarm(HIGH_GLUCOSE_ALARM)
+        values = glucose.tolist()
+        for start in range(0, len(self.devices), TICK_BATCH):
+            for device, value in zip(self.devices[start:start + TICK_BATCH], values[start:start + TICK_BATCH]):
+                device.tick(self.minutes, value, self.minutes_per_tick)
+            # Laisse passer les requêtes en attente entre deux lots d'appareils
+            await asyncio.sleep(0)
+
+    async def _tick_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            deadline += self.tick_seconds
+            await self.tick()
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+
+    def execute(self, request: dict) -> dict:
+        start = time.perf_counter_ns()
+        command = request.get("command")
+        try:
+            if command == "stats":
+                result = self.stats()
+            else:
+                handler = COMMANDS.get(command)
+                if handler is None:
+                    raise ValueError(f"Commande inconnue : {command}")
+                device = request.get("device")
+                if not isinstance(device, int) or not 0 <= device < len(self.devices):
+                    raise ValueError(f"Appareil inconnu : {device}")
+                result = handler(self.devices[device], **request.get("args", {}))
+            response = {"id": request.get("id"), "ok": True, "result": result}
+        except Exception as error:
+            # Toute erreur d'une commande est renvoyée au client, sans fermer sa connexion
+            self.errors += 1
+            response = {"id": request.get("id"), "ok": False, "error": str(error) or type(error).__name__}
+        if command in COMMANDS:
+            self.latencies.setdefault(command, deque(maxlen=LATENCY_WINDOW)).append(time.perf_counter_ns() - start)
+            self.commands[command] = self.commands.get(command, 0) + 1
+        return response
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("La requête doit être un objet JSON")
+                except ValueError as error:
+                    self.errors += 1
+                    response = {"id": None, "ok": False, "error": str(error)}
+                else:
+                    response = self.execute(request)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def stats(self) -> dict:
+        return {"devices": len(self.devices), "ticks": self.ticks, "minutes": self.minutes, "errors": self.errors,
+                "latency_ms": latency_summary(self.latencies, self.commands)}
+
+
+class FleetClient:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self._next_id = 0
+
+    @classmethod
+    async def connect(cls, host: str = "127.0.0.1", port: int = None, path: str = None) -> "FleetClient":
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, command: str, device: int = 0, **args) -> dict:
+        self._next_id += 1
+        self.writer.write(json.dumps({"id": self._next_id, "device": device, "command": command, "args": args}).encode() + b"\n")
+        await self.writer.drain()
+        return json.loads(await self.reader.readline())
+
+    async def close(self) -> None:
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def _load_arguments(command: str, rng: np.random.Generator) -> dict:
+    if command == "set_meal":
+        return {"carbs": int(rng.integers(10, 90))}
+    if command == "set_target_glucose":
+        return {"target": int(rng.integers(100, 141))}
+    if command == "activate_mode":
+        return {"mode": str(rng.choice(("Day", "Night", "Sport")))}
+    if command == "glucose_summary":
+        return {"days": 1}
+    return {}
+
+
+async def generate_load(host: str = "127.0.0.1", port: int = None, path: str = None, clients: int = 10,
+                        requests_per_client: int = 100, devices: int = 1, commands: tuple[str, ...] = LOAD_COMMANDS,
+                        seed: int = 0) -> dict:
+    # Clients concurrents, chacun envoyant ses requêtes l'une après l'autre ; latences mesurées côté client
+    latencies: dict[str, array] = {}
+    errors = 0
+
+    async def run_client(client_seed: np.random.SeedSequence) -> None:
+        nonlocal errors
+        rng = np.random.default_rng(client_seed)
+        client = await FleetClient.connect(host, port, path)
+        try:
+            for _ in range(requests_per_client):
+                command = str(rng.choice(commands))
+                device = int(rng.integers(devices))
+                arguments = _load_arguments(command, rng)
+                start = time.perf_counter_ns()
+                response = await client.request(command, device, **arguments)
+                latencies.setdefault(command, array("d")).append(time.perf_counter_ns() - start)
+                errors += not response["ok"]
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(child) for child in np.random.SeedSequence(seed).spawn(clients)))
+    seconds = time.perf_counter() - start
+    total = clients * requests_per_client
+    return {"requests": total, "errors": errors, "seconds": seconds, "throughput": total / seconds,
+            "latency_ms": latency_summary(latencies)}
+
+
+async def _serve(args) -> None:
+    server = FleetServer(args.devices, tick_seconds=args.tick_seconds, seed=args.seed)
+    await server.start(args.host, args.port, args.unix)
+    print(f"Flotte de {args.devices} appareils à l'écoute sur {server.address}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Flotte d'appareils virtuels et générateur de charge")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    for name in ("serve", "load"):
+        subparser = subparsers.add_parser(name)
+        subparser.add_argument("--host", default="127.0.0.1")
+        subparser.add_argument("--port", type=int, default=8765)
+        subparser.add_argument("--unix", help="socket Unix à utiliser à la place de TCP")
+        subparser.add_argument("--devices", type=int, default=1000)
+        subparser.add_argument("--seed", type=int, default=0)
+    subparsers.choices["serve"].add_argument("--tick-seconds", type=float, default=1.0, help="durée réelle d'un tick CGM")
+    subparsers.choices["load"].add_argument("--clients", type=int, default=50)
+    subparsers.choices["load"].add_argument("--requests", type=int, default=1000, help="requêtes par client")
+    args = parser.parse_args(argv)
+
+    if args.action == "serve":
+        try:
+            asyncio.run(_serve(args))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    report = asyncio.run(generate_load(args.host, args.port, args.unix, args.clients, args.requests, args.devices, seed=args.seed))
+    print(json.dumps(report, indent=2))
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
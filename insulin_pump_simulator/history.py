@@ -0,0 +1,205 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+import numpy as np
+
+EPOCH = datetime(1970, 1, 1)
+MINUTES_PER_DAY = 24 * 60
+GLUCOSE_RANGE = (70, 180)
+
+
+def to_minutes(moment) -> float:
+    # Horodatage stocké en minutes depuis l'époque (datetime naïf, sans fuseau)
+    if isinstance(moment, str):
+        moment = datetime.fromisoformat(moment)
+    elif isinstance(moment, date) and not isinstance(moment, datetime):
+        moment = datetime(moment.year, moment.month, moment.day)
+    return (moment - EPOCH) / timedelta(minutes=1)
+
+
+def from_minutes(minutes: float) -> datetime:
+    return EPOCH + timedelta(minutes=minutes)
+
+
+def format_date(minutes: float) -> str:
+    moment = from_minutes(minutes)
+    if minutes % MINUTES_PER_DAY == 0:
+        return moment.strftime("%Y-%m-%d")
+    return moment.isoformat(sep=" ")
+
+
+class HistoryStore:
+    # Série triée par date, avec sommes cumulées et totaux journaliers tenus à jour à chaque ajout. Un ajout dans
+    # l'ordre chronologique est en O(1) ; un ajout antérieur à la dernière date est mis en attente (O(1)) et les
+    # ajouts en attente sont fusionnés en un seul passage O(n + k log k) à la lecture suivante
+    def __init__(self, value_name: str, in_range: tuple[float, float] = GLUCOSE_RANGE):
+        self.value_name = value_name
+        self.low, self.high = in_range
+        self._times = array("d")
+        self._values = array("d")
+        # _cumulative[i] = somme des i premières valeurs (même principe pour _cumulative_in_range)
+        self._cumulative = array("d", [0.0])
+        self._cumulative_in_range = array("q", [0])
+        self._daily_totals: dict[int, float] = {}
+        # Ajouts hors ordre (date, valeur) pas encore fusionnés, dans l'ordre des ajouts
+        self._late: list[tuple[float, float]] = []
+
+    def __len__(self) -> int:
+        return len(self._times) + len(self._late)
+
+    def append(self, moment, value: float) -> None:
+        minutes = to_minutes(moment)
+        value = float(value)
+        day = int(minutes // MINUTES_PER_DAY)
+        self._daily_totals[day] = self._daily_totals.get(day, 0.0) + value
+        in_range = self.low <= value <= self.high
+
+        if not self._times or minutes >= self._times[-1]:
+            self._times.append(minutes)
+            self._values.append(value)
+            self._cumulative.append(self._cumulative[-1] + value)
+            self._cumulative_in_range.append(self._cumulative_in_range[-1] + in_range)
+            return
+        # Ajout hors ordre : mis en attente, fusionné à la lecture suivante (voir _merge)
+        self._late.append((minutes, value))
+
+    def _merge(self) -> None:
+        # Insère les ajouts en attente après les valeurs de même date (et, à date égale, dans l'ordre des ajouts),
+        # puis recalcule les sommes cumulées à partir de la première position modifiée, dans le même ordre
+        # d'addition qu'un ajout à la fois
+        if not self._late:
+            return
+        late = sorted(self._late, key=lambda record: record[0])
+        self._late = []
+        late_times = np.array([minutes for minutes, _ in late])
+        late_values = np.array([value for _, value in late])
+        times = np.frombuffer(self._times, dtype=np.float64)
+        positions = np.searchsorted(times, late_times, side="right")
+        start = int(positions[0])
+        merged_times = np.insert(times, positions, late_times)
+        merged_values = np.insert(np.frombuffer(self._values, dtype=np.float64), positions, late_values)
+        tail = merged_values[start:]
+        cumulative = np.cumsum(np.concatenate(([self._cumulative[start]], tail)))
+        in_range = np.cumsum(np.concatenate(([self._cumulative_in_range[start]], (tail >= self.low) & (tail <= self.high))))
+        self._times = array("d", merged_times.tobytes())
+        self._values = array("d", merged_values.tobytes())
+        self._cumulative = self._cumulative[:start] + array("d", cumulative.tobytes())
+        self._cumulative_in_range = self._cumulative_in_range[:start] + array("q", in_range.astype(np.int64).tobytes())
+
+    def copy(self, length: int = None) -> "HistoryStore":
+        # Copie des `length` premières valeurs (ajoutées dans l'ordre chronologique, comme en simulation)
+        self._merge()
+        length = len(self._times) if length is None else length
+        if length > len(self._times):
+            raise ValueError("Impossible de copier plus de valeurs que l'historique n'en contient")
+        clone = HistoryStore.__new__(HistoryStore)
+        clone.value_name = self.value_name
+        clone.low, clone.high = self.low, self.high
+        clone._times = self._times[:length]
+        clone._values = self._values[:length]
+        clone._cumulative = self._cumulative[:length + 1]
+        clone._cumulative_in_range = self._cumulative_in_range[:length + 1]
+        clone._late = []
+        if length == len(self._times):
+            clone._daily_totals = dict(self._daily_totals)
+        else:
+            # Totaux recalculés dans l'ordre des ajouts : mêmes flottants que l'historique d'origine à cette position
+            clone._daily_totals = {}
+            for minutes, value in zip(clone._times, clone._values):
+                day = int(minutes // MINUTES_PER_DAY)
+                clone._daily_totals[day] = clone._daily_totals.get(day, 0.0) + value
+        return clone
+
+    def forget_before(self, moment) -> None:
+        # Oublie les jours calendaires antérieurs à celui de `moment` : seules les différences de sommes cumulées
+        # sont lues, le préfixe peut donc être retiré sans recalcul
+        self._merge()
+        first_day = int(to_minutes(moment) // MINUTES_PER_DAY)
+        count = bisect_left(self._times, first_day * MINUTES_PER_DAY)
+        if count:
+            del self._times[:count]
+            del self._values[:count]
+            del self._cumulative[:count]
+            del self._cumulative_in_range[:count]
+        for day in [day for day in self._daily_totals if day < first_day]:
+            del self._daily_totals[day]
+
+    def extend(self, records) -> None:
+        for record in records:
+            self.append(record["date"], record[self.value_name])
+
+    def _bounds(self, start=None, end=None) -> tuple[int, int]:
+        # Intervalle [start, end[ ; une borne absente couvre tout l'historique
+        self._merge()
+        lo = 0 if start is None else bisect_left(self._times, to_minutes(start))
+        hi = len(self._times) if end is None else bisect_left(self._times, to_minutes(end))
+        return lo, max(lo, hi)
+
+    def window(self, start=None, end=None) -> tuple[np.ndarray, np.ndarray]:
+        lo, hi = self._bounds(start, end)
+        times = np.frombuffer(self._times, dtype=np.float64)[lo:hi].copy()
+        values = np.frombuffer(self._values, dtype=np.float64)[lo:hi].copy()
+        return times, values
+
+    def records(self, start=None, end=None) -> list[dict]:
+        lo, hi = self._bounds(start, end)
+        return [{"date": format_date(self._times[i]), self.value_name: self._as_number(self._values[i])} for i in range(lo, hi)]
+
+    @staticmethod
+    def _as_number(value: float):
+        return int(value) if value.is_integer() else value
+
+    def count(self, start=None, end=None) -> int:
+        lo, hi = self._bounds(start, end)
+        return hi - lo
+
+    def total(self, start=None, end=None) -> float:
+        lo, hi = self._bounds(start, end)
+        return self._cumulative[hi] - self._cumulative[lo]
+
+    def mean(self, start=None, end=None) -> float | None:
+        lo, hi = self._bounds(start, end)
+        if hi == lo:
+            return None
+        return (self._cumulative[hi] - self._cumulative[lo]) / (hi - lo)
+
+    def time_in_range(self, start=None, end=None) -> float | None:
+        lo, hi = self._bounds(start, end)
+        if hi == lo:
+            return None
+        return (self._cumulative_in_range[hi] - self._cumulative_in_range[lo]) / (hi - lo) * 100
+
+    def gmi(self, start=None, end=None) -> float | None:
+        # Glucose Management Indicator (%) à partir de la glycémie moyenne en mg/dL
+        mean = self.mean(start, end)
+        return None if mean is None else 3.31 + 0.02392 * mean
+
+    def daily_totals(self, start=None, end=None) -> dict[str, float]:
+        first = None if start is None else to_minutes(start) // MINUTES_PER_DAY
+        last = None if end is None else to_minutes(end) // MINUTES_PER_DAY
+        return {
+            from_minutes(day * MINUTES_PER_DAY).strftime("%Y-%m-%d"): total
+            for day, total in sorted(self._daily_totals.items())
+            if (first is None or day >= first) and (last is None or day < last)
+        }
+
+    def last_days(self, days: int) -> tuple[datetime, datetime] | None:
+        # Fenêtre des `days` derniers jours calendaires, jusqu'à la dernière valeur incluse
+        self._merge()
+        if not self._times:
+            return None
+        last_day = int(self._times[-1] // MINUTES_PER_DAY)
+        return from_minutes((last_day - days + 1) * MINUTES_PER_DAY), from_minutes((last_day + 1) * MINUTES_PER_DAY)
+
+    def summary(self, days: int) -> dict:
+        bounds = self.last_days(days)
+        if bounds is None:
+            return {"count": 0, "mean": None, "time_in_range": None, "gmi": None, "daily_totals": {}}
+        start, end = bounds
+        return {
+            "count": self.count(start, end),
+            "mean": self.mean(start, end),
+            "time_in_range": self.time_in_range(start, end),
+            "gmi": self.gmi(start, end),
+            "daily_totals": self.daily_totals(start, end),
+        }
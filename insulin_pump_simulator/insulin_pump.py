@@ -1,14 +1,20 @@
+import numpy as np
 from .config import PumpConfig  # Ajout du point pour l'importation relative
+from .alarms import AlarmManager
+from .bolus import meal_boluses, correction_boluses, bolus_table, DEFAULT_CARB_GRID, DEFAULT_GLUCOSE_GRID
 
 class InsulinPump:
-    def __init__(self):
-        self.config = PumpConfig()
-        self.alarms = []
+    __slots__ = ("config", "alarms", "last_message", "battery_level")
+
+    def __init__(self, config_path: str = None):
+        self.config = PumpConfig(config_path=config_path)
+        # Alarmes dédoublonnées, en mémoire bornée (voir alarms.py)
+        self.alarms = AlarmManager()
         self.last_message = ""
         self.battery_level = 100
 
     def deliver_basal(self, hour: int) -> float:
-        basal_rate = self.config.basal_rates[int(hour) % 24]
+        basal_rate = self.config.effective_basal_rates[int(hour) % 24]
         self.last_message = f"Insuline basale administrée : {basal_rate:.1f} U"
         return basal_rate
 
@@ -29,19 +35,39 @@ class InsulinPump:
         bolus = carbs / insulin_to_carb_ratio
         return round(bolus, 2)
 
-    def calculate_correction_bolus(self, current_glucose: float, target_glucose: float) -> float:
+    def calculate_correction_bolus(self, current_glucose: float, target_glucose: float, insulin_on_board: float = 0.0) -> float:
         insulin_sensitivity_factor = self.config.insulin_sensitivity_factor
         correction = (current_glucose - target_glucose) / insulin_sensitivity_factor
+        if insulin_on_board:
+            # On déduit l'insuline encore active pour ne pas empiler les corrections
+            correction = max(0.0, correction - insulin_on_board)
         return round(correction, 2)
 
+    def calculate_meal_boluses(self, carbs, clip: bool = True) -> np.ndarray:
+        # Version tableau de calculate_meal_bolus, sans message ; plafonnée à max_bolus par défaut
+        return meal_boluses(carbs, self.config.insulin_to_carb_ratio, self.config.max_bolus if clip else None)
+
+    def calculate_correction_boluses(self, current_glucose, target_glucose, insulin_on_board=None, clip: bool = True) -> np.ndarray:
+        return correction_boluses(current_glucose, target_glucose, self.config.insulin_sensitivity_factor, insulin_on_board,
+                                  self.config.max_bolus if clip else None)
+
+    def bolus_table(self, target_glucose: float, carbs: tuple = DEFAULT_CARB_GRID, glucose: tuple = DEFAULT_GLUCOSE_GRID) -> tuple[np.ndarray, np.ndarray]:
+        config = self.config
+        return bolus_table(tuple(carbs), tuple(glucose), target_glucose, config.insulin_to_carb_ratio,
+                           config.insulin_sensitivity_factor, config.max_bolus)
+
     def apply_configuration(self, config: PumpConfig) -> None:
         self.config = config
         self.last_message = "Nouvelle configuration appliquée"
 
-    def add_alarm(self, alarm: str) -> None:
-        self.alarms.append(alarm)
-        self.last_message = f"Alarme ajoutée : {alarm}"
+    def add_alarm(self, alarm) -> bool:
+        # Une alarme déjà active n'est ni ajoutée ni notifiée une seconde fois
+        if not self.alarms.raise_alarm(alarm):
+            return False
+        self.last_message = f"Alarme ajoutée : {self.alarms[-1]}"
+        return True
 
     def deliver_adjusted_basal(self, adjustment: float) -> None:
-        self.config.basal_rates[0] += adjustment / 24
+        config = self.config
+        config.set_basal_rate(0, config.programmed_basal_rates[0] + adjustment / 24)
         self.last_message = f"Dose ajustée administrée : {adjustment} U"
\ No newline at end of file
@@ -0,0 +1,53 @@
+import math
+import numpy as np
+
+INSULIN_PEAK_MINUTES = 75
+CARB_PEAK_MINUTES = 45
+
+
+def absorption_rate(peak_minutes):
+    # Fraction transférée par minute ; math.exp pour chaque valeur afin que le calcul scalaire
+    # et le calcul vectorisé donnent exactement les mêmes flottants
+    if np.ndim(peak_minutes) == 0:
+        return 1 - math.exp(-1 / peak_minutes)
+    return np.array([1 - math.exp(-1 / peak) for peak in np.asarray(peak_minutes, dtype=float).tolist()])
+
+
+class Absorption:
+    # Deux compartiments en série (dépôt sous-cutané puis compartiment actif), chacun vidé à taux constant :
+    # la courbe d'action d'une dose culmine après `peak_minutes` et son effet total reste égal à la dose.
+    # Chaque minute ne coûte que quelques opérations, quelle que soit la longueur de l'historique.
+    # Avec `size`, l'état est un tableau et un seul appel fait avancer tous les patients.
+    __slots__ = ("peak_minutes", "rate", "depot", "active")
+
+    def __init__(self, peak_minutes=INSULIN_PEAK_MINUTES, size: int = None):
+        self.peak_minutes = peak_minutes
+        self.rate = absorption_rate(peak_minutes)
+        if size is None:
+            self.depot = 0.0
+            self.active = 0.0
+        else:
+            self.depot = np.zeros(size)
+            self.active = np.zeros(size)
+
+    @property
+    def on_board(self):
+        return self.depot + self.active
+
+    def step(self, amount=0):
+        # Ajoute la dose de la minute et renvoie la quantité absorbée pendant cette minute
+        self.depot += amount
+        transfer = self.depot * self.rate
+        self.depot -= transfer
+        absorbed = self.active * self.rate
+        self.active += transfer
+        self.active -= absorbed
+        return absorbed
+
+    def copy(self) -> "Absorption":
+        clone = Absorption.__new__(Absorption)
+        clone.peak_minutes = self.peak_minutes
+        clone.rate = self.rate
+        clone.depot = self.depot.copy() if isinstance(self.depot, np.ndarray) else self.depot
+        clone.active = self.active.copy() if isinstance(self.active, np.ndarray) else self.active
+        return clone
@@ -0,0 +1,234 @@
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+# Seuils glycémiques (mg/dL) du consensus international sur le temps dans la cible
+VERY_LOW_GLUCOSE = 54
+LOW_GLUCOSE = 70
+HIGH_GLUCOSE = 180
+VERY_HIGH_GLUCOSE = 250
+# Durée minimale (en minutes consécutives) pour compter un épisode d'hypo (< 70) ou d'hyper (> 250)
+EPISODE_MINUTES = 15
+# Seuils des zones de CohortMetrics, en colonnes pour comparer tous les patients d'un coup
+_LOWER_BOUNDS = np.array([[VERY_LOW_GLUCOSE], [LOW_GLUCOSE]], dtype=float)
+_UPPER_BOUNDS = np.array([[HIGH_GLUCOSE], [VERY_HIGH_GLUCOSE]], dtype=float)
+
+
+def gmi(mean_glucose: float) -> float:
+    # Glucose Management Indicator (%) à partir de la glycémie moyenne en mg/dL
+    return 3.31 + 0.02392 * mean_glucose
+
+
+class GlycemicMetrics:
+    # Métriques tenues à jour à chaque minute enregistrée : chaque ajout est en O(1), la variance suit
+    # l'algorithme de Welford et les épisodes sont détectés au fil de l'eau (aucun passage sur le journal)
+    __slots__ = ("count", "mean", "_m2", "min", "max", "very_low", "low", "in_range", "high", "very_high",
+                 "hypo_episodes", "hyper_episodes", "_hypo_run", "_hyper_run", "total_insulin", "minutes")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        # Nombre de minutes dans chaque zone
+        self.very_low = 0
+        self.low = 0
+        self.in_range = 0
+        self.high = 0
+        self.very_high = 0
+        self.hypo_episodes = 0
+        self.hyper_episodes = 0
+        # Longueur de la série en cours sous LOW_GLUCOSE / au-dessus de VERY_HIGH_GLUCOSE
+        self._hypo_run = 0
+        self._hyper_run = 0
+        self.total_insulin = 0.0
+        # Minutes simulées, y compris celles sans ligne au journal (simulateur à événements)
+        self.minutes = 0
+
+    def add(self, glucose: float, insulin: float = 0.0, minutes: int = 1) -> None:
+        self.count += 1
+        self.minutes += minutes
+        self.total_insulin += insulin
+        delta = glucose - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (glucose - self.mean)
+        if glucose < self.min:
+            self.min = glucose
+        if glucose > self.max:
+            self.max = glucose
+
+        if glucose < LOW_GLUCOSE:
+            self.low += 1
+            if glucose < VERY_LOW_GLUCOSE:
+                self.very_low += 1
+            self._hypo_run += 1
+            if self._hypo_run == EPISODE_MINUTES:
+                self.hypo_episodes += 1
+            self._hyper_run = 0
+            return
+        self._hypo_run = 0
+        if glucose <= HIGH_GLUCOSE:
+            self.in_range += 1
+            self._hyper_run = 0
+            return
+        self.high += 1
+        if glucose > VERY_HIGH_GLUCOSE:
+            self.very_high += 1
+            self._hyper_run += 1
+            if self._hyper_run == EPISODE_MINUTES:
+                self.hyper_episodes += 1
+        else:
+            self._hyper_run = 0
+
+    def add_insulin(self, insulin: float, minutes: int = 0) -> None:
+        # Insuline administrée hors des minutes enregistrées
+        self.total_insulin += insulin
+        self.minutes += minutes
+
+    @property
+    def variance(self) -> float | None:
+        return self._m2 / (self.count - 1) if self.count > 1 else None
+
+    def copy(self) -> "GlycemicMetrics":
+        clone = GlycemicMetrics.__new__(GlycemicMetrics)
+        for name in self.__slots__:
+            setattr(clone, name, getattr(self, name))
+        return clone
+
+    def state(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    @classmethod
+    def from_state(cls, state: tuple) -> "GlycemicMetrics":
+        metrics = cls.__new__(cls)
+        for name, value in zip(cls.__slots__, state):
+            setattr(metrics, name, value)
+        return metrics
+
+    def summary(self) -> dict:
+        if self.count == 0:
+            return {"count": 0, "total_insulin": self.total_insulin}
+        variance = self.variance
+        sd = variance ** 0.5 if variance is not None else 0.0
+        days = self.minutes / MINUTES_PER_DAY
+        return {
+            "count": self.count,
+            "mean_glucose": self.mean,
+            "min_glucose": self.min,
+            "max_glucose": self.max,
+            "sd_glucose": sd,
+            "cv": sd / self.mean * 100 if self.mean else None,
+            "gmi": gmi(self.mean),
+            "time_in_range": self.in_range / self.count * 100,
+            "time_below_range": self.low / self.count * 100,
+            "time_below_54": self.very_low / self.count * 100,
+            "time_above_range": self.high / self.count * 100,
+            "time_above_250": self.very_high / self.count * 100,
+            "hypo_episodes": self.hypo_episodes,
+            "hyper_episodes": self.hyper_episodes,
+            "total_insulin": self.total_insulin,
+            "daily_insulin": self.total_insulin / days if days else None,
+        }
+
+
+class CohortMetrics:
+    # GlycemicMetrics pour N patients : chaque minute est une seule mise à jour vectorisée. Les compteurs des
+    # quatre zones sont empilés (une comparaison et une addition pour toutes les zones) et les tableaux
+    # intermédiaires sont alloués une fois
+    ZONES = ("very_low", "low", "high", "very_high")
+
+    def __init__(self, size: int):
+        self.count = 0
+        self.mean = np.zeros(size)
+        self._m2 = np.zeros(size)
+        self.min = np.full(size, np.inf)
+        self.max = np.full(size, -np.inf)
+        # Minutes < 54, < 70, > 180, > 250 (lignes dans l'ordre de ZONES)
+        self.zone_counts = np.zeros((4, size), dtype=np.int64)
+        # Séries en cours puis épisodes : ligne 0 pour l'hypo (< 70), ligne 1 pour l'hyper (> 250)
+        self._runs = np.zeros((2, size), dtype=np.int64)
+        self.episodes = np.zeros((2, size), dtype=np.int64)
+        self.total_insulin = np.zeros(size)
+        self._zones = np.empty((4, size), dtype=bool)
+        self._delta = np.empty(size)
+        self._scratch = np.empty(size)
+
+    @property
+    def size(self) -> int:
+        return self.mean.size
+
+    def add(self, glucose: np.ndarray, insulin=0.0) -> None:
+        self.count += 1
+        self.total_insulin += insulin
+        delta = np.subtract(glucose, self.mean, out=self._delta)
+        # Même division que GlycemicMetrics.add : résultats identiques au simulateur scalaire
+        self.mean += np.divide(delta, self.count, out=self._scratch)
+        np.subtract(glucose, self.mean, out=self._scratch)
+        self._scratch *= delta
+        self._m2 += self._scratch
+        np.minimum(self.min, glucose, out=self.min)
+        np.maximum(self.max, glucose, out=self.max)
+
+        zones = self._zones
+        np.less(glucose, _LOWER_BOUNDS, out=zones[:2])
+        np.greater(glucose, _UPPER_BOUNDS, out=zones[2:])
+        self.zone_counts += zones
+        # Séries en cours : +1 dans la zone (< 70, > 250), remise à zéro sinon
+        self._runs += 1
+        self._runs *= zones[1::2]
+        self.episodes += self._runs == EPISODE_MINUTES
+
+    def keep(self, indices) -> None:
+        # Ne garde que les patients `indices` (voir CohortSimulator.keep)
+        for name in ("mean", "_m2", "min", "max", "total_insulin"):
+            setattr(self, name, getattr(self, name)[indices])
+        for name in ("zone_counts", "_runs", "episodes"):
+            setattr(self, name, getattr(self, name)[:, indices])
+        size = self.mean.size
+        self._zones = np.empty((4, size), dtype=bool)
+        self._delta = np.empty(size)
+        self._scratch = np.empty(size)
+
+    def patient(self, index: int) -> GlycemicMetrics:
+        # Métriques d'un patient, au même format que le simulateur scalaire
+        metrics = GlycemicMetrics()
+        metrics.count = self.count
+        metrics.minutes = self.count
+        metrics.mean = float(self.mean[index])
+        metrics._m2 = float(self._m2[index])
+        metrics.min = float(self.min[index])
+        metrics.max = float(self.max[index])
+        for name, count in zip(self.ZONES, self.zone_counts[:, index].tolist()):
+            setattr(metrics, name, count)
+        metrics.in_range = self.count - metrics.low - metrics.high
+        metrics.hypo_episodes, metrics.hyper_episodes = self.episodes[:, index].tolist()
+        metrics._hypo_run, metrics._hyper_run = self._runs[:, index].tolist()
+        metrics.total_insulin = float(self.total_insulin[index])
+        return metrics
+
+    def summary(self) -> dict[str, np.ndarray]:
+        # Une valeur par patient pour chaque métrique
+        if self.count == 0:
+            return {"count": 0, "total_insulin": self.total_insulin.copy()}
+        sd = np.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else np.zeros(self.size)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cv = np.where(self.mean != 0, sd / self.mean * 100, np.nan)
+        very_low, low, high, very_high = self.zone_counts
+        return {
+            "count": self.count,
+            "mean_glucose": self.mean.copy(),
+            "min_glucose": self.min.copy(),
+            "max_glucose": self.max.copy(),
+            "sd_glucose": sd,
+            "cv": cv,
+            "gmi": gmi(self.mean),
+            "time_in_range": (self.count - low - high) / self.count * 100,
+            "time_below_range": low / self.count * 100,
+            "time_below_54": very_low / self.count * 100,
+            "time_above_range": high / self.count * 100,
+            "time_above_250": very_high / self.count * 100,
+            "hypo_episodes": self.episodes[0].copy(),
+            "hyper_episodes": self.episodes[1].copy(),
+            "total_insulin": self.total_insulin.copy(),
+            "daily_insulin": self.total_insulin / (self.count / MINUTES_PER_DAY),
+        }
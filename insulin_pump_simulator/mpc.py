@@ -0,0 +1,264 @@
+from functools import lru_cache
+import numpy as np
+from .kinetics import Absorption
+
+# Horizon de prédiction et découpage des commandes (un taux basal constant par bloc), en minutes. L'horizon couvre
+# l'essentiel de l'action d'une dose (pic à 75 minutes) : plus court, l'insuline qui agit après l'horizon n'est pas
+# vue et le contrôleur surdose
+HORIZON_MINUTES = 360
+BLOCK_MINUTES = 30
+# Poids de l'écart au basal de référence, relatif à l'erreur de glycémie (mg/dL)² cumulée sur l'horizon
+REGULARIZATION = 50.0
+# Quand la solution sans contrainte sort des bornes : quelques itérations du gradient projeté pour deviner les
+# bornes actives, puis méthode d'ensembles actifs (solution exacte). Les patients éventuellement non résolus après
+# ACTIVE_SET_ITERATIONS reprennent le gradient projeté jusqu'à un pas inférieur à PROJECTED_TOLERANCE (U/h)
+WARM_START_ITERATIONS = 5
+ACTIVE_SET_ITERATIONS = 50
+PROJECTED_TOLERANCE = 1e-6
+PROJECTED_ITERATIONS = 20_000
+
+
+def _response(peak_minutes, horizon: int, depot: float = 0.0, active: float = 0.0, dose: float = 0.0) -> np.ndarray:
+    # Quantité cumulée absorbée à la fin de chaque minute, à partir d'un état ou d'une dose, avec la même
+    # récurrence que Absorption.step (None : absorption immédiate, comme Patient sans cinétique)
+    if peak_minutes is None:
+        absorbed = np.zeros(horizon)
+        absorbed[0] = dose
+        return np.cumsum(absorbed)
+    absorption = Absorption(peak_minutes)
+    absorption.depot, absorption.active = depot, active
+    absorbed = [absorption.step(dose if minute == 0 else 0) for minute in range(horizon)]
+    return np.cumsum(absorbed)
+
+
+class MPCModel:
+    # Matrices de prédiction pour une cinétique donnée, à sensibilité unitaire. Glycémie prédite après k minutes :
+    #   g + cs * (réponse libre des glucides) - is * (réponse libre de l'insuline active) - is * (S @ u)[k]
+    # avec u les taux basaux (U/h) des blocs. Le hessien S'S est diagonalisé une fois : pour une sensibilité `is`
+    # et une régularisation `lam`, (is² S'S + lam I)⁻¹ = V diag(1 / (is² L + lam)) V', sans autre factorisation,
+    # ce qui permet de résoudre d'un coup pour des patients de sensibilités différentes.
+    def __init__(self, insulin_peak=None, carb_peak=None, horizon: int = HORIZON_MINUTES, block_minutes: int = BLOCK_MINUTES):
+        if horizon % block_minutes:
+            raise ValueError("L'horizon doit être un multiple de la durée d'un bloc")
+        self.insulin_peak = insulin_peak
+        self.carb_peak = carb_peak
+        self.horizon = horizon
+        self.block_minutes = block_minutes
+        self.blocks = horizon // block_minutes
+        # Insuline absorbée cumulée (ligne k) pour une dose unitaire à la minute j : matrice de Toeplitz
+        unit = _response(insulin_peak, horizon, dose=1.0)
+        lags = np.arange(horizon)[:, None] - np.arange(horizon)[None, :]
+        toeplitz = np.where(lags >= 0, unit[np.clip(lags, 0, None)], 0.0)
+        # Un taux de 1 U/h pendant un bloc : 1/60 U à chaque minute du bloc
+        blocks = np.repeat(np.eye(self.blocks), block_minutes, axis=0) / 60
+        self.prediction = toeplitz @ blocks
+        # Réponses libres : insuline dans le dépôt / le compartiment actif, glucides de même
+        self.insulin_depot = _response(insulin_peak, horizon, depot=1.0) if insulin_peak is not None else None
+        self.insulin_active = _response(insulin_peak, horizon, active=1.0) if insulin_peak is not None else None
+        self.carb_depot = _response(carb_peak, horizon, depot=1.0) if carb_peak is not None else None
+        self.carb_active = _response(carb_peak, horizon, active=1.0) if carb_peak is not None else None
+        self.hessian = self.prediction.T @ self.prediction
+        self.eigenvalues, self.eigenvectors = np.linalg.eigh(self.hessian)
+        # Projections S' r des réponses libres : le second membre se calcule en O(patients x blocs), sans
+        # construire la prédiction complète (patients x minutes)
+        self._projected = {
+            name: (response @ self.prediction if response is not None else None)
+            for name, response in (("constant", np.ones(horizon)), ("insulin_depot", self.insulin_depot),
+                                   ("insulin_active", self.insulin_active), ("carb_depot", self.carb_depot),
+                                   ("carb_active", self.carb_active))
+        }
+        # Hessiens réduits diagonalisés, par ensemble de blocs libres (voir _reduced_factorization)
+        self._reduced = {}
+        for array in (self.prediction, self.hessian, self.eigenvalues, self.eigenvectors, *self._projected.values()):
+            if array is not None:
+                array.flags.writeable = False
+
+    def free_response(self, glucose, insulin_sensitivity, carb_sensitivity, insulin_state=None, carb_state=None) -> np.ndarray:
+        # Glycémie prédite (patients x minutes) si aucune nouvelle insuline n'était administrée
+        glucose = np.asarray(glucose, dtype=float)
+        response = np.repeat(glucose[:, None], self.horizon, axis=1)
+        if insulin_state is not None and self.insulin_depot is not None:
+            depot, active = (np.asarray(value, dtype=float)[:, None] for value in insulin_state)
+            response -= np.asarray(insulin_sensitivity)[:, None] * (depot * self.insulin_depot + active * self.insulin_active)
+        if carb_state is not None and self.carb_depot is not None:
+            depot, active = (np.asarray(value, dtype=float)[:, None] for value in carb_state)
+            response += np.asarray(carb_sensitivity)[:, None] * (depot * self.carb_depot + active * self.carb_active)
+        return response
+
+    def solve(self, glucose, target_glucose, insulin_sensitivity, reference_rate, max_rate, carb_sensitivity=1.0,
+              insulin_state=None, carb_state=None, regularization: float = REGULARIZATION) -> np.ndarray:
+        # Taux basaux (patients x blocs) minimisant l'écart à la cible sur l'horizon, sous 0 <= u <= max_rate
+        glucose = np.atleast_1d(np.asarray(glucose, dtype=float))
+        n = glucose.size
+        sensitivity = np.broadcast_to(np.asarray(insulin_sensitivity, dtype=float), (n,))
+        reference = np.broadcast_to(np.asarray(reference_rate, dtype=float), (n,))
+        upper = np.broadcast_to(np.asarray(max_rate, dtype=float), (n,))[:, None]
+        # S' e, avec e la réponse libre moins la cible, par combinaison des projections précalculées
+        projected = self._projected
+        projected_error = (glucose - target_glucose)[:, None] * projected["constant"]
+        if insulin_state is not None and projected["insulin_depot"] is not None:
+            depot, active = (np.asarray(value, dtype=float)[:, None] for value in insulin_state)
+            projected_error -= sensitivity[:, None] * (depot * projected["insulin_depot"] + active * projected["insulin_active"])
+        if carb_state is not None and projected["carb_depot"] is not None:
+            depot, active = (np.asarray(value, dtype=float)[:, None] for value in carb_state)
+            carb_sensitivity = np.broadcast_to(np.asarray(carb_sensitivity, dtype=float), (n,))
+            projected_error += carb_sensitivity[:, None] * (depot * projected["carb_depot"] + active * projected["carb_active"])
+        # Équations normales : (is² S'S + lam I) u = is S' e + lam u_ref
+        rhs = sensitivity[:, None] * projected_error + regularization * reference[:, None]
+        curvature = sensitivity[:, None] ** 2 * self.eigenvalues + regularization
+        rates = ((rhs @ self.eigenvectors) / curvature) @ self.eigenvectors.T
+
+        outside = np.any((rates < 0) | (rates > upper), axis=1)
+        if outside.any():
+            rates[outside] = self._constrained(rates[outside], rhs[outside], sensitivity[outside], upper[outside], regularization)
+        return rates
+
+    def _constrained(self, rates, rhs, sensitivity, upper, regularization) -> np.ndarray:
+        # Méthode primale d'ensembles actifs, tous les patients à la fois, depuis quelques itérations du gradient
+        # projeté. Les blocs de l'ensemble actif restent à leur borne et les autres résolvent les équations
+        # normales réduites ; on avance vers cette solution jusqu'à la première borne rencontrée, qui rejoint
+        # l'ensemble. Une fois la solution atteinte, le bloc dont le multiplicateur a le mauvais signe quitte
+        # l'ensemble ; sinon le patient est résolu : solution exacte en un nombre fini d'itérations
+        n, blocks = rates.shape
+        upper = np.broadcast_to(upper, (n, blocks))
+        rates = self._project(rates, rhs, sensitivity, upper, regularization, WARM_START_ITERATIONS)
+        at_lower, at_upper = rates == 0, rates == upper
+        tolerance = 1e-9 * np.abs(rhs).max(axis=1)
+        pending = np.arange(n)
+        for _ in range(ACTIVE_SET_ITERATIONS):
+            current, bound, scale = rates[pending], upper[pending], sensitivity[pending] ** 2
+            fixed = at_lower | at_upper
+            solution = self._reduced_solution(fixed, current, rhs[pending], scale, regularization)
+            direction = solution - current
+            with np.errstate(divide="ignore", invalid="ignore"):
+                limit = np.where(direction < 0, -current / direction, np.where(direction > 0, (bound - current) / direction, np.inf))
+            limit[fixed] = np.inf
+            blocking = np.argmin(limit, axis=1)
+            step = limit[np.arange(len(pending)), blocking]
+            # Borne rencontrée avant la solution : on s'y arrête et le bloc rejoint l'ensemble actif
+            rows = np.flatnonzero(step < 1)
+            columns = blocking[rows]
+            current[rows] += step[rows, None] * direction[rows]
+            hits_lower = direction[rows, columns] < 0
+            at_lower[rows[hits_lower], columns[hits_lower]] = True
+            at_upper[rows[~hits_lower], columns[~hits_lower]] = True
+            current[rows, columns] = np.where(hits_lower, 0.0, bound[rows, columns])
+            # Solution atteinte : multiplicateurs des bornes actives (gradient >= 0 en bas, <= 0 en haut)
+            reached = np.flatnonzero(step >= 1)
+            current[reached] = solution[reached]
+            gradient = (scale[reached, None] * (solution[reached] @ self.hessian) + regularization * solution[reached]
+                        - rhs[pending[reached]])
+            violation = np.where(at_lower[reached], -gradient, np.where(at_upper[reached], gradient, -np.inf))
+            released = np.argmax(violation, axis=1)
+            release = violation[np.arange(len(reached)), released] > tolerance[pending[reached]]
+            at_lower[reached[release], released[release]] = False
+            at_upper[reached[release], released[release]] = False
+            rates[pending] = current
+            unsolved = np.ones(len(pending), dtype=bool)
+            unsolved[reached[~release]] = False
+            pending, at_lower, at_upper = pending[unsolved], at_lower[unsolved], at_upper[unsolved]
+            if not pending.size:
+                break
+        else:
+            rates[pending] = self._project(rates[pending], rhs[pending], sensitivity[pending], upper[pending], regularization)
+        # Les blocs libres d'une solution exacte peuvent dépasser d'un arrondi
+        return np.clip(rates, 0, upper)
+
+    def _reduced_solution(self, fixed, rates, rhs, scale, regularization) -> np.ndarray:
+        # Solution des équations normales, les blocs `fixed` gardant leur valeur. Les patients sont regroupés par
+        # ensemble de blocs libres, dont le hessien réduit est diagonalisé une fois (comme le hessien complet)
+        solution = rates.copy()
+        codes = fixed @ (1 << np.arange(self.blocks))
+        order = np.argsort(codes, kind="stable")
+        starts = np.flatnonzero(np.diff(codes[order], prepend=-1))
+        for group in np.split(order, starts[1:]):
+            free = ~fixed[group[0]]
+            if not free.any():
+                continue
+            eigenvalues, eigenvectors, coupling = self._reduced_factorization(codes[group[0]], free)
+            columns = np.flatnonzero(free)
+            rows = group[:, None]
+            right = rhs[rows, columns] - scale[group, None] * (rates[group][:, ~free] @ coupling)
+            curvature = scale[group, None] * eigenvalues + regularization
+            solution[rows, columns] = ((right @ eigenvectors) / curvature) @ eigenvectors.T
+        return solution
+
+    def _reduced_factorization(self, code, free) -> tuple:
+        # Au plus 2**blocs ensembles de blocs libres, en pratique quelques dizaines
+        if code not in self._reduced:
+            eigenvalues, eigenvectors = np.linalg.eigh(self.hessian[np.ix_(free, free)])
+            self._reduced[code] = eigenvalues, eigenvectors, self.hessian[np.ix_(~free, free)]
+        return self._reduced[code]
+
+    def _project(self, rates, rhs, sensitivity, upper, regularization, iterations=PROJECTED_ITERATIONS) -> np.ndarray:
+        # Gradient projeté accéléré (Nesterov) sur les bornes, pas 1 / (plus grande valeur propre du hessien de
+        # chaque patient), jusqu'à ce que le pas projeté passe sous PROJECTED_TOLERANCE :
+        #   u <- clip(u - pas * (is² H u + lam u - rhs)) = clip(u * (1 - pas lam) - (pas is²) H u + pas rhs)
+        step = 1 / (sensitivity ** 2 * self.eigenvalues[-1] + regularization)
+        hessian_scale = (step * sensitivity ** 2)[:, None]
+        decay = (1 - step * regularization)[:, None]
+        offset = step[:, None] * rhs
+        rates = np.clip(rates, 0, upper)
+        point = rates.copy()
+        following = np.empty_like(rates)
+        gradient = np.empty_like(rates)
+        for iteration in range(iterations):
+            np.matmul(point, self.hessian, out=gradient)
+            gradient *= hessian_scale
+            gradient -= offset
+            np.multiply(point, decay, out=following)
+            following -= gradient
+            np.maximum(following, 0, out=following)
+            np.minimum(following, upper, out=following)
+            if np.max(np.abs(following - rates)) < PROJECTED_TOLERANCE:
+                return following
+            # point = following + momentum * (following - rates)
+            np.subtract(following, rates, out=point)
+            point *= iteration / (iteration + 3)
+            point += following
+            rates, following = following, rates
+        return rates
+
+
+@lru_cache(maxsize=64)
+def mpc_model(insulin_peak=None, carb_peak=None, horizon: int = HORIZON_MINUTES, block_minutes: int = BLOCK_MINUTES) -> MPCModel:
+    # Matrices partagées par tous les contrôleurs (et toutes les PumpConfig) de même cinétique et même horizon
+    return MPCModel(insulin_peak, carb_peak, horizon, block_minutes)
+
+
+def _state(absorption) -> tuple | None:
+    if absorption is None:
+        return None
+    return np.atleast_1d(absorption.depot), np.atleast_1d(absorption.active)
+
+
+class MPCPolicy:
+    # Mode prédictif de ClosedLoopController : l'état d'absorption et les sensibilités viennent du patient,
+    # les bornes et le basal de référence de la PumpConfig de la pompe
+    def __init__(self, patient, config, horizon: int = HORIZON_MINUTES, block_minutes: int = BLOCK_MINUTES,
+                 regularization: float = REGULARIZATION, reference_rate: float = None):
+        self.patient = patient
+        self.horizon = horizon
+        self.block_minutes = block_minutes
+        self.regularization = regularization
+        insulin_peak = patient.insulin_absorption.peak_minutes if patient.insulin_absorption is not None else None
+        carb_peak = patient.carb_absorption.peak_minutes if patient.carb_absorption is not None else None
+        self.model = mpc_model(insulin_peak, carb_peak, horizon, block_minutes)
+        # Basal de référence : moyenne du planning programmé au moment de l'activation (le contrôleur le
+        # réécrit ensuite)
+        if reference_rate is None:
+            reference_rate = float(np.mean(config.programmed_basal_rates))
+        self.reference_rate = reference_rate
+
+    def options(self) -> dict:
+        # De quoi recréer la même politique (snapshots)
+        return {"horizon": self.horizon, "block_minutes": self.block_minutes, "regularization": self.regularization,
+                "reference_rate": self.reference_rate}
+
+    def basal_rate(self, glucose: float, target_glucose: float, config) -> float:
+        patient = self.patient
+        rates = self.model.solve(glucose, target_glucose, patient.insulin_sensitivity, self.reference_rate, config.max_bolus,
+                                 patient.carb_sensitivity, _state(patient.insulin_absorption), _state(patient.carb_absorption),
+                                 self.regularization)
+        # Commande à horizon glissant : seul le premier bloc est appliqué, recalculé à la mesure suivante
+        return float(rates[0, 0])
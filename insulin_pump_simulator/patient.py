@@ -1,17 +1,39 @@
-import json
-
-with open('data/sample_input_data.json', 'r') as file:
-    data = json.load(file)
-    patient_data = data['basal_insulin_administration']
+from .registry import load_config
+from .kinetics import Absorption
 
 class Patient:
-    def __init__(self, initial_glucose = patient_data["initial_glucose"], insulin_sensitivity = patient_data["cgm_correction"]["insulin_sensitivity_factor"], carb_sensitivity = 1):
+    __slots__ = ("initial_glucose", "glucose_level", "insulin_sensitivity", "carb_sensitivity", "insulin_absorption", "carb_absorption")
+
+    def __init__(self, initial_glucose = None, insulin_sensitivity = None, carb_sensitivity = 1, config_path = None,
+                 insulin_absorption: Absorption = None, carb_absorption: Absorption = None):
+        if initial_glucose is None or insulin_sensitivity is None:
+            patient_data = load_config(config_path)['basal_insulin_administration']
+            if initial_glucose is None:
+                initial_glucose = patient_data["initial_glucose"]
+            if insulin_sensitivity is None:
+                insulin_sensitivity = patient_data["cgm_correction"]["insulin_sensitivity_factor"]
         self.initial_glucose = initial_glucose
         self.glucose_level = initial_glucose
         self.insulin_sensitivity = insulin_sensitivity
         self.carb_sensitivity = carb_sensitivity
+        # Sans modèle d'absorption, l'insuline et les glucides agissent immédiatement
+        self.insulin_absorption = insulin_absorption
+        self.carb_absorption = carb_absorption
+
+    @property
+    def insulin_on_board(self) -> float:
+        return self.insulin_absorption.on_board if self.insulin_absorption is not None else 0.0
+
+    @property
+    def carbs_on_board(self) -> float:
+        return self.carb_absorption.on_board if self.carb_absorption is not None else 0.0
 
     def update_glucose_level(self, insulin=0, carbs=0):
+        # Avec un modèle d'absorption, chaque appel correspond à une minute
+        if self.insulin_absorption is not None:
+            insulin = self.insulin_absorption.step(insulin)
+        if self.carb_absorption is not None:
+            carbs = self.carb_absorption.step(carbs)
         insulin_effect = insulin * self.insulin_sensitivity
         carb_effect = carbs * self.carb_sensitivity
 
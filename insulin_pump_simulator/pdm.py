@@ -1,59 +1,81 @@
 from insulin_pump_simulator.insulin_pump import InsulinPump
 from insulin_pump_simulator.controller import ClosedLoopController
 from insulin_pump_simulator.config import PumpConfig
+from insulin_pump_simulator.registry import load_config
+from insulin_pump_simulator.history import HistoryStore
+from insulin_pump_simulator.alarms import AlarmCode
 from typing import Dict
-import json
+from datetime import datetime
 
 class PDM:
-    def __init__(self, target_glucose: float):
-        with open('data/sample_input_data.json', 'r') as file:
-            data = json.load(file)
+    def __init__(self, target_glucose: float, config_path: str = None, pump: InsulinPump = None):
+        data = load_config(config_path)
 
-        self.pump = InsulinPump()
+        # Un PDM peut piloter une pompe existante (celle d'une simulation par exemple)
+        self.pump = pump if pump is not None else InsulinPump(config_path)
         self.target_glucose = target_glucose
-        self.config = PumpConfig()
-        self.controller = ClosedLoopController(self.target_glucose)
+        self.config = self.pump.config if pump is not None else PumpConfig(config_path=config_path)
+        self.controller = ClosedLoopController(self.target_glucose, pump=pump, config_path=config_path)
+        self.consultation_period = data['history']['consultation_period']
         self.history = {
-            'glucose': data['history']['glucose_history'],
-            'insulin_dose': data['history']['insulin_dose_history']
+            'glucose': HistoryStore("glucose"),
+            'insulin_dose': HistoryStore("dose")
         }
+        self.history['glucose'].extend(data['history']['glucose_history'])
+        self.history['insulin_dose'].extend(data['history']['insulin_dose_history'])
         self.last_message = ""
 
-    def set_meal(self, carbs: float) -> None:
+    def set_meal(self, carbs: float) -> float:
         bolus = self.pump.calculate_meal_bolus(carbs)
         self.pump.deliver_bolus(bolus)
-        print(f"Bolus de repas administré : {bolus} U")
+        self.last_message = f"Bolus de repas administré : {bolus} U"
+        return bolus
 
     def set_target_glucose(self, target: float) -> None:
         self.target_glucose = target
         self.controller.target_glucose = target
-        print(f"Glycémie cible ajustée à {target} mg/dL")
+        self.last_message = f"Glycémie cible ajustée à {target} mg/dL"
 
     def apply_new_config(self, config: PumpConfig) -> None:
         self.pump.apply_configuration(config)
         self.config = config
 
-    def add_alarm(self, alarm: str) -> None:
-        self.pump.add_alarm(alarm)
+    def add_alarm(self, alarm) -> bool:
+        return self.pump.add_alarm(alarm)
 
-    def view_glucose_history(self) -> None:
+    def record_insulin_dose(self, date: datetime, dose: float) -> None:
+        self.history['insulin_dose'].append(date, dose)
+
+    def record_glucose(self, date: datetime, glucose: float) -> None:
+        self.history['glucose'].append(date, glucose)
+
+    def view_glucose_history(self, start=None, end=None) -> None:
         self.last_message = "Historique de glycémie consulté avec succès"
-        return self.history['glucose']
+        return self.history['glucose'].records(start, end)
     
-    def view_insulin_dose_history(self) -> None:
+    def view_insulin_dose_history(self, start=None, end=None) -> None:
         self.last_message = "Historique de glycémie consulté avec succès"
-        return self.history['insulin_dose']
+        return self.history['insulin_dose'].records(start, end)
+
+    def glucose_summary(self, days: int = None) -> dict:
+        # Moyenne, temps dans la cible et GMI sur la période de consultation
+        return self.history['glucose'].summary(days or self.consultation_period)
+
+    def insulin_daily_totals(self, days: int = None) -> dict[str, float]:
+        return self.history['insulin_dose'].summary(days or self.consultation_period)["daily_totals"]
 
     def set_mode(self, mode: str, config: Dict) -> None:
         self.config.modes[mode] = config
-        self.pump.config.active_mode = mode
-        self.pump.apply_configuration(self.pump.config.modes[mode])
+        self.pump.config.modes[mode] = config
+        self.pump.config.apply_mode(mode, config)
         self.last_message = f"Mode '{mode}' configuré avec succès"
 
     def check_battery_level(self) -> None:
         if self.pump.battery_level < 20:
             self.add_alarm("Low battery alert")
             self.pump.last_message = f"Alerte : Batterie faible, niveau actuel à {self.pump.battery_level} %"
+        else:
+            self.pump.alarms.clear(AlarmCode.LOW_BATTERY)
         return self.pump.last_message, self.pump.alarms
     
     def get_mode(self) -> str:
@@ -68,6 +90,6 @@ class PDM:
             raise ValueError(f"Mode {mode} not found")
         
     def apply_configuration(self, config) -> None:
-        if config["basal_rate_adjustment"] is not None:
-            self.pump.config.basal_rates = [round(rate * config["basal_rate_adjustment"], 2) for rate in self.pump.config.basal_rates]
-        self.last_message = "Nouvelle configuration appliquée"
\ No newline at end of file
+        # Réglages du mode actif : le planning effectif est recalculé depuis le planning programmé
+        self.pump.config.apply_mode(self.pump.config.active_mode, config)
+        self.last_message = "Nouvelle configuration appliquée"
@@ -0,0 +1,91 @@
+import json
+import time
+from functools import wraps
+from typing import Callable
+
+# Nombre maximal d'événements gardés pour l'export Chrome : les compteurs restent exacts au-delà
+MAX_TRACE_EVENTS = 1_000_000
+
+
+class Profiler:
+    # Temps cumulé (ns) et nombre d'appels par phase. Rien n'est mesuré tant qu'aucun objet n'est
+    # instrumenté : les méthodes chronométrées sont des attributs d'instance posés par instrument()
+    def __init__(self, trace: bool = False, max_events: int = MAX_TRACE_EVENTS, clock: Callable[[], int] = time.perf_counter_ns):
+        self.clock = clock
+        self.totals: dict[str, int] = {}
+        self.counts: dict[str, int] = {}
+        # Événements (phase, début, durée) pour l'export Chrome, seulement si trace=True
+        self.events: list[tuple[str, int, int]] | None = [] if trace else None
+        self.max_events = max_events
+        self.dropped_events = 0
+
+    def add(self, phase: str, start: int, end: int) -> None:
+        duration = end - start
+        self.totals[phase] = self.totals.get(phase, 0) + duration
+        self.counts[phase] = self.counts.get(phase, 0) + 1
+        if self.events is not None:
+            if len(self.events) < self.max_events:
+                self.events.append((phase, start, duration))
+            else:
+                self.dropped_events += 1
+
+    def wrap(self, phase: str, function: Callable) -> Callable:
+        clock = self.clock
+        add = self.add
+
+        @wraps(function)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                add(phase, start, clock())
+        return timed
+
+    def reset(self) -> None:
+        self.totals.clear()
+        self.counts.clear()
+        if self.events is not None:
+            self.events.clear()
+        self.dropped_events = 0
+
+    def summary(self) -> dict[str, dict]:
+        return {
+            phase: {
+                "calls": self.counts[phase],
+                "total_seconds": total / 1e9,
+                "mean_us": total / self.counts[phase] / 1e3,
+            }
+            for phase, total in sorted(self.totals.items(), key=lambda item: -item[1])
+        }
+
+    def to_json(self, indent: int = None) -> str:
+        return json.dumps(self.summary(), indent=indent)
+
+    def chrome_trace(self, process_name: str = "insulin_pump_simulator") -> dict:
+        # Format « Trace Event » (chrome://tracing, Perfetto) : événements complets, temps en microsecondes
+        if self.events is None:
+            raise ValueError("Profiler(trace=True) est requis pour exporter une trace Chrome")
+        origin = min((start for _, start, _ in self.events), default=0)
+        events = [{"name": "process_name", "ph": "M", "pid": 0, "tid": 0, "args": {"name": process_name}}]
+        events.extend(
+            {"name": phase, "cat": "simulation", "ph": "X", "pid": 0, "tid": 0, "ts": (start - origin) / 1e3, "dur": duration / 1e3}
+            for phase, start, duration in self.events
+        )
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"dropped_events": self.dropped_events}}
+
+    def write_chrome_trace(self, path, process_name: str = "insulin_pump_simulator") -> None:
+        with open(path, "w") as file:
+            json.dump(self.chrome_trace(process_name), file)
+
+
+def instrument(target, phases: dict[str, str], profiler: Profiler) -> None:
+    # Remplace, sur cette instance seulement, chaque méthode `phases[phase]` par sa version chronométrée
+    uninstrument(target, phases)
+    for phase, name in phases.items():
+        setattr(target, name, profiler.wrap(phase, getattr(target, name)))
+
+
+def uninstrument(target, phases: dict[str, str]) -> None:
+    for name in phases.values():
+        target.__dict__.pop(name, None)
@@ -0,0 +1,166 @@
+from typing import Iterator
+import numpy as np
+
+# Codes d'événements combinables dans la colonne `events`
+EVENT_MEASURE = 1
+EVENT_HOURLY_BASAL = 2
+EVENT_CORRECTION = 4
+EVENT_MEAL = 8
+
+# Indicateurs d'alarmes combinables dans la colonne `alarms`
+ALARM_HIGH_GLUCOSE = 1
+ALARM_LOW_GLUCOSE = 2
+ALARM_LOW_BATTERY = 4
+
+COLUMNS = {
+    "time": np.int32,
+    "glucose": np.float64,
+    "adjustment": np.float64,
+    "basal": np.float64,
+    "correction": np.float64,
+    "meal": np.float64,
+    "events": np.uint8,
+    "mode": np.uint8,
+    "alarms": np.uint8,
+}
+
+# Nombre de lignes converties à la fois lors du rendu : la mémoire reste bornée quelle que soit la durée
+RENDER_CHUNK = 4096
+
+
+class SimulationRecorder:
+    def __init__(self, capacity: int = 0):
+        self._columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return len(self._columns["time"])
+
+    @property
+    def nbytes_per_row(self) -> int:
+        return sum(np.dtype(dtype).itemsize for dtype in COLUMNS.values())
+
+    def reserve(self, capacity: int) -> None:
+        if capacity <= self.capacity:
+            return
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+
+    def copy(self, length: int = None, capacity: int = 0) -> "SimulationRecorder":
+        # Copie des `length` premières lignes (toutes par défaut), avec de la place pour `capacity` lignes
+        length = self._size if length is None else length
+        if length > self._size:
+            raise ValueError("Impossible de copier plus de lignes que le journal n'en contient")
+        clone = SimulationRecorder(max(capacity, length))
+        for name, column in self._columns.items():
+            clone._columns[name][:length] = column[:length]
+        clone._size = length
+        return clone
+
+    def append(self, time: int, glucose: float, adjustment: float, basal: float, correction: float, meal: float, events: int, mode: int = 0, alarms: int = 0) -> None:
+        index = self._size
+        if index == self.capacity:
+            self.reserve(max(16, 2 * index))
+        columns = self._columns
+        columns["time"][index] = time
+        columns["glucose"][index] = glucose
+        columns["adjustment"][index] = adjustment
+        columns["basal"][index] = basal
+        columns["correction"][index] = correction
+        columns["meal"][index] = meal
+        columns["events"][index] = events
+        columns["mode"][index] = mode
+        columns["alarms"][index] = alarms
+        self._size = index + 1
+
+    def column(self, name: str) -> np.ndarray:
+        # Vue sans copie sur les lignes enregistrées
+        return self._columns[name][:self._size]
+
+    @property
+    def time(self) -> np.ndarray:
+        return self.column("time")
+
+    @property
+    def glucose(self) -> np.ndarray:
+        return self.column("glucose")
+
+    @property
+    def adjustment(self) -> np.ndarray:
+        return self.column("adjustment")
+
+    @property
+    def basal(self) -> np.ndarray:
+        return self.column("basal")
+
+    @property
+    def correction(self) -> np.ndarray:
+        return self.column("correction")
+
+    @property
+    def meal(self) -> np.ndarray:
+        return self.column("meal")
+
+    @property
+    def events(self) -> np.ndarray:
+        return self.column("events")
+
+    @property
+    def mode(self) -> np.ndarray:
+        return self.column("mode")
+
+    @property
+    def alarms(self) -> np.ndarray:
+        return self.column("alarms")
+
+    @property
+    def insulin(self) -> np.ndarray:
+        return self.insulin_between(0, self._size)
+
+    def iter_chunks(self, chunk_size: int = RENDER_CHUNK) -> Iterator[dict[str, list]]:
+        for start in range(0, self._size, chunk_size):
+            stop = min(start + chunk_size, self._size)
+            chunk = {name: column[start:stop].tolist() for name, column in self._columns.items()}
+            chunk["insulin"] = self.insulin_between(start, stop).tolist()
+            yield chunk
+
+    def insulin_between(self, start: int, stop: int) -> np.ndarray:
+        # Même calcul que l'ancien insulin_log : les bolus ne sont ajoutés qu'aux minutes où ils ont eu lieu
+        events = self._columns["events"][start:stop]
+        insulin = self._columns["basal"][start:stop].copy()
+        correction = (events & EVENT_CORRECTION) != 0
+        insulin[correction] += self._columns["correction"][start:stop][correction]
+        meal = (events & EVENT_MEAL) != 0
+        insulin[meal] += self._columns["meal"][start:stop][meal]
+        return insulin
+
+    def iter_event_lines(self) -> Iterator[str]:
+        for chunk in self.iter_chunks():
+            for time, glucose, adjustment, correction, meal, events in zip(
+                    chunk["time"], chunk["glucose"], chunk["adjustment"], chunk["correction"], chunk["meal"], chunk["events"]):
+                if events & EVENT_MEASURE:
+                    yield f"Time {time}: Glucose {glucose:.2f}, Adjustment {adjustment:.2f}"
+                if events & EVENT_HOURLY_BASAL:
+                    yield f"Time {time}: administration d'insuline"
+                if events & EVENT_MEASURE:
+                    yield f"Time {time}: mesure de glycémie"
+                if events & EVENT_CORRECTION:
+                    yield f"Time {time}: Bolus de correction calculé : {correction:.2f} U"
+                if events & EVENT_MEAL:
+                    yield f"Bolus alimentaire calculé : {meal:.1f} U"
+
+    def iter_glucose_lines(self) -> Iterator[str]:
+        for chunk in self.iter_chunks():
+            for time, glucose in zip(chunk["time"], chunk["glucose"]):
+                yield f"Time {time}: {glucose:.2f} mg/dL"
+
+    def iter_insulin_lines(self) -> Iterator[str]:
+        for chunk in self.iter_chunks():
+            for time, dose in zip(chunk["time"], chunk["insulin"]):
+                yield f"Time {time}: {dose:.2f} U"
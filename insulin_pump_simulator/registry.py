@@ -0,0 +1,73 @@
+import json
+import threading
+from importlib.resources import files
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Mapping
+
+# Données d'exemple livrées avec le paquet (package_data) : trouvées aussi une fois le paquet installé
+DEFAULT_CONFIG_PATH = Path(str(files("insulin_pump_simulator") / "data" / "sample_input_data.json"))
+
+
+def freeze(value: Any) -> Any:
+    # Vue en lecture seule : dict -> mappingproxy, list -> tuple
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class ConfigRegistry:
+    def __init__(self, default_path: str | Path = DEFAULT_CONFIG_PATH):
+        self.default_path = Path(default_path)
+        self._default_key: Path | None = None
+        self._cache: dict[Path, Mapping] = {}
+        self._lock = threading.Lock()
+
+    def _resolve(self, path: str | Path | None) -> Path:
+        if path is not None:
+            return Path(path).resolve()
+        # Le chemin par défaut n'est résolu qu'au premier chargement, jamais à l'import
+        if self._default_key is None:
+            self._default_key = self.default_path.resolve()
+        return self._default_key
+
+    def set_default_path(self, path: str | Path) -> None:
+        self.default_path = Path(path)
+        self._default_key = None
+
+    def load(self, path: str | Path = None) -> Mapping:
+        key = self._resolve(path)
+        data = self._cache.get(key)
+        if data is None:
+            with self._lock:
+                data = self._cache.get(key)
+                if data is None:
+                    with open(key, "r") as file:
+                        data = freeze(json.load(file))
+                    self._cache[key] = data
+        return data
+
+    def invalidate(self, path: str | Path = None) -> None:
+        # Sans chemin, tout le cache est vidé
+        with self._lock:
+            if path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(self._resolve(path), None)
+
+    def is_loaded(self, path: str | Path = None) -> bool:
+        return self._resolve(path) in self._cache
+
+
+registry = ConfigRegistry()
+
+
+def load_config(path: str | Path = None) -> Mapping:
+    return registry.load(path)
+
+
+def set_default_path(path: str | Path) -> None:
+    # Configuration lue par tous les objets construits sans chemin explicite (pompe, CGM, PDM du simulateur)
+    registry.set_default_path(path)
@@ -0,0 +1,184 @@
+import itertools
+import json
+import math
+from typing import Iterable, Iterator
+import numpy as np
+from .config import PumpConfig
+from .bolus import round2
+from .registry import load_config
+from .simulator import HIGH_GLUCOSE_THRESHOLD
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+MAX_GAP_MINUTES = 15
+RESULT_COLUMNS = ("time", "glucose", "adjustment", "basal_rate", "correction", "basal_dose", "gap")
+
+
+def _to_minutes(values: np.ndarray) -> np.ndarray:
+    # Horodatages numériques (minutes) ou ISO 8601 (convertis en minutes depuis l'époque)
+    try:
+        return values.astype(float)
+    except ValueError:
+        return (values.astype("datetime64[s]") - np.datetime64(0, "s")) / np.timedelta64(1, "m")
+
+
+def read_csv_chunks(path, chunk_size: int = DEFAULT_CHUNK_SIZE, time_column: str = "time", glucose_column: str = "glucose") -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    with open(path, "r") as file:
+        header = next(file).strip().split(",")
+        columns = (header.index(time_column), header.index(glucose_column))
+        while True:
+            lines = list(itertools.islice(file, chunk_size))
+            if not lines:
+                return
+            try:
+                # Cas courant : horodatages numériques et aucune valeur manquante
+                table = np.loadtxt(lines, delimiter=",", usecols=columns, dtype=float, ndmin=2)
+                yield table[:, 0], table[:, 1]
+                continue
+            except ValueError:
+                pass
+            table = np.loadtxt(lines, delimiter=",", usecols=columns, dtype=str, ndmin=2)
+            glucose = np.char.strip(table[:, 1])
+            # Valeurs manquantes (perte du signal du capteur) : NaN
+            glucose[glucose == ""] = "nan"
+            yield _to_minutes(np.char.strip(table[:, 0])), glucose.astype(float)
+
+
+def read_jsonl_chunks(path, chunk_size: int = DEFAULT_CHUNK_SIZE, time_key: str = "time", glucose_key: str = "glucose") -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    with open(path, "r") as file:
+        while True:
+            records = [json.loads(line) for line in itertools.islice(file, chunk_size) if line.strip()]
+            if not records:
+                return
+            times = np.array([record[time_key] for record in records])
+            glucose = np.array([math.nan if record.get(glucose_key) is None else record[glucose_key] for record in records], dtype=float)
+            yield _to_minutes(times), glucose
+
+
+def read_config_readings(section: str = "continuous_glucose_measurement", config_path: str = None) -> tuple[np.ndarray, np.ndarray]:
+    data = load_config(config_path)
+    if section == "continuous_glucose_measurement":
+        records = data[section]["glucose_data"]
+        times = [record["time"] for record in records]
+    elif section == "simulation":
+        records = data[section]["hourly_glucose_data"]
+        times = [record["hour"] * 60 for record in records]
+    else:
+        raise ValueError(f"Section sans données de glycémie : {section}")
+    return np.array(times, dtype=float), np.array([record["glucose"] for record in records], dtype=float)
+
+
+class ReplayEngine:
+    # Rejoue des glycémies enregistrées dans ClosedLoopController.adjust_basal_rate et
+    # InsulinPump.calculate_correction_bolus, par blocs vectorisés.
+    def __init__(self, config: PumpConfig = None, target_glucose: float = 120, max_gap_minutes: float = MAX_GAP_MINUTES):
+        self.config = config if config is not None else PumpConfig()
+        self.target_glucose = target_glucose
+        self.max_gap_minutes = max_gap_minutes
+        # Taux basal courant en centièmes d'unité : le contrôleur arrondit toujours au centième,
+        # seul le taux initial peut avoir plus de deux décimales
+        initial_rate = self.config.programmed_basal_rates[0]
+        self.basal_cents = int(round(initial_rate * 100))
+        self._initial_rate = initial_rate if initial_rate != self.basal_cents / 100 else None
+        self.last_time = None
+        self._pending = None
+        self.readings = 0
+        self.dropped = 0
+
+    @staticmethod
+    def _increment(adjustment):
+        # Variation du taux basal en centièmes ; les demi-centièmes exacts sont arrondis par défaut
+        cents = np.rint(np.asarray(adjustment) * 100).astype(np.int64)
+        return np.where(cents % 24 == 12, (cents - 12) // 24, np.rint(cents / 24).astype(np.int64))
+
+    def _basal_cents(self, adjustment: np.ndarray) -> np.ndarray:
+        # round(b + a / 24, 2) en centièmes vaut b + round(A / 24) avec A = 100 a, sauf quand A / 24 tombe
+        # exactement sur un demi-centième : le résultat dépend alors de la représentation binaire du
+        # taux précédent, et ces cas sont recalculés un par un comme le ferait le contrôleur
+        cents = np.rint(adjustment * 100).astype(np.int64)
+        ties = np.flatnonzero(cents % 24 == 12)
+        increments = self._increment(adjustment)
+        basal = self.basal_cents + np.cumsum(increments)
+        deltas = np.zeros(len(basal), dtype=np.int64)
+        offset = 0
+        for index in ties.tolist():
+            previous = int(basal[index - 1]) + offset if index else self.basal_cents
+            exact = int(round(round(previous / 100 + float(adjustment[index]) / 24, 2) * 100))
+            delta = exact - (int(basal[index]) + offset)
+            deltas[index] = delta
+            offset += delta
+        return basal + np.cumsum(deltas)
+
+    def replay_chunk(self, times: np.ndarray, glucose: np.ndarray) -> dict[str, np.ndarray]:
+        times = np.asarray(times, dtype=float)
+        glucose = np.asarray(glucose, dtype=float)
+        valid = ~np.isnan(glucose)
+        if self.last_time is not None:
+            valid &= times > self.last_time
+        if not np.all(np.diff(times) > 0):
+            order = np.argsort(times, kind="stable")
+            times, glucose, valid = times[order], glucose[order], valid[order]
+            valid[1:] &= np.diff(times) > 0
+        self.dropped += int(len(times) - np.count_nonzero(valid))
+        times, glucose = times[valid], glucose[valid]
+        if len(times) == 0:
+            return self._empty()
+
+        adjustment = round2((glucose - self.target_glucose) / self.config.insulin_sensitivity_factor)
+        if self._initial_rate is not None:
+            self.basal_cents = int(round(round(self._initial_rate + float(adjustment[0]) / 24, 2) * 100)) - int(self._increment(adjustment[0]))
+            self._initial_rate = None
+        basal_cents = self._basal_cents(adjustment)
+        self.basal_cents = int(basal_cents[-1])
+        basal_rate = basal_cents / 100
+        correction = np.where(glucose > HIGH_GLUCOSE_THRESHOLD, adjustment, 0.0)
+
+        # Le basal choisi à une lecture est administré jusqu'à la lecture suivante, au plus max_gap_minutes
+        previous = np.concatenate(([np.nan if self.last_time is None else self.last_time], times[:-1]))
+        gap = (times - previous) > self.max_gap_minutes
+        self.last_time = float(times[-1])
+        self.readings += len(times)
+        chunk = {"time": times, "glucose": glucose, "adjustment": adjustment, "basal_rate": basal_rate,
+                 "correction": correction, "gap": gap}
+        return self._deliver(chunk)
+
+    def _deliver(self, chunk: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+        # La dose basale d'une lecture n'est connue qu'à la lecture suivante : la dernière est gardée en attente
+        if self._pending is not None:
+            chunk = {name: np.concatenate((self._pending[name], chunk[name])) for name in chunk}
+        self._pending = {name: values[-1:] for name, values in chunk.items()}
+        completed = {name: values[:-1] for name, values in chunk.items()}
+        interval = np.minimum(np.diff(chunk["time"]), self.max_gap_minutes)
+        completed["basal_dose"] = completed["basal_rate"] * interval / 60
+        return completed
+
+    def _empty(self) -> dict[str, np.ndarray]:
+        return {name: np.empty(0, dtype=bool if name == "gap" else float) for name in RESULT_COLUMNS}
+
+    def finish(self) -> dict[str, np.ndarray]:
+        if self._pending is None:
+            return self._empty()
+        completed = self._pending
+        completed["basal_dose"] = np.zeros(1)
+        self._pending = None
+        return completed
+
+    def replay(self, chunks: Iterable[tuple[np.ndarray, np.ndarray]]) -> Iterator[dict[str, np.ndarray]]:
+        for times, glucose in chunks:
+            result = self.replay_chunk(times, glucose)
+            if len(result["time"]):
+                yield result
+        result = self.finish()
+        if len(result["time"]):
+            yield result
+
+
+def summarize_replay(results: Iterable[dict[str, np.ndarray]]) -> dict:
+    # Agrégats calculés au fil des blocs : la mémoire ne dépend pas de la durée de l'enregistrement
+    summary = {"readings": 0, "gaps": 0, "corrections": 0, "correction_insulin": 0.0, "basal_insulin": 0.0}
+    for result in results:
+        summary["readings"] += len(result["time"])
+        summary["gaps"] += int(np.count_nonzero(result["gap"]))
+        summary["corrections"] += int(np.count_nonzero(result["correction"]))
+        summary["correction_insulin"] += float(result["correction"].sum())
+        summary["basal_insulin"] += float(result["basal_dose"].sum())
+    return summary
@@ -0,0 +1,274 @@
+import itertools
+import json
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+import numpy as np
+from .config import PumpConfig
+from .patient import Patient
+
+# Paramètres d'une exécution, chacun dans sa colonne pour pouvoir filtrer et indexer
+RUN_COLUMNS = ("label", "seed", "created", "minutes", "target_glucose", "active_mode", "insulin_to_carb_ratio",
+               "insulin_sensitivity_factor", "max_bolus", "basal_rates", "initial_glucose", "insulin_sensitivity",
+               "carb_sensitivity", "parameters")
+# Clés de GlycemicMetrics.summary()
+SUMMARY_COLUMNS = ("count", "mean_glucose", "min_glucose", "max_glucose", "sd_glucose", "cv", "gmi", "time_in_range",
+                   "time_below_range", "time_below_54", "time_above_range", "time_above_250", "hypo_episodes",
+                   "hyper_episodes", "total_insulin", "daily_insulin")
+# Colonnes du SimulationRecorder conservées pour chaque minute
+SERIES_COLUMNS = ("time", "glucose", "adjustment", "basal", "correction", "meal", "insulin", "events", "mode", "alarms")
+INDEXED_COLUMNS = ("seed", "target_glucose", "active_mode", "insulin_to_carb_ratio", "insulin_sensitivity_factor",
+                   "max_bolus", "insulin_sensitivity", "time_in_range", "time_below_range", "time_above_range")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, {", ".join(RUN_COLUMNS)});
+CREATE TABLE IF NOT EXISTS summaries (run_id INTEGER PRIMARY KEY REFERENCES runs(id), {", ".join(SUMMARY_COLUMNS)});
+CREATE TABLE IF NOT EXISTS series (run_id INTEGER NOT NULL, {", ".join(SERIES_COLUMNS)},
+                                   PRIMARY KEY (run_id, time)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS run_ids (last INTEGER NOT NULL);
+INSERT INTO run_ids SELECT COALESCE(MAX(id), 0) FROM runs WHERE NOT EXISTS (SELECT 1 FROM run_ids);
+""" + "".join(
+    f"CREATE INDEX IF NOT EXISTS {table}_{column} ON {table}({column});\n"
+    for table, columns in (("runs", RUN_COLUMNS), ("summaries", SUMMARY_COLUMNS))
+    for column in INDEXED_COLUMNS if column in columns
+)
+
+INSERT_RUN = f"INSERT INTO runs (id, {', '.join(RUN_COLUMNS)}) VALUES ({', '.join('?' * (len(RUN_COLUMNS) + 1))})"
+INSERT_SUMMARY = f"INSERT INTO summaries (run_id, {', '.join(SUMMARY_COLUMNS)}) VALUES ({', '.join('?' * (len(SUMMARY_COLUMNS) + 1))})"
+INSERT_SERIES = f"INSERT INTO series (run_id, {', '.join(SERIES_COLUMNS)}) VALUES ({', '.join('?' * (len(SERIES_COLUMNS) + 1))})"
+
+# Nombre de lignes de séries regroupées dans une même transaction
+BATCH_ROWS = 50_000
+QUEUE_SIZE = 64
+# Identifiants réservés d'un coup dans la base par chaque ResultsStore (voir _next_id)
+RUN_ID_BLOCK = 1000
+
+
+def _connect(path) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, check_same_thread=False)
+    # WAL : les lectures ne bloquent pas l'écrivain, et une transaction ne coûte qu'un ajout au journal
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def run_metadata(config: PumpConfig, patient: Patient, target_glucose: float, seed: int = None, label: str = None,
+                 minutes: int = None, parameters: dict = None) -> dict:
+    return {
+        "label": label,
+        "seed": seed,
+        "created": datetime.now().isoformat(sep=" "),
+        "minutes": minutes,
+        "target_glucose": target_glucose,
+        "active_mode": config.active_mode,
+        "insulin_to_carb_ratio": config.insulin_to_carb_ratio,
+        "insulin_sensitivity_factor": config.insulin_sensitivity_factor,
+        "max_bolus": config.max_bolus,
+        "basal_rates": list(config.programmed_basal_rates),
+        "initial_glucose": patient.initial_glucose,
+        "insulin_sensitivity": patient.insulin_sensitivity,
+        "carb_sensitivity": patient.carb_sensitivity,
+        "parameters": parameters,
+    }
+
+
+class ResultsStore:
+    # Base SQLite des résultats. Les écritures passent par une file vers un unique fil d'écriture, qui les
+    # regroupe en transactions (executemany) : les producteurs (boucle d'un balayage, plusieurs threads)
+    # n'attendent jamais la base. Les lectures se font sur une connexion séparée (d'où un fichier, pas :memory:).
+    def __init__(self, path, batch_rows: int = BATCH_ROWS, queue_size: int = QUEUE_SIZE):
+        self.path = path
+        self.batch_rows = batch_rows
+        writer = _connect(path)
+        writer.executescript(SCHEMA)
+        self._reader = _connect(path)
+        self._read_lock = threading.Lock()
+        # Identifiants attribués à l'ajout, avant l'écriture effective, dans un bloc [_next, _end[ réservé dans la
+        # base : plusieurs stores (ou processus) sur la même base n'attribuent jamais le même identifiant
+        self._next = self._end = 0
+        self._id_lock = threading.Lock()
+        # File bornée : un producteur trop rapide attend au lieu d'accumuler les séries en mémoire
+        self._queue = queue.Queue(maxsize=queue_size)
+        # Erreurs d'écriture depuis le dernier flush : les exécutions concernées sont perdues, les autres écrites
+        self._errors = []
+        self._thread = threading.Thread(target=self._write_loop, args=(writer,), name="results-writer", daemon=True)
+        self._thread.start()
+
+    def _next_id(self) -> int:
+        with self._id_lock:
+            if self._next == self._end:
+                with self._read_lock, self._reader:
+                    self._reader.execute("UPDATE run_ids SET last = last + ?", (RUN_ID_BLOCK,))
+                    self._end = self._reader.execute("SELECT last FROM run_ids").fetchone()[0] + 1
+                self._next = self._end - RUN_ID_BLOCK
+            self._next += 1
+            return self._next - 1
+
+    def _release_ids(self) -> None:
+        # Identifiants non utilisés rendus si aucun autre store n'a réservé de bloc depuis
+        with self._id_lock, self._read_lock, self._reader:
+            self._reader.execute("UPDATE run_ids SET last = ? WHERE last = ?", (self._next - 1, self._end - 1))
+            self._next = self._end = 0
+
+    def record_run(self, metadata: dict, summary: dict = None, series: dict = None) -> int:
+        run_id = self._next_id()
+        run = (run_id, *(self._value(metadata.get(column)) for column in RUN_COLUMNS))
+        summary_row = None if summary is None else (run_id, *(self._value(summary.get(column)) for column in SUMMARY_COLUMNS))
+        series_rows = None
+        if series is not None:
+            columns = [np.asarray(series[column]).tolist() for column in SERIES_COLUMNS]
+            series_rows = [(run_id, *row) for row in zip(*columns)]
+        self._queue.put((run, summary_row, series_rows))
+        return run_id
+
+    def record_simulation(self, simulator, seed: int = None, label: str = None, parameters: dict = None, series: bool = True) -> int:
+        metadata = run_metadata(simulator.pump.config, simulator.patient, simulator.controller.target_glucose, seed, label,
+                                simulator.metrics.minutes, parameters)
+        # Configuration au début de la simulation (le contrôleur modifie ensuite les taux basaux) : planning programmé,
+        # sans les multiplicateurs du mode, comme run_metadata pour les lignes d'un balayage
+        initial = simulator.initial_pump_config
+        metadata.update(basal_rates=initial["basal_rates"], active_mode=initial["active_mode"],
+                        insulin_to_carb_ratio=initial["insulin_to_carb_ratio"], max_bolus=initial["max_bolus"],
+                        insulin_sensitivity_factor=initial["insulin_sensitivity_factor"])
+        columns = None
+        if series:
+            columns = {name: simulator.log.column(name) if name != "insulin" else simulator.log.insulin for name in SERIES_COLUMNS}
+        return self.record_run(metadata, simulator.metrics.summary(), columns)
+
+    @staticmethod
+    def _value(value):
+        if isinstance(value, (list, tuple, dict)):
+            return json.dumps(value)
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    def _write_loop(self, connection: sqlite3.Connection) -> None:
+        stop = False
+        while not stop:
+            items = [self._queue.get()]
+            rows = len(items[0][2] or ()) if items[0] is not None else 0
+            # Tout ce qui attend déjà dans la file rejoint la même transaction
+            while rows < self.batch_rows:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                items.append(item)
+                if item is not None:
+                    rows += len(item[2] or ())
+            stop = any(item is None for item in items)
+            batch = [item for item in items if item is not None]
+            try:
+                self._write(connection, batch)
+            except sqlite3.Error:
+                # Lot refusé : chaque exécution est réessayée seule, seules celles en erreur sont perdues
+                for item in batch:
+                    try:
+                        self._write(connection, [item])
+                    except sqlite3.Error as error:
+                        self._errors.append((item[0][0], error))
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+        connection.close()
+
+    @staticmethod
+    def _write(connection: sqlite3.Connection, batch: list) -> None:
+        if not batch:
+            return
+        with connection:
+            connection.executemany(INSERT_RUN, [run for run, _, _ in batch])
+            connection.executemany(INSERT_SUMMARY, [summary for _, summary, _ in batch if summary is not None])
+            connection.executemany(INSERT_SERIES, itertools.chain.from_iterable(series for _, _, series in batch if series))
+
+    def _check_error(self) -> None:
+        # Signale (une fois) les exécutions non écrites depuis le dernier appel ; les écritures suivantes continuent
+        if self._errors:
+            errors, self._errors = self._errors, []
+            run_ids = ", ".join(str(run_id) for run_id, _ in errors)
+            raise RuntimeError(f"Échec de l'écriture des exécutions {run_ids} : {errors[-1][1]}") from errors[-1][1]
+
+    def flush(self) -> None:
+        # Attend que tout ce qui a été ajouté soit écrit
+        self._queue.join()
+        self._check_error()
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self._reader is not None:
+            self._release_ids()
+            self._reader.close()
+            self._reader = None
+        self._check_error()
+
+    def __enter__(self) -> "ResultsStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _query(self, sql: str, parameters=()) -> list[sqlite3.Row]:
+        with self._read_lock:
+            self._reader.row_factory = sqlite3.Row
+            return self._reader.execute(sql, parameters).fetchall()
+
+    def find_runs(self, **ranges) -> list[dict]:
+        # Filtre sur les paramètres et les métriques : valeur exacte ou intervalle (min, max), bornes incluses,
+        # None pour une borne ouverte. Ex. find_runs(insulin_sensitivity_factor=(30, 40), time_below_range=(4, None))
+        conditions, parameters = [], []
+        for column, value in ranges.items():
+            if column == "id" or column in RUN_COLUMNS:
+                name = f"runs.{column}"
+            elif column in SUMMARY_COLUMNS:
+                name = f"summaries.{column}"
+            else:
+                raise ValueError(f"Colonne inconnue : {column}")
+            if isinstance(value, tuple):
+                low, high = value
+                if low is not None:
+                    conditions.append(f"{name} >= ?")
+                    parameters.append(low)
+                if high is not None:
+                    conditions.append(f"{name} <= ?")
+                    parameters.append(high)
+            else:
+                conditions.append(f"{name} = ?")
+                parameters.append(value)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._query(f"SELECT runs.*, {', '.join(f'summaries.{c}' for c in SUMMARY_COLUMNS)} "
+                           f"FROM runs LEFT JOIN summaries ON summaries.run_id = runs.id{where} ORDER BY runs.id", parameters)
+        return [self._decode(dict(row)) for row in rows]
+
+    @staticmethod
+    def _decode(row: dict) -> dict:
+        for column in ("basal_rates", "parameters"):
+            if row.get(column) is not None:
+                row[column] = json.loads(row[column])
+        return row
+
+    def run(self, run_id: int) -> dict | None:
+        runs = self.find_runs(id=run_id)
+        return runs[0] if runs else None
+
+    def series(self, run_id: int, start: int = None, end: int = None) -> dict[str, np.ndarray]:
+        # Colonnes de la simulation `run_id` pour les minutes [start, end[
+        sql = f"SELECT {', '.join(SERIES_COLUMNS)} FROM series WHERE run_id = ?"
+        parameters = [run_id]
+        if start is not None:
+            sql += " AND time >= ?"
+            parameters.append(start)
+        if end is not None:
+            sql += " AND time < ?"
+            parameters.append(end)
+        with self._read_lock:
+            self._reader.row_factory = None
+            rows = self._reader.execute(sql + " ORDER BY time", parameters).fetchall()
+        columns = list(zip(*rows)) if rows else [()] * len(SERIES_COLUMNS)
+        return {name: np.array(values) for name, values in zip(SERIES_COLUMNS, columns)}
+
+    def count(self) -> int:
+        return self._query("SELECT COUNT(*) FROM runs")[0][0]
@@ -0,0 +1,140 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .config import PumpConfig
+from .patient import Patient
+from .simulator import Simulator
+
+MINUTES_PER_DAY = 24 * 60
+# Repas quotidiens : (minute moyenne dans la journée, écart-type en minutes, glucides moyens, écart-type en g)
+MEALS = ((7 * 60 + 30, 30, 45, 10), (12 * 60 + 30, 40, 70, 15), (19 * 60 + 30, 45, 80, 20))
+DEFAULT_PARAMETERS = {
+    "snack_probability": 0.3,        # collation l'après-midi, entre 15 h et 17 h
+    "snack_carbs": (20, 5),
+    "sensor_noise_sd": 5.0,          # mg/dL
+    "dropout_rate": 1 / 720,         # débuts de perte du signal par minute
+    "dropout_minutes": (5, 60),
+    "isf_amplitude": 0.2,            # variation circadienne de la sensibilité à l'insuline
+    "isf_low_hour": 5,               # sensibilité minimale en fin de nuit (phénomène de l'aube)
+    "isf_sd": 0.05,
+    "battery_drain_per_hour": 1.0,   # % par heure
+    "battery_drain_sd": 0.3,
+}
+
+
+def scenario_rng(seed: int, index: int) -> np.random.Generator:
+    # Flux du scénario `index` : identique au index-ième enfant de SeedSequence(seed).spawn(), donc indépendant
+    # du nombre de scénarios générés et de leur répartition entre processus
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+
+
+class Scenario:
+    # Tirages d'une exécution, générés en bloc ; apply() les transforme en actions planifiées du simulateur
+    def __init__(self, minutes: int, meal_times: np.ndarray, meal_carbs: np.ndarray, sensor_noise: np.ndarray,
+                 dropouts: np.ndarray, insulin_sensitivity: np.ndarray, battery_drain: np.ndarray):
+        self.minutes = minutes
+        self.meal_times = meal_times
+        self.meal_carbs = meal_carbs
+        self.sensor_noise = sensor_noise
+        # Pertes du signal (début, fin) en minutes, fin exclue
+        self.dropouts = dropouts
+        # Multiplicateur de la sensibilité à l'insuline pour chaque heure
+        self.insulin_sensitivity = insulin_sensitivity
+        # Décharge de la batterie (%) à la fin de chaque heure
+        self.battery_drain = battery_drain
+
+    def apply(self, simulator: Simulator) -> Simulator:
+        simulator.meal_interval = None
+        for time, carbs in zip(self.meal_times.tolist(), self.meal_carbs.tolist()):
+            simulator.schedule_meal(time, carbs)
+        simulator.set_sensor_noise(self.sensor_noise)
+        for start, end in self.dropouts.tolist():
+            simulator.schedule_sensor_gap(start, end)
+        base = simulator.patient.insulin_sensitivity
+        for hour, multiplier in enumerate(self.insulin_sensitivity.tolist()):
+            simulator.schedule_insulin_sensitivity(hour * 60, base * multiplier)
+        for hour, amount in enumerate(self.battery_drain.tolist()):
+            simulator.schedule_battery_drain((hour + 1) * 60, amount)
+        return simulator
+
+    def simulator(self, target_glucose: float = 120, patient: Patient = None, config: PumpConfig = None, cls=Simulator) -> Simulator:
+        return self.apply(cls(math.ceil(self.minutes / 60), target_glucose, patient=patient, config=config, meal_interval=None))
+
+
+def generate_scenario(seed: int, index: int = 0, minutes: int = MINUTES_PER_DAY, **parameters) -> Scenario:
+    unknown = set(parameters) - set(DEFAULT_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Paramètres de scénario inconnus : {sorted(unknown)}")
+    p = {**DEFAULT_PARAMETERS, **parameters}
+    rng = scenario_rng(seed, index)
+    days = math.ceil(minutes / MINUTES_PER_DAY)
+    hours = math.ceil(minutes / 60)
+
+    # Repas : un tirage par (jour, repas), tous en une fois
+    means = np.array(MEALS, dtype=float)
+    day_start = (np.arange(days) * MINUTES_PER_DAY)[:, None]
+    meal_times = day_start + rng.normal(means[:, 0], means[:, 1], (days, len(MEALS)))
+    meal_carbs = rng.normal(means[:, 2], means[:, 3], (days, len(MEALS)))
+    snack = rng.random(days) < p["snack_probability"]
+    snack_times = day_start[:, 0] + rng.uniform(15 * 60, 17 * 60, days)
+    snack_carbs = rng.normal(*p["snack_carbs"], days)
+    times = np.rint(np.concatenate((meal_times.ravel(), snack_times[snack]))).astype(np.int64)
+    carbs = np.round(np.maximum(np.concatenate((meal_carbs.ravel(), snack_carbs[snack])), 0), 0)
+    keep = (times >= 1) & (times <= minutes) & (carbs > 0)
+    order = np.argsort(times[keep], kind="stable")
+    meal_times, meal_carbs = times[keep][order], carbs[keep][order]
+
+    sensor_noise = rng.normal(0.0, p["sensor_noise_sd"], minutes)
+
+    # Pertes du signal : débuts tirés minute par minute, durées uniformes ; les pertes qui se chevauchent fusionnent
+    starts = np.flatnonzero(rng.random(minutes) < p["dropout_rate"]) + 1
+    lengths = rng.integers(p["dropout_minutes"][0], p["dropout_minutes"][1] + 1, len(starts))
+    dropouts = _merge_intervals(starts, np.minimum(starts + lengths, minutes + 1))
+
+    hour_of_day = np.arange(hours) % 24
+    insulin_sensitivity = (1 + p["isf_amplitude"] * np.cos(2 * np.pi * (hour_of_day - p["isf_low_hour"] - 12) / 24)
+                           + rng.normal(0.0, p["isf_sd"], hours))
+    insulin_sensitivity = np.maximum(insulin_sensitivity, 0.1)
+    battery_drain = np.maximum(rng.normal(p["battery_drain_per_hour"], p["battery_drain_sd"], hours), 0.0)
+    return Scenario(minutes, meal_times, meal_carbs, sensor_noise, dropouts, insulin_sensitivity, battery_drain)
+
+
+def _merge_intervals(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    if len(starts) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    # Un nouvel intervalle commence là où le début dépasse toutes les fins précédentes
+    reach = np.maximum.accumulate(ends)
+    new = np.concatenate(([True], starts[1:] > reach[:-1]))
+    groups = np.cumsum(new) - 1
+    merged_ends = np.zeros(groups[-1] + 1, dtype=np.int64)
+    np.maximum.at(merged_ends, groups, ends)
+    return np.column_stack((starts[new], merged_ends))
+
+
+def generate_scenarios(seed: int, count: int, minutes: int = MINUTES_PER_DAY, start: int = 0, **parameters) -> list[Scenario]:
+    return [generate_scenario(seed, index, minutes, **parameters) for index in range(start, start + count)]
+
+
+def run_replicate(task: tuple[int, int, int, dict]) -> dict:
+    index, seed, minutes, parameters = task
+    scenario = generate_scenario(seed, index, minutes, **parameters)
+    simulator = scenario.simulator()
+    simulator.run(minutes)
+    return {"replicate": index, "meals": len(scenario.meal_times), "dropout_minutes": int(np.sum(np.diff(scenario.dropouts, axis=1))),
+            "battery_level": simulator.pump.battery_level, **simulator.metrics.summary()}
+
+
+def run_monte_carlo(replicates: int, minutes: int = MINUTES_PER_DAY, seed: int = 0, max_workers: int = None,
+                    chunksize: int = None, **parameters) -> list[dict]:
+    # Chaque réplique ne dépend que de (seed, indice) : mêmes résultats quel que soit le nombre de processus
+    tasks = [(index, seed, minutes, parameters) for index in range(replicates)]
+    if not tasks:
+        return []
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1:
+        return [run_replicate(task) for task in tasks]
+    if chunksize is None:
+        chunksize = max(1, math.ceil(len(tasks) / (max_workers * 4)))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(run_replicate, tasks, chunksize=chunksize))
@@ -1,71 +1,344 @@
+import heapq
+import numpy as np
 from datetime import datetime, timedelta
+from functools import partial
+from typing import Callable
 from .patient import Patient
 from .insulin_pump import InsulinPump
 from .cgm import CGM
 from .controller import ClosedLoopController
 from .pdm import PDM
 from .config import PumpConfig
+from .export import iter_final_log, write_log
+from .recorder import SimulationRecorder, EVENT_MEASURE, EVENT_HOURLY_BASAL, EVENT_CORRECTION, EVENT_MEAL, ALARM_HIGH_GLUCOSE, ALARM_LOW_BATTERY
+from .tracefile import write_trace
+from .metrics import GlycemicMetrics
+from .alarms import AlarmCode, ALARM_MESSAGES
+from .profiling import Profiler, instrument, uninstrument
+from .snapshot import SimulationSnapshot, take_snapshot, restore
+
+MEAL_INTERVAL = 360
+MEAL_CARBS = 60
+HIGH_GLUCOSE_THRESHOLD = 170
+LOW_BATTERY_ALARM = ALARM_MESSAGES[AlarmCode.LOW_BATTERY]
+
+
+# Actions planifiées prédéfinies : fonctions de module (et non des closures) pour que les snapshots
+# qui les contiennent restent sérialisables
+def _add_carbs(simulator: "Simulator", carbs: float) -> None:
+    simulator._pending_carbs += carbs
+
+
+def _activate_mode(simulator: "Simulator", mode: str) -> None:
+    simulator.pdm.activate_mode(mode)
+
+
+def _drain_battery(simulator: "Simulator", amount: float) -> None:
+    simulator.pump.battery_level = max(0, simulator.pump.battery_level - amount)
+    simulator.pdm.check_battery_level()
+    if simulator.pump.alarms.is_active(AlarmCode.LOW_BATTERY):
+        simulator._pending_alarms |= ALARM_LOW_BATTERY
+
+
+def _set_insulin_sensitivity(simulator: "Simulator", insulin_sensitivity: float) -> None:
+    simulator.patient.insulin_sensitivity = insulin_sensitivity
+
+
+def _set_sensor_available(simulator: "Simulator", available: bool) -> None:
+    simulator.sensor_available = available
+
 
 class Simulator:
-    def __init__(self, duration: int):
-        self.patient = Patient()
+    # Phase -> méthode chronométrée par enable_profiling
+    PROFILED_PHASES = {
+        "actions": "_run_actions",
+        "measure": "_measure",
+        "adjust": "_adjust",
+        "deliver_basal": "_deliver_basal",
+        "correction": "_correction",
+        "meal": "_meal",
+        "logging": "_record",
+        "patient": "_update_patient",
+    }
+
+    def __init__(self, duration: int, target_glucose: float = 120, patient: Patient = None, config: PumpConfig = None, measurement_interval: int = 1,
+                 meal_interval: int | None = MEAL_INTERVAL, record_history: bool = False):
+        self.patient = patient if patient is not None else Patient()
         self.pump = InsulinPump()
-        self.cgm = CGM()
-        self.controller = ClosedLoopController(self.pump)
+        # Délais des alarmes en minutes simulées
+        self.pump.alarms.clock = self.current_minute
+        if config is not None:
+            self.pump.apply_configuration(config)
+        self.controller = ClosedLoopController(target_glucose, pump=self.pump)
         self.duration = duration
-        self.event_log = []
         self.simulation_time = 0
-        self.glucose_log = {}
-        self.pdm = PDM(pump)
+        # Cadence du CGM en minutes : la mesure, l'ajustement basal et la correction n'ont lieu qu'à ces minutes
+        self.measurement_interval = measurement_interval
+        # Repas automatique de MEAL_CARBS toutes les `meal_interval` minutes ; None : seulement les repas planifiés
+        self.meal_interval = meal_interval
+        # Bruit du capteur ajouté à chaque mesure (une valeur par minute, voir scenario.py)
+        self.sensor_noise = None
+        self.log = SimulationRecorder(duration * 60)
+        # Métriques glycémiques tenues à jour à chaque ligne du journal
+        self.metrics = GlycemicMetrics()
+        self.pdm = PDM(target_glucose, pump=self.pump)
+        # Glycémies et doses de chaque minute aussi ajoutées aux historiques du PDM (consultables par date) ; le
+        # journal les contient déjà, d'où un enregistrement à la demande
+        self.record_history = record_history
+        self.cgm = CGM(alert_sink=self.pdm)
         self.start_time = datetime.now()
+        self.initial_pump_config = self.pump_config_values()
+        self.sensor_available = True
+        self._actions = []
+        self._action_counter = 0
+        self._pending_carbs = 0
+        self._pending_alarms = 0
+        # Minutes des repas automatiques annulés (voir skip_meal)
+        self._skipped_meals = set()
+        self.profiler = None
+        self._step_callbacks = []
 
     def calculate_meal_bolus(self, carbs):
-        bolus = self.pdm.calculate_meal_bolus(carbs)
-        self.event_log.append(f"Bolus alimentaire calculé : {bolus:.1f} U")
-        return bolus
+        return self.pump.calculate_meal_bolus(carbs)
+
+    def schedule(self, time: int, action: Callable[["Simulator"], None]) -> None:
+        # L'action est exécutée au début de la minute `time`, avant la mesure
+        self._action_counter += 1
+        heapq.heappush(self._actions, (time, self._action_counter, action))
+
+    def schedule_meal(self, time: int, carbs: float) -> None:
+        self.schedule(time, partial(_add_carbs, carbs=carbs))
+
+    def set_sensor_noise(self, noise) -> None:
+        # Erreur du capteur (mg/dL) pour chaque minute à partir de la minute 1 ; None : mesures exactes
+        # Tuple immuable : les snapshots le partagent sans copie
+        self.sensor_noise = None if noise is None else tuple(np.asarray(noise, dtype=float).tolist())
+
+    def schedule_insulin_sensitivity(self, time: int, insulin_sensitivity: float) -> None:
+        self.schedule(time, partial(_set_insulin_sensitivity, insulin_sensitivity=insulin_sensitivity))
+
+    def skip_meal(self, time: int) -> None:
+        # Annule le repas automatique de la minute `time` (multiple de meal_interval) ; les repas planifiés
+        # à cette minute sont conservés
+        if not self.meal_interval or time % self.meal_interval:
+            raise ValueError(f"Aucun repas automatique à la minute {time}")
+        self._skipped_meals.add(time)
+
+    def schedule_mode(self, time: int, mode: str) -> None:
+        self.schedule(time, partial(_activate_mode, mode=mode))
+
+    def schedule_battery_drain(self, time: int, amount: float) -> None:
+        self.schedule(time, partial(_drain_battery, amount=amount))
+
+    def schedule_sensor_gap(self, start: int, end: int) -> None:
+        # Capteur indisponible pendant [start, end[ : aucune mesure ni ajustement
+        self.schedule(start, partial(_set_sensor_available, available=False))
+        self.schedule(end, partial(_set_sensor_available, available=True))
+
+    def snapshot(self) -> SimulationSnapshot:
+        return take_snapshot(self)
+
+    def fork(self, snapshot: SimulationSnapshot = None) -> "Simulator":
+        # Branche indépendante à partir de `snapshot` (par défaut l'état courant), avec le journal de ce simulateur
+        # jusqu'au snapshot : le préfixe n'est pas resimulé
+        return restore(snapshot if snapshot is not None else self.snapshot(), type(self), parent=self)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: SimulationSnapshot) -> "Simulator":
+        # Reprise sans le simulateur d'origine (autre processus par exemple) : le journal démarre au snapshot
+        return restore(snapshot, cls)
+
+    def current_minute(self) -> int:
+        return self.simulation_time
+
+    def next_action_time(self) -> int | None:
+        return self._actions[0][0] if self._actions else None
 
-    def run_simulation(self, duration: int):
-        self.insulin_log = {}
+    def is_measurement_minute(self, time: int) -> bool:
+        return (time - 1) % self.measurement_interval == 0
+
+    def run(self, duration: int):
+        self.log.reserve(len(self.log) + duration)
         for _ in range(duration):
-            self.simulation_time += 1
-            glucose = self.cgm.measure_glucose(self.patient)
-            self.glucose_log[self.simulation_time] = glucose
-            adjustment = self.controller.adjust_basal_rate(glucose)
-            basal_dose = self.pump.deliver_basal(self.simulation_time % 24)
-            self.insulin_log[self.simulation_time] = basal_dose
-            self.pdm.record_insulin_dose(datetime.now(), basal_dose)
-            self.patient.update_glucose_level()
-            self.event_log.append(f"Time {self.simulation_time}: Glucose {glucose:.2f}, Adjustment {adjustment:.2f}")
-            if self.simulation_time % 60 == 0:  # Every hour
-                self.event_log.append(f"Time {self.simulation_time}: administration d'insuline")
-            self.event_log.append(f"Time {self.simulation_time}: mesure de glycémie")
-            
-            if glucose > 170:
-                correction_bolus = self.controller.calculate_correction_bolus(glucose)
-                self.pump.deliver_bolus(correction_bolus)
-                self.insulin_log[self.simulation_time] += correction_bolus
-                self.pdm.record_insulin_dose(datetime.now(), correction_bolus)
-                self.event_log.append(f"Time {self.simulation_time}: Bolus de correction calculé : {correction_bolus:.2f} U")
-            
-            if self.simulation_time % 360 == 0:
-                carbs = 60
-                meal_bolus = self.calculate_meal_bolus(carbs)
-                self.pump.deliver_bolus(meal_bolus)
-                self.insulin_log[self.simulation_time] += meal_bolus
-                self.pdm.record_insulin_dose(datetime.now(), meal_bolus)
+            self.step()
 
         self.last_message = "Simulation terminée, résultats disponibles"
 
+    def step(self) -> None:
+        time, date = self._run_actions()
+        measured = self.sensor_available and self.is_measurement_minute(time)
+        alarms = self._pending_alarms
+        adjustment = 0.0
+        if measured:
+            glucose, alarms = self._measure(time, date, alarms)
+            adjustment = self._adjust(glucose)
+            events = EVENT_MEASURE
+        else:
+            glucose = self.patient.glucose_level
+            events = 0
+        basal_dose = self._deliver_basal(time, date)
+        if time % 60 == 0:  # Every hour
+            events |= EVENT_HOURLY_BASAL
+
+        insulin = basal_dose
+        correction_bolus = 0.0
+        meal_bolus = 0.0
+        if measured and glucose > HIGH_GLUCOSE_THRESHOLD:
+            correction_bolus = self._correction(glucose, date)
+            events |= EVENT_CORRECTION
+            insulin += correction_bolus
+
+        carbs = self._pending_carbs
+        if self.meal_interval and time % self.meal_interval == 0 and time not in self._skipped_meals:
+            carbs += MEAL_CARBS
+        if carbs:
+            meal_bolus = self._meal(carbs, date)
+            events |= EVENT_MEAL
+            insulin += meal_bolus
+
+        self._record(time, glucose, adjustment, basal_dose, correction_bolus, meal_bolus, events, alarms)
+        self._update_patient(insulin, carbs)
+
+    # Phases d'une minute de simulation, chronométrées séparément par enable_profiling
+    def _run_actions(self) -> tuple[int, datetime]:
+        self.simulation_time += 1
+        time = self.simulation_time
+        while self._actions and self._actions[0][0] <= time:
+            heapq.heappop(self._actions)[2](self)
+        return time, self.start_time + timedelta(minutes=time)
+
+    def _measure(self, time: int, date: datetime, alarms: int) -> tuple[float, int]:
+        noise = self.sensor_noise[time - 1] if self.sensor_noise is not None and time <= len(self.sensor_noise) else 0.0
+        glucose, _, cgm_alarms = self.cgm.measure_glucose(self.patient, noise)
+        if cgm_alarms:
+            alarms |= ALARM_HIGH_GLUCOSE
+        if self.record_history:
+            self.pdm.record_glucose(date, glucose)
+        return glucose, alarms
+
+    def _adjust(self, glucose: float) -> float:
+        return self.controller.adjust_basal_rate(glucose, self.patient.insulin_on_board)
+
+    def _deliver_basal(self, time: int, date: datetime) -> float:
+        # Le taux basal est horaire : on administre la fraction correspondant à une minute
+        basal_dose = self.pump.deliver_basal((time // 60) % 24) / 60
+        if self.record_history:
+            self.pdm.record_insulin_dose(date, basal_dose)
+        return basal_dose
+
+    def _correction(self, glucose: float, date: datetime) -> float:
+        correction_bolus = self.pump.calculate_correction_bolus(glucose, self.controller.target_glucose, self.patient.insulin_on_board)
+        self.pump.deliver_bolus(correction_bolus)
+        if self.record_history:
+            self.pdm.record_insulin_dose(date, correction_bolus)
+        return correction_bolus
+
+    def _meal(self, carbs: float, date: datetime) -> float:
+        meal_bolus = self.calculate_meal_bolus(carbs)
+        self.pump.deliver_bolus(meal_bolus)
+        if self.record_history:
+            self.pdm.record_insulin_dose(date, meal_bolus)
+        return meal_bolus
+
+    def _record(self, time: int, glucose: float, adjustment: float, basal_dose: float, correction_bolus: float, meal_bolus: float, events: int, alarms: int) -> None:
+        self.log.append(time, glucose, adjustment, basal_dose, correction_bolus, meal_bolus, events, self.mode_code(), alarms)
+        self.metrics.add(glucose, basal_dose + correction_bolus + meal_bolus)
+
+    def _update_patient(self, insulin: float, carbs: float) -> None:
+        self.patient.update_glucose_level(insulin=insulin, carbs=carbs)
+        self._pending_carbs = 0
+        self._pending_alarms = 0
+
+    def enable_mpc(self, **options):
+        # Contrôle prédictif du basal (voir mpc.py) ; options : horizon, block_minutes, regularization, reference_rate
+        return self.controller.enable_mpc(self.patient, **options)
+
+    def disable_mpc(self) -> None:
+        self.controller.disable_mpc()
+
+    def enable_profiling(self, profiler: Profiler = None) -> Profiler:
+        # Sans appel à cette méthode, step() s'exécute sans aucune mesure ni test supplémentaire
+        self.profiler = profiler if profiler is not None else Profiler()
+        instrument(self, self.PROFILED_PHASES, self.profiler)
+        self._install_step()
+        return self.profiler
+
+    def disable_profiling(self) -> None:
+        uninstrument(self, self.PROFILED_PHASES)
+        self.profiler = None
+        self._install_step()
+
+    def add_step_callback(self, callback: Callable[["Simulator"], None]) -> None:
+        # Appelé après chaque minute simulée, avec le simulateur (la dernière ligne de self.log est la minute écoulée)
+        self._step_callbacks.append(callback)
+        self._install_step()
+
+    def remove_step_callback(self, callback: Callable[["Simulator"], None]) -> None:
+        self._step_callbacks.remove(callback)
+        self._install_step()
+
+    def _install_step(self) -> None:
+        self.__dict__.pop("step", None)
+        step = self.step
+        if self.profiler is not None:
+            step = self.profiler.wrap("step", step)
+        if self._step_callbacks:
+            callbacks = self._step_callbacks
+
+            def step_with_callbacks():
+                step()
+                for callback in callbacks:
+                    callback(self)
+            self.step = step_with_callbacks
+        elif self.profiler is not None:
+            self.step = step
+
+    def mode_code(self) -> int:
+        modes = self.pump.config.modes
+        active_mode = self.pump.config.active_mode
+        for code, mode in enumerate(modes):
+            if mode == active_mode:
+                return code
+        return len(modes)
+
     def generate_final_log(self):
-        events = ["Événements:"]
-        events.extend(self.event_log)
-        events.append("\nValeurs de glycémie:")
-        for time, glucose in self.glucose_log.items():
-            events.append(f"Time {time}: {glucose:.2f} mg/dL")
-        events.append("\nDoses d'insuline administrées:")
-        for time, dose in self.insulin_log.items():
-            events.append(f"Time {time}: {dose:.2f} U")
-        return "\n".join(events)
+        # Les chaînes ne sont produites qu'ici, à partir des colonnes enregistrées
+        return "\n".join(iter_final_log(self.log))
+
+    def export_log(self, destination, format: str = "text", compress: bool = False) -> None:
+        # Écriture en continu, sans construire le journal complet en mémoire
+        write_log(self.log, destination, format=format, compress=compress)
+
+    def pump_config_values(self) -> dict:
+        config = self.pump.config
+        return {
+            # Planning programmé : le mode actif s'y applique à la reconstruction de la configuration
+            "basal_rates": list(config.programmed_basal_rates),
+            "insulin_to_carb_ratio": config.insulin_to_carb_ratio,
+            "insulin_sensitivity_factor": config.insulin_sensitivity_factor,
+            "max_bolus": config.max_bolus,
+            "personalized_modes": {name: dict(mode) for name, mode in config.modes.items()},
+            "active_mode": config.active_mode,
+            # Mode dont les multiplicateurs sont appliqués au planning programmé (None : aucun)
+            "applied_mode": config.applied_mode,
+        }
+
+    def trace_metadata(self) -> dict:
+        # Configuration de la pompe au début de la simulation : le contrôleur modifie ensuite les taux basaux
+        return {
+            "start_time": self.start_time.isoformat(),
+            "target_glucose": self.controller.target_glucose,
+            "modes": list(self.initial_pump_config["personalized_modes"]),
+            "pump_config": self.initial_pump_config,
+            "patient": {
+                "initial_glucose": self.patient.initial_glucose,
+                "insulin_sensitivity": self.patient.insulin_sensitivity,
+                "carb_sensitivity": self.patient.carb_sensitivity,
+            },
+        }
+
+    def export_trace(self, path) -> None:
+        write_trace(path, self.log, self.trace_metadata())
 
     def run_simulation(self):
-        self.run(self.duration * 60)
\ No newline at end of file
+        self.run(self.duration * 60)
@@ -0,0 +1,175 @@
+import copy
+import pickle
+from dataclasses import dataclass
+from datetime import datetime
+from .config import PumpConfig
+from .kinetics import Absorption
+from .metrics import GlycemicMetrics
+from .patient import Patient
+
+
+@dataclass(frozen=True, slots=True)
+class SimulationSnapshot:
+    # État complet d'une simulation à une minute donnée. Uniquement des valeurs immuables (tuples, nombres) :
+    # une copie est un simple partage, et plusieurs branches peuvent repartir du même snapshot.
+    # L'historique (journal, historiques du PDM) n'est pas copié : seules les positions y sont retenues.
+    time: int
+    duration: int
+    measurement_interval: int
+    meal_interval: int | None
+    # Bruit du capteur par minute (tuple partagé entre les branches) ou None
+    sensor_noise: tuple | None
+    start_time: datetime
+    sensor_available: bool
+    pending_carbs: float
+    pending_alarms: int
+    # Actions planifiées (time, ordre, action) : des fonctions de module pour que le snapshot reste sérialisable
+    actions: tuple
+    action_counter: int
+    # (glycémie initiale, glycémie, sensibilité à l'insuline, sensibilité aux glucides)
+    patient: tuple
+    # (pic en minutes, dépôt, actif) ou None
+    insulin_absorption: tuple | None
+    carb_absorption: tuple | None
+    # (taux basaux programmés, ratio insuline/glucides, facteur de sensibilité, bolus max, modes, mode actif,
+    #  mode appliqué, multiplicateurs horaires du mode appliqué)
+    pump_config: tuple
+    # Copie prise au moment du snapshot : seul dictionnaire du snapshot, jamais modifié ensuite
+    initial_pump_config: dict
+    battery_level: float
+    # État de l'AlarmManager de la pompe (voir AlarmManager.state), None sans alarme
+    alarms: tuple | None
+    pump_message: str
+    target_glucose: float
+    pdm_target_glucose: float
+    log_length: int
+    glucose_history_length: int
+    dose_history_length: int
+    # État de GlycemicMetrics (voir GlycemicMetrics.state)
+    metrics: tuple
+    # Options du contrôle prédictif (paires nom, valeur), None s'il est désactivé
+    mpc: tuple | None = None
+    controller_gain: float = 1.0
+    skipped_meals: frozenset = frozenset()
+    record_history: bool = False
+
+    def to_bytes(self) -> bytes:
+        return pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def from_bytes(data: bytes) -> "SimulationSnapshot":
+        snapshot = pickle.loads(data)
+        if not isinstance(snapshot, SimulationSnapshot):
+            raise TypeError("Les données ne contiennent pas un SimulationSnapshot")
+        return snapshot
+
+
+def _absorption_state(absorption: Absorption | None) -> tuple | None:
+    if absorption is None:
+        return None
+    return absorption.peak_minutes, absorption.depot, absorption.active
+
+
+def _absorption(state: tuple | None) -> Absorption | None:
+    if state is None:
+        return None
+    absorption = Absorption(state[0])
+    absorption.depot, absorption.active = state[1], state[2]
+    return absorption
+
+
+def take_snapshot(simulator) -> SimulationSnapshot:
+    patient = simulator.patient
+    pump = simulator.pump
+    config = pump.config
+    return SimulationSnapshot(
+        time=simulator.simulation_time,
+        duration=simulator.duration,
+        measurement_interval=simulator.measurement_interval,
+        meal_interval=simulator.meal_interval,
+        sensor_noise=simulator.sensor_noise,
+        start_time=simulator.start_time,
+        sensor_available=simulator.sensor_available,
+        pending_carbs=simulator._pending_carbs,
+        skipped_meals=frozenset(simulator._skipped_meals),
+        pending_alarms=simulator._pending_alarms,
+        actions=tuple(simulator._actions),
+        action_counter=simulator._action_counter,
+        patient=(patient.initial_glucose, patient.glucose_level, patient.insulin_sensitivity, patient.carb_sensitivity),
+        insulin_absorption=_absorption_state(patient.insulin_absorption),
+        carb_absorption=_absorption_state(patient.carb_absorption),
+        pump_config=(
+            tuple(config.programmed_basal_rates),
+            config.insulin_to_carb_ratio,
+            config.insulin_sensitivity_factor,
+            config.max_bolus,
+            tuple((name, tuple(mode.items())) for name, mode in config.modes.items()),
+            config.active_mode,
+            config.applied_mode,
+            config._multipliers,
+        ),
+        initial_pump_config=copy.deepcopy(simulator.initial_pump_config),
+        battery_level=pump.battery_level,
+        alarms=pump.alarms.state(),
+        pump_message=pump.last_message,
+        target_glucose=simulator.controller.target_glucose,
+        pdm_target_glucose=simulator.pdm.target_glucose,
+        log_length=len(simulator.log),
+        glucose_history_length=len(simulator.pdm.history['glucose']),
+        dose_history_length=len(simulator.pdm.history['insulin_dose']),
+        metrics=simulator.metrics.state(),
+        controller_gain=simulator.controller.gain,
+        record_history=simulator.record_history,
+        mpc=tuple(simulator.controller.mpc.options().items()) if simulator.controller.mpc is not None else None,
+    )
+
+
+def restore(snapshot: SimulationSnapshot, cls, parent=None):
+    # Nouveau simulateur de classe `cls` dans l'état du snapshot. Avec `parent` (le simulateur d'où vient le
+    # snapshot), le journal et les historiques jusqu'au snapshot sont recopiés ; sinon ils ne contiennent
+    # que ce qui sera simulé à partir de là.
+    initial_glucose, glucose_level, insulin_sensitivity, carb_sensitivity = snapshot.patient
+    patient = Patient(initial_glucose, insulin_sensitivity, carb_sensitivity,
+                      insulin_absorption=_absorption(snapshot.insulin_absorption),
+                      carb_absorption=_absorption(snapshot.carb_absorption))
+    patient.glucose_level = glucose_level
+    basal_rates, insulin_to_carb_ratio, insulin_sensitivity_factor, max_bolus, modes, active_mode, applied_mode, multipliers = snapshot.pump_config
+    config = PumpConfig(list(basal_rates), insulin_to_carb_ratio, max_bolus, insulin_sensitivity_factor,
+                        {name: dict(mode) for name, mode in modes})
+    config.active_mode = active_mode
+    # Table du mode telle qu'elle était appliquée, même si les réglages du mode ont changé depuis
+    config.applied_mode = applied_mode
+    config._multipliers = multipliers
+    config._rebuild_effective_rates()
+
+    simulator = cls(snapshot.duration, snapshot.target_glucose, patient=patient, config=config,
+                    measurement_interval=snapshot.measurement_interval, meal_interval=snapshot.meal_interval,
+                    record_history=snapshot.record_history)
+    simulator.sensor_noise = snapshot.sensor_noise
+    simulator.simulation_time = snapshot.time
+    simulator.start_time = snapshot.start_time
+    simulator.sensor_available = snapshot.sensor_available
+    simulator._pending_carbs = snapshot.pending_carbs
+    simulator._skipped_meals = set(snapshot.skipped_meals)
+    simulator._pending_alarms = snapshot.pending_alarms
+    simulator._actions = list(snapshot.actions)
+    simulator._action_counter = snapshot.action_counter
+    simulator.initial_pump_config = copy.deepcopy(snapshot.initial_pump_config)
+    simulator.pump.battery_level = snapshot.battery_level
+    simulator.pump.alarms.set_state(snapshot.alarms)
+    simulator.pump.last_message = snapshot.pump_message
+    simulator.pdm.target_glucose = snapshot.pdm_target_glucose
+    # Les métriques couvrent toute la simulation, même quand le journal ne démarre qu'au snapshot
+    simulator.metrics = GlycemicMetrics.from_state(snapshot.metrics)
+    simulator.controller.gain = snapshot.controller_gain
+    if snapshot.mpc is not None:
+        simulator.enable_mpc(**dict(snapshot.mpc))
+
+    if parent is not None:
+        if snapshot.log_length > len(parent.log):
+            raise ValueError("Le snapshot ne provient pas de ce simulateur")
+        capacity = max(snapshot.duration * 60, snapshot.log_length)
+        simulator.log = parent.log.copy(snapshot.log_length, capacity)
+        simulator.pdm.history['glucose'] = parent.pdm.history['glucose'].copy(snapshot.glucose_history_length)
+        simulator.pdm.history['insulin_dose'] = parent.pdm.history['insulin_dose'].copy(snapshot.dose_history_length)
+    return simulator
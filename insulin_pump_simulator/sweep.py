@@ -0,0 +1,85 @@
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .config import PumpConfig
+from .simulator import Simulator
+from .patient import Patient
+from .results import run_metadata
+
+CONFIG_PARAMETERS = ("basal_rates", "insulin_to_carb_ratio", "insulin_sensitivity_factor", "max_bolus")
+MODE_PREFIX = "modes."
+
+
+def parameter_grid(grid: dict[str, list]) -> list[dict]:
+    # Produit cartésien dans l'ordre des clés : l'indice d'une configuration est donc stable
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def build_config(params: dict) -> PumpConfig:
+    base = PumpConfig()
+    config = PumpConfig(
+        basal_rates=list(params.get("basal_rates", base.programmed_basal_rates)),
+        insulin_to_carb_ratio=params.get("insulin_to_carb_ratio", base.insulin_to_carb_ratio),
+        max_bolus=params.get("max_bolus", base.max_bolus),
+        insulin_sensitivity_factor=params.get("insulin_sensitivity_factor", base.insulin_sensitivity_factor),
+        modes={name: dict(mode) for name, mode in base.modes.items()},
+    )
+    for key, value in params.items():
+        if key.startswith(MODE_PREFIX):
+            config.modes.setdefault(key[len(MODE_PREFIX):], {})["basal_rate_adjustment"] = value
+        elif key not in CONFIG_PARAMETERS and key not in ("active_mode", "target_glucose"):
+            raise ValueError(f"Paramètre de balayage inconnu : {key}")
+
+    mode = params.get("active_mode")
+    if mode is not None:
+        if mode not in config.modes:
+            raise ValueError(f"Mode {mode} not found")
+        config.apply_mode(mode)
+    config.validate()
+    return config
+
+
+def run_configuration(task: tuple[int, dict, int, int]) -> dict:
+    index, params, seed, duration = task
+    simulator = Simulator(duration, target_glucose=params.get("target_glucose", 120), config=build_config(params))
+    simulator.run_simulation()
+    return {"run": index, "seed": seed, **params, **simulator.metrics.summary()}
+
+
+def record_result(store, row: dict, params: dict, duration: int) -> int:
+    # Paramètres et métriques d'une exécution du balayage (sans la série, restée dans le processus de calcul)
+    metadata = run_metadata(build_config(params), Patient(), params.get("target_glucose", 120), seed=row["seed"],
+                            label="sweep", minutes=duration * 60, parameters=params)
+    return store.record_run(metadata, row)
+
+
+def run_sweep(grid: dict[str, list], duration: int = 24, max_workers: int = None, chunksize: int = None, seed: int = 0,
+              store=None) -> list[dict]:
+    # Avec `store` (ResultsStore), chaque résultat est transmis au fil d'écriture dès qu'il arrive
+    configurations = parameter_grid(grid)
+    # Une graine par exécution, dérivée de la graine du balayage : indépendante de la répartition entre processus
+    seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(len(configurations))]
+    tasks = [(index, params, seeds[index], duration) for index, params in enumerate(configurations)]
+    if not tasks:
+        return []
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, math.ceil(len(tasks) / (max_workers * 4)))
+    if max_workers == 1:
+        return _collect(map(run_configuration, tasks), tasks, duration, store)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # map conserve l'ordre des tâches quel que soit l'ordre de fin des processus
+        return _collect(executor.map(run_configuration, tasks, chunksize=chunksize), tasks, duration, store)
+
+
+def _collect(rows, tasks: list, duration: int, store) -> list[dict]:
+    results = []
+    for row, (_, params, _, _) in zip(rows, tasks):
+        if store is not None:
+            record_result(store, row, params, duration)
+        results.append(row)
+    return results
@@ -0,0 +1,115 @@
+import json
+import os
+import struct
+import numpy as np
+from .recorder import SimulationRecorder, RENDER_CHUNK, EVENT_CORRECTION, EVENT_MEAL
+
+# En-tête : magic, version, taille d'un enregistrement, longueur du JSON de métadonnées, puis le JSON,
+# complété jusqu'à un multiple de HEADER_ALIGNMENT. Les enregistrements de taille fixe suivent.
+MAGIC = b"IPSTRACE"
+VERSION = 1
+HEADER_STRUCT = struct.Struct("<8sHHI")
+HEADER_ALIGNMENT = 64
+
+TRACE_DTYPE = np.dtype([
+    ("time", "<i4"),
+    ("glucose", "<f8"),
+    ("basal", "<f8"),
+    ("bolus", "<f8"),
+    ("mode", "u1"),
+    ("alarms", "u1"),
+])
+
+
+class TraceWriter:
+    def __init__(self, path: str | os.PathLike, metadata: dict):
+        self.path = path
+        self.metadata = metadata
+        self._file = open(path, "wb")
+        payload = json.dumps(metadata).encode("utf-8")
+        header_size = HEADER_STRUCT.size + len(payload)
+        padding = -header_size % HEADER_ALIGNMENT
+        self._file.write(HEADER_STRUCT.pack(MAGIC, VERSION, TRACE_DTYPE.itemsize, len(payload)))
+        self._file.write(payload + b"\0" * padding)
+        self.records_written = 0
+
+    def append(self, records: np.ndarray) -> None:
+        records = np.asarray(records, dtype=TRACE_DTYPE)
+        self._file.write(records.tobytes())
+        self.records_written += len(records)
+
+    def append_columns(self, **columns) -> None:
+        length = len(columns["time"])
+        records = np.zeros(length, dtype=TRACE_DTYPE)
+        for name, values in columns.items():
+            records[name] = values
+        self.append(records)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self) -> "TraceWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class TraceReader:
+    # Lecture en mémoire projetée : seules les pages de la fenêtre demandée sont chargées
+    def __init__(self, path: str | os.PathLike):
+        self.path = path
+        with open(path, "rb") as file:
+            magic, version, record_size, payload_size = HEADER_STRUCT.unpack(file.read(HEADER_STRUCT.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} n'est pas une trace de simulation")
+            if version != VERSION or record_size != TRACE_DTYPE.itemsize:
+                raise ValueError(f"Version de trace non supportée : {version}")
+            self.metadata = json.loads(file.read(payload_size).decode("utf-8"))
+        header_size = HEADER_STRUCT.size + payload_size
+        self.offset = header_size + (-header_size % HEADER_ALIGNMENT)
+        # Le nombre d'enregistrements est déduit de la taille : une trace en cours d'écriture reste lisible
+        count = (os.path.getsize(path) - self.offset) // TRACE_DTYPE.itemsize
+        if count:
+            self.records = np.memmap(path, dtype=TRACE_DTYPE, mode="r", offset=self.offset, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=TRACE_DTYPE)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def column(self, name: str) -> np.ndarray:
+        return self.records[name]
+
+    def window(self, start: int, end: int) -> np.ndarray:
+        # Enregistrements dont le temps (en minutes) est dans [start, end[ ; la recherche dichotomique
+        # ne touche que quelques pages du fichier
+        times = self.records["time"]
+        lo = int(np.searchsorted(times, start, side="left"))
+        hi = int(np.searchsorted(times, end, side="left"))
+        return self.records[lo:hi]
+
+    def mode_name(self, code: int) -> str | None:
+        modes = self.metadata.get("modes", [])
+        return modes[code] if code < len(modes) else None
+
+
+def write_trace(path: str | os.PathLike, recorder: SimulationRecorder, metadata: dict, chunk_size: int = RENDER_CHUNK) -> None:
+    with TraceWriter(path, metadata) as writer:
+        for start in range(0, len(recorder), chunk_size):
+            stop = min(start + chunk_size, len(recorder))
+            events = recorder.events[start:stop]
+            bolus = np.where(events & EVENT_CORRECTION, recorder.correction[start:stop], 0.0)
+            bolus += np.where(events & EVENT_MEAL, recorder.meal[start:stop], 0.0)
+            writer.append_columns(
+                time=recorder.time[start:stop],
+                glucose=recorder.glucose[start:stop],
+                basal=recorder.basal[start:stop],
+                bolus=bolus,
+                mode=recorder.mode[start:stop],
+                alarms=recorder.alarms[start:stop],
+            )
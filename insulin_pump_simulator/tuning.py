@@ -0,0 +1,256 @@
+import math
+import numpy as np
+from .bolus import round2
+from .cohort import CohortSimulator
+from .config import PumpConfig
+from .kinetics import Absorption
+from .metrics import VERY_LOW_GLUCOSE, EPISODE_MINUTES
+from .patient import Patient
+from .scenario import scenario_rng
+from .simulator import Simulator
+
+# Paramètres optimisés et bornes de recherche. Le planning basal est optimisé par un facteur appliqué au
+# planning de la PumpConfig (sa forme horaire est conservée)
+TUNING_BOUNDS = {
+    "target_glucose": (90, 160),
+    "gain": (0.25, 2.0),
+    "basal_scale": (0.5, 1.5),
+    "insulin_to_carb_ratio": (5, 25),
+}
+# Pas de chaque paramètre : les candidats sont arrondis à cette grille, ce qui rend le cache efficace
+TUNING_STEPS = {"target_glucose": 1, "gain": 0.05, "basal_scale": 0.05, "insulin_to_carb_ratio": 0.5}
+# Score : temps dans la cible (%) moins les pénalités par % de temps sous 70 et sous 54 mg/dL
+HYPO_PENALTY = 3.0
+SEVERE_HYPO_PENALTY = 10.0
+# Arrêt d'un candidat dès que la glycémie reste sous SAFETY_GLUCOSE pendant SAFETY_MINUTES consécutives
+SAFETY_GLUCOSE = VERY_LOW_GLUCOSE
+SAFETY_MINUTES = EPISODE_MINUTES
+# Recherche par entropie croisée : part des meilleurs candidats retenue et lissage de la distribution
+ELITE_FRACTION = 0.2
+SMOOTHING = 0.7
+
+
+def snap(candidate: dict) -> dict:
+    # Candidat ramené dans les bornes et sur la grille TUNING_STEPS
+    snapped = {}
+    for name, (low, high) in TUNING_BOUNDS.items():
+        step = TUNING_STEPS[name]
+        value = min(max(float(candidate[name]), low), high)
+        snapped[name] = round(round(value / step) * step, 2)
+    return snapped
+
+
+def _absorption_key(absorption: Absorption | None) -> tuple | None:
+    return (absorption.peak_minutes, absorption.depot, absorption.active) if absorption is not None else None
+
+
+def _patient_key(patient: Patient) -> tuple:
+    # Le lot part de l'état du patient, insuline et glucides en cours d'absorption compris
+    return (patient.glucose_level, patient.insulin_sensitivity, patient.carb_sensitivity,
+            _absorption_key(patient.insulin_absorption), _absorption_key(patient.carb_absorption))
+
+
+def _config_key(config: PumpConfig) -> tuple:
+    return tuple(config.programmed_basal_rates), config.insulin_sensitivity_factor, config.max_bolus
+
+
+def simulate_candidates(entries: list[tuple[Patient, PumpConfig, dict]], duration: int = 24,
+                        safety_glucose: float = SAFETY_GLUCOSE, safety_minutes: int = SAFETY_MINUTES) -> list[dict]:
+    # Évalue des triplets (patient, configuration, candidat) dans une seule CohortSimulator : une colonne par
+    # candidat. Un candidat qui franchit la borne de sécurité est retiré du lot dès la minute où il la franchit
+    # (ses métriques portent alors sur les minutes simulées) ; la simulation s'arrête si tous sont arrêtés.
+    results = [None] * len(entries)
+    # Une cohorte a une cinétique pour tous ses patients ou pour aucun : un lot par combinaison
+    groups = {}
+    for index, (patient, _, _) in enumerate(entries):
+        groups.setdefault((patient.insulin_absorption is not None, patient.carb_absorption is not None), []).append(index)
+    for indices in groups.values():
+        for index, result in zip(indices, _simulate([entries[index] for index in indices], duration, safety_glucose, safety_minutes)):
+            results[index] = result
+    return results
+
+
+def _simulate(entries: list, duration: int, safety_glucose: float, safety_minutes: int) -> list[dict]:
+    patients = [patient for patient, _, _ in entries]
+    configs = [config for _, config, _ in entries]
+    candidates = [candidate for _, _, candidate in entries]
+    cohort = CohortSimulator.from_patients(patients, configs)
+    cohort.target_glucose[:] = [candidate["target_glucose"] for candidate in candidates]
+    cohort.gain[:] = [candidate["gain"] for candidate in candidates]
+    cohort.insulin_to_carb_ratio[:] = [candidate["insulin_to_carb_ratio"] for candidate in candidates]
+    # Planning programmé mis à l'échelle, sans mode appliqué : celui que reconstruit ProfileTuner.configuration
+    cohort.basal_multipliers = None
+    cohort.basal_rates[:] = round2(np.array([config.programmed_basal_rates for config in configs])
+                                   * np.array([candidate["basal_scale"] for candidate in candidates])[:, None])
+
+    n = cohort.size
+    # Colonnes encore simulées (indices dans `entries`) et minutes consécutives sous la borne de sécurité
+    alive = np.arange(n)
+    below = np.zeros(n, dtype=np.int64)
+    stopped_at = np.full(n, -1)
+    counts = np.zeros((4, n), dtype=np.int64)
+    minutes = np.zeros(n, dtype=np.int64)
+
+    def finish(columns: np.ndarray, minute: int) -> None:
+        # Compteurs de la cohorte (< 54, < 70, > 180, > 250) des colonnes terminées
+        counts[:, alive[columns]] = cohort.metrics.zone_counts[:, columns]
+        minutes[alive[columns]] = minute
+
+    for minute in range(1, duration * 60 + 1):
+        glucose, insulin = cohort.step()
+        cohort.metrics.add(glucose, insulin)
+        below += 1
+        below *= glucose < safety_glucose
+        killed = below >= safety_minutes
+        if killed.any():
+            columns = np.flatnonzero(killed)
+            finish(columns, minute)
+            stopped_at[alive[columns]] = minute
+            survivors = np.flatnonzero(~killed)
+            cohort.keep(survivors)
+            alive = alive[survivors]
+            below = below[survivors]
+            if not alive.size:
+                break
+    else:
+        finish(np.arange(alive.size), duration * 60)
+
+    results = []
+    for index, candidate in enumerate(candidates):
+        very_low, low, high, _ = counts[:, index].tolist()
+        simulated = int(minutes[index])
+        results.append({
+            **candidate,
+            "basal_rates": round2(np.asarray(configs[index].programmed_basal_rates) * candidate["basal_scale"]).tolist(),
+            "minutes": simulated,
+            "stopped_at": int(stopped_at[index]) if stopped_at[index] >= 0 else None,
+            "time_in_range": (simulated - low - high) / simulated * 100,
+            "time_below_range": low / simulated * 100,
+            "time_below_54": very_low / simulated * 100,
+            "time_above_range": high / simulated * 100,
+        })
+    return results
+
+
+class ProfileTuner:
+    # Optimise target_glucose, gain du contrôleur, planning basal et ratio insuline/glucides d'un patient virtuel :
+    # recherche par entropie croisée, chaque itération étant un lot de candidats simulés ensemble. Les résultats
+    # sont mis en cache par (patient, configuration, durée, borne de sécurité, candidat) ; `cache` peut être
+    # partagé entre optimisations.
+    def __init__(self, patient: Patient = None, config: PumpConfig = None, target_glucose: float = 120, duration: int = 24, seed: int = 0,
+                 hypo_penalty: float = HYPO_PENALTY, severe_hypo_penalty: float = SEVERE_HYPO_PENALTY,
+                 safety_glucose: float = SAFETY_GLUCOSE, safety_minutes: int = SAFETY_MINUTES, cache: dict = None,
+                 rng: np.random.Generator = None):
+        self.patient = patient if patient is not None else Patient()
+        self.config = config if config is not None else PumpConfig()
+        self.duration = duration
+        self.hypo_penalty = hypo_penalty
+        self.severe_hypo_penalty = severe_hypo_penalty
+        self.safety_glucose = safety_glucose
+        self.safety_minutes = safety_minutes
+        self.cache = cache if cache is not None else {}
+        self.rng = rng if rng is not None else np.random.default_rng(seed)
+        # Point de départ : les réglages actuels, proposés tels quels au premier lot
+        self.initial = snap({"target_glucose": target_glucose, "gain": 1.0, "basal_scale": 1.0,
+                             "insulin_to_carb_ratio": self.config.insulin_to_carb_ratio})
+        self.mean = np.array([self.initial[name] for name in TUNING_BOUNDS], dtype=float)
+        self.std = np.array([(high - low) / 4 for low, high in TUNING_BOUNDS.values()])
+        self.best = None
+        # Candidats effectivement simulés (hors cache)
+        self.evaluations = 0
+
+    def _key(self, candidate: dict) -> tuple:
+        return (_patient_key(self.patient), _config_key(self.config), self.duration, self.safety_glucose,
+                self.safety_minutes, tuple(candidate[name] for name in TUNING_BOUNDS))
+
+    def score(self, result: dict) -> float:
+        if result["stopped_at"] is not None:
+            return -math.inf
+        return (result["time_in_range"] - self.hypo_penalty * result["time_below_range"]
+                - self.severe_hypo_penalty * result["time_below_54"])
+
+    def propose(self, size: int) -> list[dict]:
+        samples = self.rng.normal(self.mean, self.std, size=(size, len(TUNING_BOUNDS)))
+        candidates = [snap(dict(zip(TUNING_BOUNDS, sample.tolist()))) for sample in samples]
+        if self.best is None:
+            candidates[0] = dict(self.initial)
+        return candidates
+
+    def evaluate(self, candidates: list[dict]) -> list[dict]:
+        return evaluate_tuners([self], [candidates])[0]
+
+    def update(self, results: list[dict]) -> None:
+        # Moyenne et écart type recentrés sur les meilleurs candidats du lot (à score égal, ceux qui ont tenu
+        # le plus longtemps avant l'arrêt)
+        ranked = sorted(results, key=lambda result: (result["score"], result["minutes"]), reverse=True)
+        if self.best is None or (ranked[0]["score"], ranked[0]["minutes"]) > (self.best["score"], self.best["minutes"]):
+            self.best = ranked[0]
+        elite = np.array([[result[name] for name in TUNING_BOUNDS] for result in ranked[:max(2, math.ceil(len(ranked) * ELITE_FRACTION))]])
+        steps = np.array([TUNING_STEPS[name] for name in TUNING_BOUNDS])
+        self.mean = SMOOTHING * elite.mean(axis=0) + (1 - SMOOTHING) * self.mean
+        self.std = np.maximum(SMOOTHING * elite.std(axis=0) + (1 - SMOOTHING) * self.std, steps)
+
+    def optimize(self, iterations: int = 10, batch_size: int = 64) -> dict:
+        for _ in range(iterations):
+            self.update(self.evaluate(self.propose(batch_size)))
+        return self.best
+
+    def configuration(self, result: dict = None) -> PumpConfig:
+        # PumpConfig du meilleur candidat (ou de `result`), à partir de la configuration optimisée
+        result = result if result is not None else self.best
+        config = PumpConfig(list(result["basal_rates"]), result["insulin_to_carb_ratio"], self.config.max_bolus,
+                            self.config.insulin_sensitivity_factor, {name: dict(mode) for name, mode in self.config.modes.items()})
+        config.validate()
+        return config
+
+    def simulator(self, result: dict = None) -> Simulator:
+        # Simulateur scalaire avec les réglages d'un candidat, pour vérifier ou exporter son journal (le patient
+        # repart, comme dans les lots, de son état actuel ; self.patient n'est pas modifié)
+        result = result if result is not None else self.best
+        insulin, carbs = self.patient.insulin_absorption, self.patient.carb_absorption
+        patient = Patient(self.patient.glucose_level, self.patient.insulin_sensitivity, self.patient.carb_sensitivity,
+                          insulin_absorption=insulin.copy() if insulin is not None else None,
+                          carb_absorption=carbs.copy() if carbs is not None else None)
+        simulator = Simulator(self.duration, result["target_glucose"], patient=patient, config=self.configuration(result))
+        simulator.controller.gain = result["gain"]
+        return simulator
+
+
+def evaluate_tuners(tuners: list[ProfileTuner], batches: list[list[dict]]) -> list[list[dict]]:
+    # Candidats de plusieurs optimisations évalués ensemble ; seuls les candidats absents du cache (et distincts)
+    # sont simulés, un lot par durée et borne de sécurité (celles de l'optimiseur de chaque candidat)
+    pending = {}
+    for tuner, candidates in zip(tuners, batches):
+        for candidate in candidates:
+            key = tuner._key(candidate)
+            if key not in tuner.cache and key not in pending:
+                pending[key] = (tuner, candidate)
+    groups = {}
+    for key, (tuner, candidate) in pending.items():
+        groups.setdefault((tuner.duration, tuner.safety_glucose, tuner.safety_minutes), []).append((key, tuner, candidate))
+    for (duration, safety_glucose, safety_minutes), group in groups.items():
+        entries = [(tuner.patient, tuner.config, candidate) for _, tuner, candidate in group]
+        for (key, tuner, _), result in zip(group, simulate_candidates(entries, duration, safety_glucose, safety_minutes)):
+            tuner.cache[key] = result
+            tuner.evaluations += 1
+    return [[{**tuner.cache[tuner._key(candidate)], "score": tuner.score(tuner.cache[tuner._key(candidate)])}
+             for candidate in candidates] for tuner, candidates in zip(tuners, batches)]
+
+
+def tune_patients(patients: list[Patient], configs: list[PumpConfig] = None, iterations: int = 10, batch_size: int = 64,
+                  seed: int = 0, **options) -> list[ProfileTuner]:
+    # Une optimisation par patient virtuel, menées de front : à chaque itération, les lots de tous les patients
+    # sont simulés dans une seule cohorte. Chaque patient a son propre flux aléatoire (voir scenario_rng)
+    if configs is None:
+        configs = [PumpConfig() for _ in patients]
+    if len(configs) != len(patients):
+        raise ValueError("Un PumpConfig est requis pour chaque patient")
+    cache = options.pop("cache", None)
+    cache = cache if cache is not None else {}
+    tuners = [ProfileTuner(patient, config, rng=scenario_rng(seed, index), cache=cache, **options)
+              for index, (patient, config) in enumerate(zip(patients, configs))]
+    for _ in range(iterations):
+        batches = [tuner.propose(batch_size) for tuner in tuners]
+        for tuner, results in zip(tuners, evaluate_tuners(tuners, batches)):
+            tuner.update(results)
+    return tuners
@@ -1 +1,17 @@
+from setuptools import setup, find_packages
 
+setup(
+    name="insulin_pump_simulator",
+    version="0.1.0",
+    description="Simulateur de pompe à insuline en boucle fermée",
+    author="Gibier Maxime, The Hau Tang, Bryan Gonzalez Villaquiran",
+    packages=find_packages(include=["insulin_pump_simulator", "insulin_pump_simulator.*"]),
+    package_data={"insulin_pump_simulator": ["data/*.json"]},
+    python_requires=">=3.10",
+    install_requires=["numpy"],
+    entry_points={
+        "console_scripts": [
+            "insulin-pump-sim=insulin_pump_simulator.cli:main",
+        ],
+    },
+)
@@ -0,0 +1,74 @@
+from insulin_pump_simulator.alarms import AlarmManager, AlarmCode
+from insulin_pump_simulator.insulin_pump import InsulinPump
+from insulin_pump_simulator.simulator import Simulator
+from insulin_pump_simulator.patient import Patient
+
+
+def test_deduplication_hysteresis_and_rate_limit():
+    alarms = AlarmManager(hysteresis=30, rate_limit=60)
+
+    assert alarms.raise_alarm("High glucose alert", now=0), "La première alarme devrait être levée"
+    assert not any(alarms.raise_alarm(AlarmCode.HIGH_GLUCOSE, now=minute) for minute in range(1, 100)), "Une alarme active ne devrait pas être relevée"
+    assert alarms.is_active(AlarmCode.HIGH_GLUCOSE, now=120) and not alarms.is_active(AlarmCode.HIGH_GLUCOSE, now=130), "L'alarme s'éteint après la fenêtre d'hystérésis"
+    assert alarms.raise_alarm(AlarmCode.HIGH_GLUCOSE, now=140), "Après extinction et le délai minimal, l'alarme devrait être relevée"
+    alarms.clear(AlarmCode.HIGH_GLUCOSE)
+    assert not alarms.raise_alarm(AlarmCode.HIGH_GLUCOSE, now=150), "Une alarme relevée trop tôt après la précédente est limitée"
+    assert alarms.raise_alarm(AlarmCode.LOW_BATTERY, now=150), "Chaque code est dédoublonné séparément"
+
+    assert alarms == ["High glucose alert", "High glucose alert", "Low battery alert"], "Le journal devrait contenir les alarmes levées"
+    assert alarms.suppressed[AlarmCode.HIGH_GLUCOSE] == 100 and alarms.suppressed_total == 100, "Les alarmes supprimées devraient être comptées"
+    assert alarms.raised[AlarmCode.HIGH_GLUCOSE] == 2, "Les alarmes levées devraient être comptées"
+    assert alarms.active(now=150) == [AlarmCode.LOW_BATTERY], "Une alarme limitée en fréquence ne devrait pas être active"
+    print("Alarmes : dédoublonnage, hystérésis et limitation de fréquence")
+
+
+def test_ring_buffer_and_subscriptions():
+    alarms = AlarmManager(capacity=4, hysteresis=0, rate_limit=0)
+    received, battery = [], []
+    unsubscribe = alarms.subscribe(received.append)
+    alarms.subscribe(battery.append, codes=[AlarmCode.LOW_BATTERY])
+
+    for minute in range(10):
+        alarms.raise_alarm(f"Occlusion {minute % 2}", now=minute * 2)
+    alarms.raise_alarm("Low battery alert", now=20)
+    unsubscribe()
+    alarms.raise_alarm("Low battery alert", now=30)
+
+    assert len(alarms) == 4 and alarms[-1] == "Low battery alert", "Le journal circulaire devrait garder les dernières alarmes"
+    assert alarms.entries()[0].time == 16, "Les plus anciennes alarmes devraient être évincées"
+    assert len(received) == 11, "L'abonné devrait recevoir chaque alarme levée jusqu'au désabonnement"
+    assert [alarm.code for alarm in battery] == [AlarmCode.LOW_BATTERY] * 2, "Le filtre par code de l'abonnement est incorrect"
+    assert alarms.entries()[-2].code == AlarmCode.LOW_BATTERY and received[0].code == AlarmCode.OTHER, "Les messages libres ont le code OTHER"
+    print("Alarmes : journal circulaire borné et abonnements")
+
+
+def test_long_hyperglycemia_keeps_memory_constant():
+    # Sensibilité nulle : la glycémie reste au-dessus du seuil critique pendant toute la simulation
+    simulator = Simulator(72, patient=Patient(400, 0))
+    simulator.run_simulation()
+    alarms = simulator.pump.alarms
+
+    assert alarms == ["High glucose alert"], "Une hyperglycémie continue ne devrait lever qu'une alarme"
+    assert alarms.suppressed[AlarmCode.HIGH_GLUCOSE] == 72 * 60 - 1, "Les mesures suivantes devraient être supprimées"
+    assert alarms.is_active(AlarmCode.HIGH_GLUCOSE), "L'alarme devrait rester active"
+    assert alarms.entries()[0].time == 1, "L'alarme devrait être datée en minutes simulées"
+    pump = InsulinPump()
+    assert pump.add_alarm("Low battery alert") and not pump.add_alarm("Low battery alert"), "La pompe devrait dédoublonner ses alarmes"
+    print("Alarmes : mémoire constante sur une longue hyperglycémie")
+
+
+def test_rate_limited_alarm_is_raised_after_the_window():
+    alarms = AlarmManager(hysteresis=30, rate_limit=60)
+    alarms.raise_alarm(AlarmCode.HIGH_GLUCOSE, now=0)
+    alarms.clear(AlarmCode.HIGH_GLUCOSE)
+    raised = [minute for minute in range(20, 600, 5) if alarms.raise_alarm(AlarmCode.HIGH_GLUCOSE, now=minute)]
+
+    assert raised == [60], "L'alarme revenue pendant le délai devrait être levée dès la fin du délai, une seule fois"
+    assert alarms.is_active(AlarmCode.HIGH_GLUCOSE, now=595), "L'alarme levée devrait rester active pendant la condition"
+
+    for index in range(10_000):
+        alarms.raise_alarm(f"Occlusion {index}", now=600 + index)
+    assert len(alarms._states) <= alarms.capacity + len(AlarmCode), "Le suivi des messages libres devrait rester borné"
+    assert alarms.is_active(AlarmCode.HIGH_GLUCOSE, now=600), "Les alarmes codées ne devraient pas être évincées"
+    assert not alarms.raise_alarm("Occlusion 9999", now=10_600), "Un message récent devrait rester dédoublonné"
+    print("Alarmes : une alarme limitée est levée à la fin du délai, suivi des messages borné")
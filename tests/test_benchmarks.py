@@ -0,0 +1,35 @@
+from benchmarks.suite import BENCHMARKS, compare, run_benchmarks, save_baseline, load_baseline, main
+import json
+
+
+def test_compare_flags_only_slowdowns_past_threshold():
+    baseline = {"a": 1.0, "b": 1.0, "c": 1.0}
+    results = {"a": 1.2, "b": 1.5, "c": 0.5, "nouveau": 9.0}
+
+    assert compare(results, baseline, threshold=0.25) == {"b": 1.5}, "Seul b dépasse le seuil de 25 %"
+    assert compare(results, baseline, threshold=0.1) == {"a": 1.2, "b": 1.5}, "Le seuil devrait être configurable"
+    print("Benchmarks : seules les régressions au-delà du seuil sont signalées")
+
+
+def test_suite_covers_hot_paths_and_round_trips_baseline(tmp_path):
+    for name in ("pdm.construct", "cgm.measure_glucose", "controller.control_loop", "pump.meal_bolus",
+                 "pump.correction_bolus", "simulator.run[24h,1]", "simulator.run[24h,10]"):
+        assert name in BENCHMARKS, f"Benchmark manquant : {name}"
+
+    names = ["cgm.measure_glucose", "pump.meal_bolus", "simulator.run[1h,1]"]
+    results = run_benchmarks(names, quick=True)
+    path = tmp_path / "baseline.json"
+    save_baseline(results, path)
+
+    assert load_baseline(path) == results, "La référence relue diffère des résultats enregistrés"
+    assert all(seconds > 0 for seconds in results.values()), "Les temps mesurés devraient être positifs"
+    print("Benchmarks : la référence JSON est enregistrée puis relue")
+
+
+def test_main_fails_on_regression(tmp_path):
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"results": {"pump.meal_bolus": 1e-12}}))
+
+    assert main(["pump.meal_bolus", "--quick", "--baseline", str(path)]) == 1, "Une régression devrait faire échouer la commande"
+    assert main(["pump.meal_bolus", "--quick", "--baseline", str(path), "--threshold", "1e9"]) == 0, "Le seuil devrait être respecté"
+    print("Benchmarks : la commande échoue en cas de régression")
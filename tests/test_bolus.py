@@ -0,0 +1,58 @@
+from insulin_pump_simulator.bolus import meal_boluses, correction_boluses, bolus_table
+from insulin_pump_simulator.insulin_pump import InsulinPump
+from insulin_pump_simulator.config import PumpConfig
+import numpy as np
+import pytest
+
+
+def test_batched_boluses_match_scalar_rounding():
+    rng = np.random.default_rng(7)
+    n = 20_000
+    carbs = rng.integers(0, 200, n).astype(float) + rng.choice([0, 0.5, 0.25], n)
+    glucose = np.round(rng.uniform(40, 400, n), 1)
+    target = rng.choice([100, 110, 120, 140], n)
+    ratio = rng.choice([8, 10, 12, 15, 7.5], n)
+    factor = rng.choice([25, 30, 40, 50, 45], n)
+    on_board = np.where(rng.random(n) < 0.5, 0.0, np.round(rng.uniform(0, 3, n), 2))
+    maximum = rng.choice([5, 10, 15], n)
+
+    meal = meal_boluses(carbs, ratio, maximum)
+    correction = correction_boluses(glucose, target, factor, on_board, maximum)
+    expected_meal, expected_correction = [], []
+    for values in zip(carbs.tolist(), glucose.tolist(), target.tolist(), ratio.tolist(), factor.tolist(), on_board.tolist(), maximum.tolist()):
+        c, g, t, icr, isf, iob, max_bolus = values
+        pump = InsulinPump()
+        pump.config.insulin_to_carb_ratio = icr
+        pump.config.insulin_sensitivity_factor = isf
+        expected_meal.append(min(pump.calculate_meal_bolus(c), max_bolus))
+        expected_correction.append(min(pump.calculate_correction_bolus(g, t, iob), max_bolus))
+
+    assert meal.tolist() == expected_meal, "Les bolus de repas diffèrent du calcul scalaire"
+    assert correction.tolist() == expected_correction, "Les bolus de correction diffèrent du calcul scalaire"
+    print("Bolus : le calcul par tableaux reproduit exactement le calcul scalaire")
+
+
+def test_pump_batched_methods_clip_to_max_bolus():
+    pump = InsulinPump()
+    pump.apply_configuration(PumpConfig(insulin_to_carb_ratio=10, insulin_sensitivity_factor=50, max_bolus=5))
+    pump.last_message = ""
+
+    assert pump.calculate_meal_boluses([30, 60, 100]).tolist() == [3.0, 5.0, 5.0], "Les bolus de repas devraient être plafonnés"
+    assert pump.calculate_meal_boluses([100], clip=False).tolist() == [10.0], "Sans plafond, la dose n'est pas limitée"
+    assert pump.calculate_correction_boluses([170, 500], 120).tolist() == [1.0, 5.0], "Les corrections devraient être plafonnées"
+    assert pump.last_message == "", "Le calcul par tableaux ne doit produire aucun message"
+    print("Bolus : les doses par tableaux sont plafonnées à max_bolus")
+
+
+def test_bolus_table_is_memoized_and_read_only():
+    pump = InsulinPump()
+    meal, correction = pump.bolus_table(120)
+    again = pump.bolus_table(120)
+
+    assert again[0] is meal and again[1] is correction, "La table devrait être mise en cache"
+    assert len(meal) == 31 and len(correction) == 37, "Les grilles par défaut sont incorrectes"
+    assert meal[12] == min(pump.calculate_meal_bolus(60), pump.config.max_bolus), "La table devrait correspondre au calcul scalaire"
+    with pytest.raises(ValueError):
+        meal[0] = 1.0
+    assert bolus_table.cache_info().hits >= 1, "Le second appel devrait venir du cache"
+    print("Bolus : la table de doses est mémorisée et partagée")
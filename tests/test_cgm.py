@@ -0,0 +1,48 @@
+from insulin_pump_simulator.cgm import CGM
+from insulin_pump_simulator.patient import Patient
+from insulin_pump_simulator.pdm import PDM
+import queue
+import pytest
+
+
+def test_measure_glucose_does_not_build_pdm(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("Un PDM ne doit pas être construit pendant une mesure")
+
+    cgm = CGM()
+    monkeypatch.setattr(PDM, "__init__", fail)
+    glucose, message, alarms = cgm.measure_glucose(Patient(initial_glucose=300))
+
+    assert glucose == 300, "La glycémie mesurée est incorrecte"
+    assert message == "Alerte : glycémie critique de 300 mg/dL", "Le message d'alerte est incorrect"
+    assert alarms == ("High glucose alert",), "L'alerte de glycémie élevée est manquante"
+    print("CGM : la mesure ne construit aucun PDM")
+
+
+def test_alerts_go_to_injected_sink():
+    pdm = PDM(120)
+    alerts = queue.Queue()
+
+    CGM(alert_sink=pdm).measure_glucose(Patient(initial_glucose=260))
+    CGM(alert_sink=alerts.put).measure_glucose(Patient(initial_glucose=260))
+    CGM(alert_sink=alerts.put).measure_glucose(Patient(initial_glucose=140))
+
+    assert pdm.pump.alarms == ["High glucose alert"], "L'alerte devrait être transmise au PDM"
+    assert alerts.qsize() == 1 and alerts.get() == "High glucose alert", "L'alerte devrait être transmise à la file"
+    with pytest.raises(TypeError):
+        CGM(alert_sink=42)
+    print("CGM : les alertes sont transmises au destinataire configuré")
+
+
+def test_measure_many():
+    received = []
+    cgm = CGM(alert_sink=received.append)
+    patients = [Patient(initial_glucose=glucose) for glucose in (110, 260, 180, 300)]
+
+    glucose, alerts = cgm.measure_many(patients)
+
+    assert glucose.tolist() == [110, 260, 180, 300], "Les glycémies mesurées sont incorrectes"
+    assert alerts.tolist() == [False, True, False, True], "Les patients en alerte sont incorrects"
+    assert received == ["High glucose alert"] * 2, "Une alerte par patient au-dessus du seuil est attendue"
+    assert cgm.current_glucose == 300, "La dernière glycémie mesurée devrait être conservée"
+    print("CGM : la mesure groupée est correcte")
@@ -0,0 +1,57 @@
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+import insulin_pump_simulator
+from insulin_pump_simulator.cli import main
+from insulin_pump_simulator.tracefile import TraceReader
+
+
+def read_summary(directory) -> list[dict]:
+    with open(directory / "summary.jsonl", encoding="utf-8") as file:
+        return sorted((json.loads(line) for line in file), key=lambda row: row["patient"])
+
+
+def test_batch_run_writes_outputs(tmp_path):
+    scenario = tmp_path / "scenario.json"
+    scenario.write_text(json.dumps({"seed": 4, "target_glucose": 110, "parameters": {"sensor_noise_sd": 2}}))
+
+    assert main(["--scenario", str(scenario), "--patients", "3", "--hours", "2", "--jobs", "1", "--format", "csv",
+                 "--output", str(tmp_path / "csv"), "--quiet"]) == 0
+    rows = read_summary(tmp_path / "csv")
+
+    assert [row["patient"] for row in rows] == [0, 1, 2] and all(row["seed"] == 4 for row in rows), "Une synthèse par patient est attendue"
+    assert all(row["count"] == 120 for row in rows), "Chaque simulation devrait durer deux heures"
+    with open(rows[0]["output"], encoding="utf-8") as file:
+        assert len(file.read().splitlines()) == 121, "Le CSV devrait contenir un en-tête et une ligne par minute"
+    print("CLI : journaux et synthèses écrits pour chaque patient")
+
+
+def test_parallel_run_matches_sequential(tmp_path, capsys):
+    arguments = ["--patients", "4", "--hours", "3", "--seed", "9", "--format", "trace"]
+    assert main(arguments + ["--jobs", "1", "--output", str(tmp_path / "one")]) == 0
+    assert main(arguments + ["--jobs", "2", "--output", str(tmp_path / "two")]) == 0
+    sequential, parallel = read_summary(tmp_path / "one"), read_summary(tmp_path / "two")
+
+    strip = lambda rows: [{key: value for key, value in row.items() if key != "output"} for row in rows]
+    assert strip(sequential) == strip(parallel), "Les résultats ne devraient pas dépendre du nombre de processus"
+    assert len(TraceReader(parallel[3]["output"])) == 180, "La trace binaire devrait contenir chaque minute"
+    assert "heures-patient/s" in capsys.readouterr().err, "Le débit devrait être affiché"
+    print("CLI : exécution parallèle identique à l'exécution séquentielle")
+
+
+def test_installed_package_runs_outside_the_repository(tmp_path):
+    # Paquet copié hors du dépôt, comme une fois installé : les données d'exemple viennent du paquet
+    shutil.copytree(Path(insulin_pump_simulator.__file__).parent, tmp_path / "insulin_pump_simulator",
+                    ignore=shutil.ignore_patterns("__pycache__"))
+    config = tmp_path / "config.json"
+    data = json.loads((tmp_path / "insulin_pump_simulator" / "data" / "sample_input_data.json").read_text(encoding="utf-8"))
+    data["pump_configuration"]["max_bolus"] = 7
+    config.write_text(json.dumps(data), encoding="utf-8")
+    for arguments in ([], ["--config", str(config), "--jobs", "2", "--patients", "2"]):
+        completed = subprocess.run([sys.executable, "-m", "insulin_pump_simulator", "--hours", "1", "--jobs", "1", "--quiet", *arguments],
+                                   cwd=tmp_path, capture_output=True, text=True)
+        assert completed.returncode == 0, f"La commande devrait fonctionner hors du dépôt : {completed.stderr}"
+        assert all(json.loads(line)["count"] == 60 for line in completed.stdout.splitlines()), "Une synthèse par patient est attendue"
+    print("CLI : le paquet fonctionne hors du dépôt, avec ou sans --config")
@@ -0,0 +1,61 @@
+from insulin_pump_simulator.cohort import CohortSimulator, round2
+from insulin_pump_simulator.simulator import Simulator
+from insulin_pump_simulator.patient import Patient
+from insulin_pump_simulator.config import PumpConfig
+import numpy as np
+
+
+def test_round2_matches_builtin_round():
+    values = np.array([0.905, 1.005, 2.675, 0.125, -0.835, 119.995, 3.14159])
+    expected = [round(value, 2) for value in values.tolist()]
+
+    assert round2(values).tolist() == expected, "L'arrondi vectorisé doit correspondre à round()"
+    print("Cohorte : l'arrondi vectorisé est identique à round()")
+
+
+def test_cohort_matches_scalar_simulator():
+    patients = [Patient(130, 35, 1.5), Patient(200, 25, 2), Patient(80, 45, 0.8)]
+    configs = [
+        PumpConfig(basal_rates=[0.9] * 24, insulin_to_carb_ratio=12, insulin_sensitivity_factor=40),
+        PumpConfig(basal_rates=[1.2] * 24, insulin_to_carb_ratio=8, insulin_sensitivity_factor=25),
+        PumpConfig(basal_rates=[0.5] * 24, insulin_to_carb_ratio=15, insulin_sensitivity_factor=45),
+    ]
+    cohort = CohortSimulator.from_patients(patients, configs)
+    cohort.run(24 * 60)
+
+    for i, (patient, config) in enumerate(zip(patients, configs)):
+        simulator = Simulator(24, patient=Patient(patient.glucose_level, patient.insulin_sensitivity, patient.carb_sensitivity), config=config)
+        simulator.run_simulation()
+
+        glucose = simulator.log.glucose.tolist()
+        insulin = simulator.log.insulin.tolist()
+        assert cohort.glucose_log[:, i].tolist() == glucose, f"La glycémie du patient {i} diffère du simulateur scalaire"
+        assert cohort.insulin_log[:, i].tolist() == insulin, f"Les doses du patient {i} diffèrent du simulateur scalaire"
+    print("Cohorte : les résultats sont identiques au simulateur scalaire")
+
+
+def test_cohort_broadcasts_shared_parameters():
+    cohort = CohortSimulator(initial_glucose=[120] * 1000, insulin_sensitivity=30, carb_sensitivity=1,
+                             basal_rates=[0.8] * 24, target_glucose=120, insulin_sensitivity_factor=30, insulin_to_carb_ratio=10)
+    cohort.run(60, record=False)
+
+    assert cohort.size == 1000, "La cohorte devrait contenir 1000 patients"
+    assert cohort.glucose_log is None, "Aucun journal ne devrait être enregistré avec record=False"
+    assert np.all(cohort.glucose == cohort.glucose[0]), "Des patients identiques doivent évoluer de la même façon"
+    print("Cohorte : les paramètres communs sont diffusés à tous les patients")
+
+
+def test_cohort_applies_modes_at_delivery():
+    configs = [PumpConfig(basal_rates=[0.9] * 24), PumpConfig(basal_rates=[1.1] * 24), PumpConfig(basal_rates=[0.7] * 24)]
+    configs[0].apply_mode("Sport")
+    configs[1].apply_mode("Night")
+    patients = [Patient(150, 30, 1.5), Patient(180, 35, 2), Patient(110, 40, 1)]
+    cohort = CohortSimulator.from_patients(patients, configs)
+    cohort.run(24 * 60)
+
+    for i, (patient, config) in enumerate(zip(patients, configs)):
+        simulator = Simulator(24, patient=Patient(patient.glucose_level, patient.insulin_sensitivity, patient.carb_sensitivity), config=config)
+        simulator.run_simulation()
+        assert cohort.glucose_log[:, i].tolist() == simulator.log.glucose.tolist(), f"La glycémie du patient {i} diffère du simulateur scalaire"
+        assert cohort.insulin_log[:, i].tolist() == simulator.log.insulin.tolist(), f"Les doses du patient {i} diffèrent du simulateur scalaire"
+    print("Cohorte : les modes appliqués sont administrés comme dans le simulateur scalaire")
@@ -0,0 +1,69 @@
+from insulin_pump_simulator.events import EventDrivenSimulator
+from insulin_pump_simulator.simulator import Simulator
+from insulin_pump_simulator.recorder import EVENT_MEASURE, ALARM_LOW_BATTERY
+from insulin_pump_simulator.patient import Patient
+from insulin_pump_simulator.config import PumpConfig
+import numpy as np
+
+
+def build(simulator_class, measurement_interval=5):
+    simulator = simulator_class(48, patient=Patient(180, 35, 1.5), measurement_interval=measurement_interval)
+    simulator.schedule_meal(100, 40)
+    simulator.schedule_mode(600, "Sport")
+    simulator.schedule_battery_drain(700, 85)
+    simulator.schedule_sensor_gap(200, 263)
+    return simulator
+
+
+def test_event_driven_matches_tick_loop_at_event_times():
+    ticks = build(Simulator)
+    ticks.run_simulation()
+    events = build(EventDrivenSimulator)
+    events.run_simulation()
+
+    assert len(events.log) < len(ticks.log) / 3, "Les minutes sans événement ne devraient pas être simulées"
+    rows = np.searchsorted(ticks.log.time, events.log.time)
+    assert np.array_equal(ticks.log.time[rows], events.log.time), "Chaque événement doit correspondre à une minute de la boucle"
+    for column in ("glucose", "adjustment", "basal", "correction", "meal", "events", "mode", "alarms"):
+        assert np.array_equal(ticks.log.column(column)[rows], events.log.column(column)), f"La colonne {column} diffère de la boucle minute par minute"
+    assert events.patient.glucose_level == ticks.patient.glucose_level, "La glycémie finale devrait être identique"
+    print("Événements : les résultats sont identiques à la boucle minute par minute")
+
+
+def test_user_events_are_applied():
+    simulator = build(EventDrivenSimulator)
+    simulator.run(720)
+
+    measured = simulator.log.time[(simulator.log.events & EVENT_MEASURE) != 0]
+    assert not np.any((measured >= 200) & (measured < 263)), "Aucune mesure ne devrait avoir lieu pendant la coupure du capteur"
+    assert simulator.log.meal[simulator.log.time == 100][0] == 4, "Le repas planifié devrait déclencher un bolus"
+    assert simulator.pump.config.active_mode == "Sport", "Le mode Sport devrait être actif"
+    assert simulator.log.alarms[simulator.log.time == 700][0] & ALARM_LOW_BATTERY, "L'alarme de batterie faible devrait être enregistrée"
+    assert "Low battery alert" in simulator.pump.alarms, "L'alarme de batterie devrait être transmise à la pompe"
+    print("Événements : les événements planifiés sont appliqués")
+
+
+def test_every_minute_cadence_is_identical():
+    ticks = Simulator(6, patient=Patient(200, 35, 1.5))
+    ticks.run_simulation()
+    events = EventDrivenSimulator(6, patient=Patient(200, 35, 1.5))
+    events.run_simulation()
+
+    assert events.generate_final_log() == ticks.generate_final_log(), "Avec une mesure par minute, les journaux devraient être identiques"
+    print("Événements : une mesure par minute reproduit exactement la boucle")
+
+
+def test_constant_basal_span_reaches_the_floor():
+    def build_low(simulator_class):
+        return simulator_class(6, patient=Patient(90, 400, 1), config=PumpConfig(basal_rates=[2.0] * 24), measurement_interval=120,
+                               meal_interval=None)
+
+    ticks = build_low(Simulator)
+    ticks.run_simulation()
+    events = build_low(EventDrivenSimulator)
+    events.run_simulation()
+
+    rows = np.searchsorted(ticks.log.time, events.log.time)
+    assert np.array_equal(ticks.log.glucose[rows], events.log.glucose), "La glycémie aux événements devrait être identique"
+    assert events.patient.glucose_level == ticks.patient.glucose_level == 0, "La glycémie devrait s'arrêter au plancher de 0"
+    print("Événements : un intervalle de basal constant s'arrête au plancher de 0")
@@ -0,0 +1,56 @@
+from insulin_pump_simulator.export import write_log, iter_text
+from insulin_pump_simulator.simulator import Simulator
+from insulin_pump_simulator.patient import Patient
+import csv
+import gzip
+import io
+import json
+import pytest
+
+
+def run_simulator(hours=6):
+    simulator = Simulator(hours, patient=Patient(200, 35, 1.5))
+    simulator.run_simulation()
+    return simulator
+
+
+def test_text_export_matches_final_log(tmp_path):
+    simulator = run_simulator(24)
+    path = tmp_path / "log.txt"
+    simulator.export_log(path)
+
+    assert path.read_text(encoding="utf-8") == simulator.generate_final_log(), "L'export texte doit être identique au journal final"
+    assert len(list(iter_text(simulator.log))) > 1, "Le journal devrait être produit par blocs"
+    print("Export : l'export texte est identique au journal final")
+
+
+def test_gzip_export(tmp_path):
+    simulator = run_simulator()
+    path = tmp_path / "log.txt.gz"
+    simulator.export_log(path)
+
+    buffer = io.BytesIO()
+    simulator.export_log(buffer, compress=True)
+
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        assert file.read() == simulator.generate_final_log(), "Le fichier compressé est incorrect"
+    assert gzip.decompress(buffer.getvalue()).decode("utf-8") == simulator.generate_final_log(), "Le flux compressé est incorrect"
+    print("Export : l'export compressé est correct")
+
+
+def test_csv_and_jsonl_exports():
+    simulator = run_simulator()
+    csv_output = io.StringIO()
+    jsonl_output = io.StringIO()
+    write_log(simulator.log, csv_output, format="csv")
+    write_log(simulator.log, jsonl_output, format="jsonl")
+
+    rows = list(csv.DictReader(io.StringIO(csv_output.getvalue())))
+    records = [json.loads(line) for line in jsonl_output.getvalue().splitlines()]
+
+    assert len(rows) == len(records) == 360, "Une ligne par minute simulée est attendue"
+    assert float(rows[0]["glucose"]) == records[0]["glucose"] == 200, "La première glycémie est incorrecte"
+    assert records[-1]["insulin"] == simulator.log.insulin[-1], "La dernière dose est incorrecte"
+    with pytest.raises(ValueError):
+        write_log(simulator.log, io.StringIO(), format="xml")
+    print("Export : les exports CSV et JSON lines sont corrects")
@@ -0,0 +1,97 @@
+from insulin_pump_simulator import fleet
+from insulin_pump_simulator.fleet import FleetServer, FleetClient, generate_load
+from insulin_pump_simulator.history import from_minutes
+from datetime import timedelta
+import asyncio
+import pytest
+
+
+def test_commands_over_unix_socket(tmp_path):
+    async def scenario():
+        server = FleetServer(devices=3, tick_seconds=0)
+        await server.start(path=str(tmp_path / "fleet.sock"))
+        client = await FleetClient.connect(path=str(tmp_path / "fleet.sock"))
+        await server.tick()
+        responses = [
+            await client.request("set_meal", 1, carbs=60),
+            await client.request("set_target_glucose", 1, target=110),
+            await client.request("activate_mode", 2, mode="Sport"),
+            await client.request("get_mode", 2),
+            await client.request("check_battery_level", 0),
+            await client.request("view_glucose_history", 0, start=server.start_time.isoformat()),
+            await client.request("activate_mode", 2, mode="Inconnu"),
+            await client.request("set_meal", 7, carbs=60),
+        ]
+        await client.close()
+        await server.close()
+        return server, responses
+
+    server, responses = asyncio.run(scenario())
+    meal, target, mode, active, battery, history, bad_mode, bad_device = responses
+
+    assert meal["ok"] and meal["result"] == 6.0, "Le bolus de repas devrait être renvoyé"
+    assert server.devices[1].pdm.controller.target_glucose == 110, "La cible devrait être transmise au contrôleur"
+    assert active["result"] == "Sport", "Le mode Sport devrait être actif"
+    assert battery["result"]["battery_level"] == 100, "Le niveau de batterie est incorrect"
+    assert len(history["result"]) == 1, "Un tick CGM devrait avoir enregistré une glycémie"
+    assert not bad_mode["ok"] and not bad_device["ok"], "Les erreurs devraient être renvoyées au client"
+    assert server.errors == 2, "Les requêtes en erreur devraient être comptées"
+    print("Flotte : les commandes du PDM sont servies sur un socket Unix")
+
+
+def test_load_generator_reports_latency_percentiles():
+    async def scenario():
+        server = FleetServer(devices=50, tick_seconds=0.01, minutes_per_tick=5)
+        await server.start(port=0)
+        host, port = server.address[:2]
+        report = await generate_load(host, port, clients=5, requests_per_client=40, devices=50, seed=1)
+        client = await FleetClient.connect(host, port)
+        stats = (await client.request("stats"))["result"]
+        await client.close()
+        await server.close()
+        return report, stats
+
+    report, stats = asyncio.run(scenario())
+
+    assert report["requests"] == 200 and report["errors"] == 0, "Toutes les requêtes devraient réussir"
+    assert sum(entry["count"] for entry in report["latency_ms"].values()) == 200, "Chaque requête devrait avoir une latence"
+    assert sum(entry["count"] for entry in stats["latency_ms"].values()) == 200, "Le serveur devrait mesurer chaque commande"
+    assert all(entry["p50"] <= entry["p90"] <= entry["p99"] <= entry["max"] for entry in stats["latency_ms"].values()), "Percentiles incohérents"
+    assert stats["ticks"] > 0 and stats["minutes"] == 5 * stats["ticks"], "Les ticks CGM devraient tourner pendant la charge"
+    print("Flotte : le générateur de charge rapporte les percentiles de latence")
+
+
+def test_server_memory_is_bounded_and_command_failures_are_replied(tmp_path, monkeypatch):
+    monkeypatch.setattr(fleet, "LATENCY_WINDOW", 5)
+
+    def broken(device):
+        raise RuntimeError("panne")
+
+    monkeypatch.setitem(fleet.COMMANDS, "broken", broken)
+
+    async def scenario():
+        server = FleetServer(devices=2, tick_seconds=0, minutes_per_tick=60)
+        await server.start(path=str(tmp_path / "fleet.sock"))
+        client = await FleetClient.connect(path=str(tmp_path / "fleet.sock"))
+        for _ in range(24 * 5):
+            await server.tick()
+        failure = await client.request("broken", 0)
+        for _ in range(8):
+            await client.request("get_mode", 1)
+        stats = (await client.request("stats"))["result"]
+        await client.close()
+        await server.close()
+        return server, failure, stats
+
+    server, failure, stats = asyncio.run(scenario())
+    device = server.devices[0]
+    device.history_days = 2
+    device.forget_history()
+    times, values = device.pdm.history["glucose"].window()
+
+    assert not failure["ok"] and failure["error"] == "panne", "L'erreur inattendue devrait être renvoyée au client"
+    assert stats["latency_ms"]["get_mode"]["count"] == 8, "Toutes les requêtes devraient être comptées"
+    assert len(server.latencies["get_mode"]) == 5, "Seules les latences les plus récentes devraient être conservées"
+    assert from_minutes(times[0]).date() == (device.date() - timedelta(days=2)).date(), "Seuls les derniers jours d'historique devraient être conservés"
+    assert device.pdm.history["glucose"].mean() == pytest.approx(values.mean()), "Les agrégats devraient rester cohérents après l'oubli"
+    print("Flotte : la mémoire du serveur reste bornée et les pannes de commande sont renvoyées au client")
@@ -0,0 +1,89 @@
+from insulin_pump_simulator.history import HistoryStore
+from insulin_pump_simulator.pdm import PDM
+from insulin_pump_simulator.simulator import Simulator
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+
+
+def test_out_of_order_appends_keep_aggregates_consistent():
+    store = HistoryStore("glucose")
+    start = datetime(2024, 10, 1)
+    rng = np.random.default_rng(0)
+    minutes = rng.permutation(600)
+    values = rng.uniform(40, 260, size=600)
+    for minute, value in zip(minutes.tolist(), values.tolist()):
+        store.append(start + timedelta(minutes=minute), value)
+
+    times, stored = store.window()
+    expected = values[np.argsort(minutes)]
+    assert np.all(np.diff(times) > 0), "L'historique devrait rester trié par date"
+    assert stored.tolist() == expected.tolist(), "Les valeurs devraient suivre l'ordre chronologique"
+
+    window_start, window_end = start + timedelta(minutes=100), start + timedelta(minutes=400)
+    window = expected[100:400]
+    assert store.count(window_start, window_end) == 300, "La fenêtre devrait contenir 300 valeurs"
+    assert store.mean(window_start, window_end) == pytest.approx(window.mean()), "La moyenne glissante est incorrecte"
+    assert store.time_in_range(window_start, window_end) == pytest.approx(np.mean((window >= 70) & (window <= 180)) * 100), "Le temps dans la cible est incorrect"
+    print("Historique : les ajouts hors ordre conservent des agrégats cohérents")
+
+
+def test_pdm_history_views_and_range_queries():
+    pdm = PDM(120)
+
+    history = pdm.view_glucose_history("2024-10-03", "2024-10-05")
+    assert history == [{"date": "2024-10-03", "glucose": 130}, {"date": "2024-10-04", "glucose": 140}], "La requête par dates est incorrecte"
+    assert len(pdm.view_insulin_dose_history()) == 7, "L'historique complet des doses devrait être consultable"
+    assert pdm.last_message == "Historique de glycémie consulté avec succès", "Le message de succès n'est pas correct"
+    print("Historique : les requêtes par dates sont correctes")
+
+
+def test_consultation_period_summary():
+    pdm = PDM(120)
+    summary = pdm.glucose_summary()
+
+    mean = (110 + 120 + 130 + 140 + 135 + 128 + 122) / 7
+    assert summary["count"] == 7, "La période de consultation devrait couvrir 7 jours"
+    assert summary["mean"] == pytest.approx(mean), "La glycémie moyenne est incorrecte"
+    assert summary["time_in_range"] == 100, "Toutes les valeurs sont dans la cible"
+    assert summary["gmi"] == pytest.approx(3.31 + 0.02392 * mean), "Le GMI est incorrect"
+
+    pdm.record_insulin_dose(datetime(2024, 10, 7, 8, 30), 4)
+    pdm.record_insulin_dose(datetime(2024, 10, 7, 12, 0), 6)
+    totals = pdm.insulin_daily_totals()
+    assert totals["2024-10-07"] == 34, "Le total journalier devrait inclure les nouvelles doses"
+    assert len(totals) == 7, "Un total par jour de la période est attendu"
+    print("Historique : les agrégats de la période de consultation sont corrects")
+
+
+def test_late_appends_between_queries():
+    store, reference = HistoryStore("dose"), []
+    start = datetime(2024, 10, 1)
+    rng = np.random.default_rng(1)
+    for minute in range(0, 3000, 3):
+        late = int(rng.integers(0, minute + 1))
+        for moment, value in ((minute, 0.5), (late, float(rng.uniform(0, 300)))):
+            store.append(start + timedelta(minutes=moment), value)
+            reference.append((moment, value))
+        if minute % 300 == 0:
+            expected = [value for _, value in sorted(reference, key=lambda record: record[0])]
+            assert len(store) == len(reference), "Les ajouts en attente devraient être comptés"
+            assert store.window()[1].tolist() == expected, "Les ajouts en attente devraient être fusionnés à leur date"
+            assert store.total() == sum(expected), "Les sommes cumulées devraient suivre l'ordre chronologique"
+
+    copy = store.copy(len(reference) - 10)
+    assert copy.window()[1].tolist() == store.window()[1].tolist()[:-10], "La copie devrait reprendre l'historique fusionné"
+    print("Historique : les ajouts tardifs sont fusionnés avant chaque lecture")
+
+
+def test_simulator_records_pdm_history_on_request():
+    default = Simulator(2)
+    default.run_simulation()
+    recorded = Simulator(2, record_history=True)
+    recorded.run_simulation()
+    restored = Simulator.from_snapshot(recorded.snapshot())
+
+    assert len(default.pdm.history["glucose"]) == len(PDM(120).history["glucose"]), "Sans record_history, l'historique du PDM n'est pas alimenté"
+    assert len(recorded.pdm.history["glucose"]) == len(default.pdm.history["glucose"]) + 120, "Une glycémie par minute devrait être enregistrée"
+    assert restored.record_history, "L'option devrait survivre au snapshot"
+    print("Historique : le simulateur alimente l'historique du PDM à la demande")
@@ -0,0 +1,79 @@
+from insulin_pump_simulator.kinetics import Absorption
+from insulin_pump_simulator.patient import Patient
+from insulin_pump_simulator.insulin_pump import InsulinPump
+from insulin_pump_simulator.controller import ClosedLoopController
+from insulin_pump_simulator.cohort import CohortSimulator
+from insulin_pump_simulator.simulator import Simulator
+import numpy as np
+import pytest
+
+
+def test_absorption_curve():
+    absorption = Absorption(peak_minutes=60)
+    curve = [absorption.step(10 if minute == 0 else 0) for minute in range(24 * 60)]
+
+    assert sum(curve) == pytest.approx(10, rel=1e-6), "Toute la dose devrait finir par être absorbée"
+    assert abs(int(np.argmax(curve)) - 60) <= 1, "L'action devrait culminer vers 60 minutes"
+    assert absorption.on_board < 1e-6, "Il ne devrait plus rester d'insuline active après 24 heures"
+    print("Cinétique : la courbe d'absorption est correcte")
+
+
+def test_batched_absorption_matches_scalar():
+    peaks = [45, 60, 90]
+    batched = Absorption(peaks, size=3)
+    scalars = [Absorption(peak) for peak in peaks]
+    doses = np.random.default_rng(0).uniform(0, 2, size=(500, 3))
+
+    for dose in doses:
+        absorbed = batched.step(dose)
+        assert absorbed.tolist() == [scalar.step(value) for scalar, value in zip(scalars, dose.tolist())], "Le calcul groupé doit être identique au calcul scalaire"
+    print("Cinétique : le calcul groupé est identique au calcul scalaire")
+
+
+def test_insulin_on_board_prevents_stacking():
+    patient = Patient(250, 30, 1, insulin_absorption=Absorption(75), carb_absorption=Absorption(45))
+    patient.update_glucose_level(insulin=3)
+
+    assert patient.glucose_level > 249, "L'insuline ne devrait pas agir immédiatement"
+    assert patient.insulin_on_board == pytest.approx(3), "L'insuline active devrait correspondre à la dose"
+
+    pump = InsulinPump()
+    assert pump.calculate_correction_bolus(250, 120, insulin_on_board=3) == round(130 / 30 - 3, 2), "La correction devrait déduire l'insuline active"
+    assert pump.calculate_correction_bolus(150, 120, insulin_on_board=3) == 0, "La correction ne peut pas être négative"
+
+    controller = ClosedLoopController(target_glucose=120)
+    assert controller.adjust_basal_rate(180, insulin_on_board=2) == 0, "L'ajustement devrait tenir compte de l'insuline active"
+    print("Cinétique : l'insuline active évite l'empilement des corrections")
+
+
+def test_cohort_with_kinetics_matches_scalar():
+    def patient(i):
+        return Patient(150 + 20 * i, 30 + 5 * i, 1 + i, insulin_absorption=Absorption(60 + 10 * i), carb_absorption=Absorption(40))
+
+    cohort = CohortSimulator.from_patients([patient(i) for i in range(3)])
+    cohort.run(6 * 60)
+    for i in range(3):
+        simulator = Simulator(6, patient=patient(i))
+        simulator.run_simulation()
+        assert cohort.glucose_log[:, i].tolist() == simulator.log.glucose.tolist(), f"La glycémie du patient {i} diffère du simulateur scalaire"
+    print("Cinétique : la cohorte avec absorption reproduit le simulateur scalaire")
+
+
+def test_cohort_keeps_insulin_and_carbs_on_board():
+    def patient(i):
+        insulin, carbs = Absorption(60 + 10 * i), Absorption(40)
+        insulin.depot, insulin.active, carbs.depot, carbs.active = 1.5 * i, 0.5, 20.0 * i, 10.0
+        return Patient(150 + 20 * i, 30 + 5 * i, 1 + i, insulin_absorption=insulin, carb_absorption=carbs)
+
+    cohort = CohortSimulator.from_patients([patient(i) for i in range(3)])
+    assert cohort.insulin_on_board.tolist() == [patient(i).insulin_on_board for i in range(3)], "L'insuline active de chaque patient devrait être reprise"
+    assert cohort.carbs_on_board.tolist() == [patient(i).carbs_on_board for i in range(3)], "Les glucides en cours d'absorption devraient être repris"
+    cohort.run(6 * 60)
+    for i in range(3):
+        simulator = Simulator(6, patient=patient(i))
+        simulator.run_simulation()
+        assert cohort.glucose_log[:, i].tolist() == simulator.log.glucose.tolist(), f"La glycémie du patient {i} diffère du simulateur scalaire"
+
+    with pytest.raises(ValueError):
+        CohortSimulator.from_patients([patient(0), Patient(150, 30)])
+    print("Cinétique : la cohorte reprend l'insuline et les glucides en cours d'absorption")
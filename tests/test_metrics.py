@@ -0,0 +1,64 @@
+import math
+import numpy as np
+from insulin_pump_simulator.metrics import GlycemicMetrics, CohortMetrics
+from insulin_pump_simulator.simulator import Simulator
+from insulin_pump_simulator.cohort import CohortSimulator
+from insulin_pump_simulator.patient import Patient
+from insulin_pump_simulator.kinetics import Absorption
+
+
+def test_metrics_match_log():
+    simulator = Simulator(48, patient=Patient(220, 35, 1.5, insulin_absorption=Absorption(75), carb_absorption=Absorption(45)))
+    simulator.run_simulation()
+    glucose, insulin = simulator.log.glucose, simulator.log.insulin
+    summary = simulator.metrics.summary()
+
+    assert summary["count"] == len(glucose) == 48 * 60, "Une valeur par minute enregistrée"
+    assert math.isclose(summary["mean_glucose"], glucose.mean()), "La moyenne diffère du calcul sur le journal"
+    assert math.isclose(summary["sd_glucose"], glucose.std(ddof=1)), "L'écart-type (Welford) diffère du calcul sur le journal"
+    assert summary["time_in_range"] == np.mean((glucose >= 70) & (glucose <= 180)) * 100, "Temps dans la cible incorrect"
+    assert summary["time_below_54"] == np.mean(glucose < 54) * 100, "Temps sous 54 incorrect"
+    assert summary["time_above_250"] == np.mean(glucose > 250) * 100, "Temps au-dessus de 250 incorrect"
+    assert math.isclose(summary["total_insulin"], insulin.sum()), "L'insuline totale diffère du journal"
+    assert math.isclose(summary["daily_insulin"], insulin.sum() / 2), "L'insuline quotidienne devrait couvrir deux jours"
+    print("Métriques : calculées pendant la simulation, identiques au calcul sur le journal")
+
+
+def test_episode_detection():
+    metrics = GlycemicMetrics()
+    # Hypo de 20 min (1 épisode), remontée, hypo de 10 min (trop courte), hyper de 40 min (1 épisode)
+    series = [60] * 20 + [100] * 5 + [50] * 10 + [200] * 3 + [300] * 40 + [120] * 2
+    for glucose in series:
+        metrics.add(glucose)
+    assert metrics.hypo_episodes == 1, "Une seule hypo dure au moins 15 minutes"
+    assert metrics.hyper_episodes == 1, "Une hyper de 40 minutes compte pour un épisode"
+    assert metrics.very_low == 10 and metrics.low == 30, "Minutes sous 54 et sous 70 incorrectes"
+    assert metrics.in_range == 7 and metrics.very_high == 40, "Minutes dans la cible et au-dessus de 250 incorrectes"
+    print("Métriques : les épisodes sont détectés au fil de l'eau")
+
+
+def test_cohort_metrics_match_scalar():
+    patients = [Patient(100 + 60 * i, 30 + 5 * i, 1.5) for i in range(4)]
+    cohort = CohortSimulator.from_patients(patients)
+    cohort.run(24 * 60, record=False)
+    summary = cohort.metrics.summary()
+    for i in range(len(patients)):
+        simulator = Simulator(24, patient=Patient(100 + 60 * i, 30 + 5 * i, 1.5))
+        simulator.run_simulation()
+        assert cohort.metrics.patient(i).summary() == simulator.metrics.summary(), f"Les métriques du patient {i} diffèrent du simulateur scalaire"
+        assert summary["time_in_range"][i] == simulator.metrics.summary()["time_in_range"], "Le résumé vectorisé devrait être identique"
+    print("Métriques : la version vectorisée reproduit le simulateur scalaire")
+
+
+def test_fork_keeps_metrics():
+    full = Simulator(12, patient=Patient(200, 35, 1.5))
+    full.run_simulation()
+    prefix = Simulator(12, patient=Patient(200, 35, 1.5))
+    prefix.run(300)
+    branch = prefix.fork()
+    branch.run(12 * 60 - 300)
+    resumed = Simulator.from_snapshot(prefix.snapshot())
+    resumed.run(12 * 60 - 300)
+    assert branch.metrics.state() == full.metrics.state(), "Une branche devrait reprendre les métriques du préfixe"
+    assert resumed.metrics.state() == full.metrics.state(), "Les métriques couvrent toute la simulation, même sans le journal"
+    print("Métriques : conservées par les snapshots")
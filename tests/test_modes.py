@@ -0,0 +1,84 @@
+from insulin_pump_simulator.config import PumpConfig, mode_multipliers
+from insulin_pump_simulator.controller import ClosedLoopController
+from insulin_pump_simulator.pdm import PDM
+from insulin_pump_simulator.simulator import Simulator
+
+
+def test_mode_toggles_do_not_compound():
+    pdm = PDM(120)
+    programmed = list(pdm.pump.config.basal_rates)
+    for _ in range(20):
+        for mode in ("Sport", "Night", "Day"):
+            pdm.activate_mode(mode)
+    pdm.activate_mode("Sport")
+
+    assert pdm.pump.config.basal_rates == [round(rate * 0.8, 2) for rate in programmed], "Les activations successives ne doivent pas se cumuler"
+    assert pdm.pump.config.programmed_basal_rates == programmed, "Le planning programmé ne doit pas être modifié par les modes"
+    print("Modes : aucune dérive après des changements de mode répétés")
+
+
+def test_mode_windows_are_resolved_per_hour():
+    night = mode_multipliers({"basal_rate_adjustment": 0.85, "start_hour": 22, "end_hour": 6})
+    day = mode_multipliers({"basal_rate_adjustment": 1.1, "start_hour": 6, "end_hour": 22})
+    config = PumpConfig(basal_rates=[1.0] * 24)
+    config.apply_mode("Night")
+
+    assert [hour for hour, multiplier in enumerate(night) if multiplier] == [0, 1, 2, 3, 4, 5, 22, 23], "La fenêtre de nuit passe minuit"
+    assert [hour for hour, multiplier in enumerate(day) if multiplier] == list(range(6, 22)), "Fenêtre de jour incorrecte"
+    assert mode_multipliers({"basal_rate_adjustment": 0.8}) == (0.8,) * 24, "Sans fenêtre, le mode couvre toute la journée"
+    assert config.basal_rates == [0.85] * 6 + [1.0] * 16 + [0.85] * 2, "Le planning effectif de nuit est incorrect"
+    print("Modes : les fenêtres horaires sont appliquées")
+
+
+def test_lookup_is_invalidated_only_by_configuration_changes():
+    pdm = PDM(120)
+    controller = ClosedLoopController(120, pump=pdm.pump)
+    pdm.activate_mode("Sport")
+    schedule = pdm.pump.config.basal_rates
+    rates = [pdm.pump.deliver_basal(hour) for hour in range(48)]
+    assert pdm.pump.config.basal_rates is schedule, "L'administration ne doit pas recalculer le planning"
+    assert rates == list(schedule) * 2, "Le basal administré vient du planning effectif"
+
+    programmed = pdm.pump.config.programmed_basal_rates[0]
+    adjustment = controller.adjust_basal_rate(180)
+    rate = round(programmed + adjustment / 24, 2)
+    assert pdm.pump.config.basal_rates == [round(rate * 0.8, 2)] * 24, "L'ajustement du contrôleur garde le mode appliqué"
+    pdm.set_mode("Sport", {"basal_rate_adjustment": 0.5})
+    assert pdm.pump.config.basal_rates == [round(rate * 0.5, 2)] * 24, "set_mode recalcule le planning effectif"
+    pdm.apply_new_config(PumpConfig(basal_rates=[0.7] * 24))
+    assert pdm.pump.config.basal_rates == [0.7] * 24 and pdm.pump.config.applied_mode is None, "Une nouvelle configuration repart sans mode"
+    print("Modes : le planning effectif n'est recalculé qu'aux changements de configuration")
+
+
+def test_fork_keeps_applied_mode():
+    simulator = Simulator(4)
+    simulator.schedule_mode(60, "Sport")
+    simulator.run(120)
+    branch = simulator.fork()
+    branch.run(60)
+    simulator.run(60)
+
+    assert branch.pump.config.applied_mode == "Sport", "Le mode appliqué devrait être conservé par la branche"
+    assert branch.generate_final_log() == simulator.generate_final_log(), "La branche devrait suivre la simulation d'origine"
+    print("Modes : le mode appliqué est conservé dans les snapshots")
+
+
+def test_in_place_basal_writes_are_delivered():
+    config = PumpConfig()
+    programmed = list(config.programmed_basal_rates)
+    config.apply_mode("Sport")
+    pdm = PDM(120)
+    pdm.activate_mode("Sport")
+    schedule = pdm.pump.config.basal_rates
+    pdm.pump.config.basal_rates[3] = 5.0
+    written = pdm.pump.config.programmed_basal_rates[3], pdm.pump.deliver_basal(3)
+    pdm.pump.config.fill_basal_rates(1.0)
+    filled = list(pdm.pump.config.basal_rates)
+    simulator = Simulator(1)
+    simulator.pdm.activate_mode("Sport")
+
+    assert config.basal_rates == [round(rate * 0.8, 2) for rate in programmed], "basal_rates est le planning administré, mode compris"
+    assert written == (5.0, 4.0), "Une heure écrite en place devrait être administrée avec le mode"
+    assert filled == [0.8] * 24 and pdm.pump.config.basal_rates is schedule, "Le remplissage du contrôleur met à jour le planning effectif en place"
+    assert simulator.pump_config_values()["basal_rates"] == programmed, "La configuration exportée contient le planning programmé"
+    print("Modes : les écritures en place du planning basal sont administrées")
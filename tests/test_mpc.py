@@ -0,0 +1,87 @@
+import numpy as np
+from insulin_pump_simulator import mpc
+from insulin_pump_simulator.mpc import mpc_model, MPCPolicy
+from insulin_pump_simulator.cohort import CohortSimulator
+from insulin_pump_simulator.simulator import Simulator
+from insulin_pump_simulator.patient import Patient
+from insulin_pump_simulator.config import PumpConfig
+from insulin_pump_simulator.kinetics import Absorption
+
+
+def _patient(glucose=180, insulin_sensitivity=30, insulin_peak=75, carb_peak=45):
+    return Patient(glucose, insulin_sensitivity, 3, insulin_absorption=Absorption(insulin_peak), carb_absorption=Absorption(carb_peak))
+
+
+def test_rates_respect_bounds():
+    model = mpc_model(75, 45)
+    glucose = np.array([40, 90, 120, 250, 400, 600])
+    rates = model.solve(glucose, 120, 30, 0.8, 2.5, 3, (np.full(6, 2.0), np.zeros(6)), (np.zeros(6), np.zeros(6)))
+
+    assert rates.shape == (6, model.blocks), "Un taux par patient et par bloc est attendu"
+    assert np.all(rates >= 0) and np.all(rates <= 2.5), "Les taux doivent rester entre 0 et max_bolus"
+    assert rates[0, 0] == 0 and rates[-1, 0] == 2.5, "Les bornes devraient être atteintes en hypo et en forte hyper"
+    assert np.all(np.diff(rates[:, 0]) >= 0), "Le taux devrait croître avec la glycémie"
+    print("MPC : les taux respectent 0 <= taux <= max_bolus")
+
+
+def test_constrained_solve_matches_converged_solution(monkeypatch):
+    model = mpc_model(75, 45)
+    rng = np.random.default_rng(0)
+    n = 300
+    max_rate = rng.uniform(1, 5, n)
+    arguments = (rng.uniform(40, 400, n), 120, rng.uniform(10, 90, n), 0.8, max_rate, 3,
+                 (rng.uniform(0, 4, n), rng.uniform(0, 4, n)), (rng.uniform(0, 60, n), rng.uniform(0, 60, n)))
+    rates = model.solve(*arguments)
+    # Référence : gradient projeté seul, mené jusqu'à convergence
+    monkeypatch.setattr(mpc, "ACTIVE_SET_ITERATIONS", 0)
+    converged = model.solve(*arguments)
+
+    assert np.all(rates >= 0) and np.all(rates <= max_rate[:, None]), "Les taux doivent rester entre 0 et max_bolus"
+    assert np.any(rates == 0) and np.any(rates == max_rate[:, None]), "Les deux bornes devraient être actives pour certains patients"
+    assert np.abs(rates - converged).max() < 1e-3, "Les taux devraient être ceux de la solution convergée"
+    assert np.abs(rates[:, 0] - converged[:, 0]).max() < 1e-5, "Le bloc appliqué devrait être celui de la solution convergée"
+    print("MPC : la solution sous contraintes correspond à la solution convergée")
+
+
+def test_model_is_shared_between_configs():
+    first = MPCPolicy(_patient(), PumpConfig(basal_rates=[0.5] * 24))
+    second = MPCPolicy(_patient(150, 45), PumpConfig(basal_rates=[1.0] * 24, max_bolus=5))
+
+    assert first.model is second.model, "Les matrices devraient être calculées une fois par cinétique et horizon"
+    assert not first.model.prediction.flags.writeable, "Les matrices partagées ne doivent pas être modifiables"
+    assert first.reference_rate == 0.5 and second.reference_rate == 1.0, "Le basal de référence vient de la PumpConfig"
+    print("MPC : les matrices factorisées sont partagées entre configurations")
+
+
+def test_mpc_keeps_glucose_in_range():
+    proportional = Simulator(24, patient=_patient())
+    proportional.run_simulation()
+    predictive = Simulator(24, patient=_patient())
+    predictive.enable_mpc()
+    predictive.run_simulation()
+    summary = predictive.metrics.summary()
+
+    assert np.all(predictive.log.basal >= 0), "Le mode prédictif ne doit jamais administrer de basal négatif"
+    assert summary["time_below_range"] == 0, "Le mode prédictif ne devrait pas provoquer d'hypoglycémie"
+    assert summary["time_in_range"] > proportional.metrics.summary()["time_in_range"], "Le mode prédictif devrait améliorer le temps dans la cible"
+
+    restored = Simulator.from_snapshot(predictive.snapshot())
+    assert restored.controller.mpc.options() == predictive.controller.mpc.options(), "Le mode prédictif devrait survivre au snapshot"
+    print("MPC : la glycémie reste dans la cible sans basal négatif")
+
+
+def test_cohort_matches_scalar_controller():
+    patients = [_patient(180, 30), _patient(90, 45, insulin_peak=60), _patient(250, 20), _patient(130, 35, carb_peak=30)]
+    configs = [PumpConfig(basal_rates=[rate] * 24, max_bolus=bolus) for rate, bolus in ((0.8, 10), (0.5, 3), (1.2, 10), (0.9, 2))]
+    cohort = CohortSimulator.from_patients(patients, configs)
+    cohort.enable_mpc()
+    cohort.run(12 * 60)
+
+    assert len(cohort.mpc_groups) == 3, "Les patients devraient être regroupés par cinétique"
+    for i, (patient, config) in enumerate(zip(patients, configs)):
+        simulator = Simulator(12, patient=_patient(patient.glucose_level, patient.insulin_sensitivity,
+                                                   patient.insulin_absorption.peak_minutes, patient.carb_absorption.peak_minutes), config=config)
+        simulator.enable_mpc()
+        simulator.run_simulation()
+        assert np.allclose(cohort.glucose_log[:, i], simulator.log.glucose), f"La glycémie du patient {i} diffère du simulateur scalaire"
+    print("Cohorte : le mode prédictif vectorisé correspond au simulateur scalaire")
@@ -0,0 +1,52 @@
+from insulin_pump_simulator.simulator import Simulator
+from insulin_pump_simulator.controller import ClosedLoopController
+from insulin_pump_simulator.patient import Patient
+from insulin_pump_simulator.profiling import Profiler
+import json
+
+
+def test_disabled_profiling_leaves_step_untouched():
+    simulator = Simulator(1)
+    profiler = simulator.enable_profiling()
+    simulator.disable_profiling()
+    simulator.run_simulation()
+
+    assert "step" not in simulator.__dict__, "step() ne devrait plus être remplacé"
+    assert all(name not in simulator.__dict__ for name in Simulator.PROFILED_PHASES.values()), "Les phases devraient être restaurées"
+    assert profiler.counts == {}, "Aucune mesure ne devrait être faite une fois le profilage désactivé"
+    print("Profilage : désactivé, la boucle n'est pas instrumentée")
+
+
+def test_phase_counters_and_step_callbacks():
+    reference = Simulator(6)
+    reference.run_simulation()
+    simulator = Simulator(6)
+    profiler = simulator.enable_profiling(Profiler(trace=True))
+    states = []
+    simulator.add_step_callback(lambda sim: states.append((sim.simulation_time, float(sim.log.glucose[-1]))))
+    simulator.run_simulation()
+
+    assert simulator.generate_final_log() == reference.generate_final_log(), "Le profilage ne doit pas modifier la simulation"
+    for phase in ("step", "measure", "adjust", "deliver_basal", "logging"):
+        assert profiler.counts[phase] == 360, f"La phase {phase} devrait être comptée à chaque minute"
+    assert profiler.counts["meal"] == 1, "Un seul repas a lieu en 6 heures"
+    assert len(states) == 360 and states[-1][0] == 360, "Le rappel devrait être appelé après chaque minute"
+    summary = json.loads(profiler.to_json())
+    assert summary["step"]["total_seconds"] >= summary["measure"]["total_seconds"], "La minute complète inclut la mesure"
+    print("Profilage : compteurs par phase et rappels par minute")
+
+
+def test_chrome_trace_export(tmp_path):
+    controller = ClosedLoopController(target_glucose=120)
+    profiler = controller.enable_profiling(Profiler(trace=True))
+    for _ in range(10):
+        controller.control_loop(Patient(initial_glucose=150))
+    path = tmp_path / "trace.json"
+    profiler.write_chrome_trace(path)
+    events = json.loads(path.read_text())["traceEvents"]
+
+    complete = [event for event in events if event["ph"] == "X"]
+    assert {event["name"] for event in complete} == {"control_loop", "measure", "adjust", "deliver_basal"}, "Phases du contrôleur manquantes"
+    assert len(complete) == 40, "Chaque appel devrait produire un événement"
+    assert min(event["ts"] for event in complete) == 0, "Les temps devraient partir de zéro"
+    print("Profilage : export au format Chrome trace")
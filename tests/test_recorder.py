@@ -0,0 +1,45 @@
+from insulin_pump_simulator.recorder import SimulationRecorder, EVENT_MEASURE, EVENT_HOURLY_BASAL, EVENT_CORRECTION, EVENT_MEAL
+from insulin_pump_simulator.simulator import Simulator
+from insulin_pump_simulator.patient import Patient
+
+
+def test_recorder_grows_and_exposes_columns():
+    recorder = SimulationRecorder()
+    for time in range(1, 101):
+        recorder.append(time, 100 + time, 0.5, 0.01, 0.0, 0.0, EVENT_MEASURE)
+
+    assert len(recorder) == 100, "Toutes les minutes devraient être enregistrées"
+    assert recorder.capacity >= 100, "La capacité devrait s'adapter"
+    assert recorder.glucose[-1] == 200, "La colonne de glycémie est incorrecte"
+    assert recorder.nbytes_per_row < 64, "Une minute simulée devrait occuper quelques dizaines d'octets"
+    print("Journal : les colonnes sont enregistrées et redimensionnées")
+
+
+def test_insulin_column_and_lazy_rendering():
+    recorder = SimulationRecorder(4)
+    recorder.append(60, 180.0, 2.0, 0.02, 2.0, 0.0, EVENT_MEASURE | EVENT_HOURLY_BASAL | EVENT_CORRECTION)
+    recorder.append(61, 110.0, -0.33, 0.01, 0.0, 6.0, EVENT_MEASURE | EVENT_MEAL)
+
+    assert recorder.insulin.tolist() == [2.02, 6.01], "La dose totale devrait cumuler basal et bolus"
+    assert list(recorder.iter_event_lines()) == [
+        "Time 60: Glucose 180.00, Adjustment 2.00",
+        "Time 60: administration d'insuline",
+        "Time 60: mesure de glycémie",
+        "Time 60: Bolus de correction calculé : 2.00 U",
+        "Time 61: Glucose 110.00, Adjustment -0.33",
+        "Time 61: mesure de glycémie",
+        "Bolus alimentaire calculé : 6.0 U",
+    ], "Les événements rendus sont incorrects"
+    print("Journal : les événements sont rendus à la demande")
+
+
+def test_simulator_final_log():
+    simulator = Simulator(6, patient=Patient(200, 35, 1.5))
+    simulator.run_simulation()
+    final_log = simulator.generate_final_log().split("\n")
+
+    assert len(simulator.log) == 360, "Chaque minute simulée devrait être enregistrée"
+    assert final_log[1] == "Time 1: Glucose 200.00, Adjustment 2.67", "Le premier événement est incorrect"
+    assert final_log[-1] == f"Time 360: {simulator.log.insulin[-1]:.2f} U", "La dernière dose est incorrecte"
+    assert "Doses d'insuline administrées:" in final_log, "La section des doses est manquante"
+    print("Journal : le journal final est généré à partir des colonnes")
@@ -0,0 +1,65 @@
+from insulin_pump_simulator.registry import ConfigRegistry, DEFAULT_CONFIG_PATH, load_config, registry
+from insulin_pump_simulator.patient import Patient
+from insulin_pump_simulator.config import PumpConfig
+from insulin_pump_simulator.pdm import PDM
+import json
+import subprocess
+import sys
+import pytest
+
+
+def test_import_does_no_file_io(tmp_path):
+    code = (
+        "import insulin_pump_simulator.simulator, insulin_pump_simulator.sweep\n"
+        "from insulin_pump_simulator.registry import registry\n"
+        "assert not registry.is_loaded()\n"
+        "from insulin_pump_simulator.patient import Patient\n"
+        "assert Patient().glucose_level == 120\n"
+    )
+    # Lancé depuis un autre répertoire : le chemin par défaut ne dépend plus du répertoire courant
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True,
+                            env={"PYTHONPATH": str(DEFAULT_CONFIG_PATH.parents[2])})
+    assert result.returncode == 0, result.stderr
+    print("Registre : l'import ne lit aucun fichier")
+
+
+def test_config_is_parsed_once_and_read_only():
+    data = load_config()
+
+    assert load_config() is data, "La configuration devrait être mise en cache"
+    with pytest.raises(TypeError):
+        data["pump_configuration"]["max_bolus"] = 50
+    assert PDM(120).view_glucose_history()[0] == {"date": "2024-10-01", "glucose": 110}, "L'historique devrait venir du registre"
+    print("Registre : la configuration est analysée une seule fois et en lecture seule")
+
+
+def test_custom_path_and_invalidation(tmp_path):
+    path = tmp_path / "config.json"
+    data = json.loads(DEFAULT_CONFIG_PATH.read_text())
+    data["basal_insulin_administration"]["initial_glucose"] = 150
+    path.write_text(json.dumps(data))
+
+    assert Patient(config_path=path).glucose_level == 150, "Le fichier de configuration personnalisé n'est pas utilisé"
+
+    data["basal_insulin_administration"]["initial_glucose"] = 90
+    path.write_text(json.dumps(data))
+    assert Patient(config_path=path).glucose_level == 150, "Le fichier ne devrait pas être relu avant l'invalidation"
+
+    registry.invalidate(path)
+    assert Patient(config_path=path).glucose_level == 90, "L'invalidation devrait forcer une nouvelle lecture"
+    assert Patient().glucose_level == 120, "La configuration par défaut ne doit pas être affectée"
+
+    other = ConfigRegistry(path)
+    assert other.load()["basal_insulin_administration"]["initial_glucose"] == 90, "Le chemin par défaut d'un registre est configurable"
+    print("Registre : les fichiers personnalisés et l'invalidation fonctionnent")
+
+
+def test_pump_config_defaults_are_per_instance():
+    first = PumpConfig()
+    second = PumpConfig()
+    first.basal_rates[0] = 5.0
+    first.modes["Sport"]["basal_rate_adjustment"] = 0.5
+
+    assert second.basal_rates[0] == 0.8, "Les taux basaux par défaut ne doivent pas être partagés"
+    assert second.modes["Sport"]["basal_rate_adjustment"] == 0.8, "Les modes par défaut ne doivent pas être partagés"
+    print("Registre : chaque PumpConfig possède sa propre copie des valeurs par défaut")
@@ -0,0 +1,65 @@
+from insulin_pump_simulator.replay import ReplayEngine, read_csv_chunks, read_jsonl_chunks, read_config_readings, summarize_replay
+from insulin_pump_simulator.controller import ClosedLoopController
+import json
+import numpy as np
+import pytest
+
+
+def concatenate(results):
+    results = list(results)
+    return {name: np.concatenate([result[name] for result in results]) for name in results[0]}
+
+
+def test_replay_matches_controller_decisions():
+    rng = np.random.default_rng(4)
+    glucose = np.round(rng.uniform(40, 300, 5000), 1)
+    times = np.cumsum(rng.integers(1, 12, 5000)).astype(float)
+    engine = ReplayEngine()
+    results = concatenate(engine.replay((times[i:i + 700], glucose[i:i + 700]) for i in range(0, 5000, 700)))
+
+    controller = ClosedLoopController(target_glucose=120)
+    adjustments, basal_rates, corrections = [], [], []
+    for value in glucose.tolist():
+        adjustments.append(controller.adjust_basal_rate(value))
+        basal_rates.append(controller.pump.config.basal_rates[0])
+        corrections.append(controller.pump.calculate_correction_bolus(value, 120) if value > 170 else 0.0)
+
+    assert results["adjustment"].tolist() == adjustments, "Les ajustements diffèrent du contrôleur"
+    assert results["basal_rate"].tolist() == basal_rates, "Les taux basaux diffèrent du contrôleur"
+    assert results["correction"].tolist() == corrections, "Les bolus de correction diffèrent de la pompe"
+    intervals = np.minimum(np.diff(times), 15)
+    assert results["basal_dose"][:-1].tolist() == pytest.approx((results["basal_rate"][:-1] * intervals / 60).tolist()), "Les doses basales sont incorrectes"
+    print("Relecture : les décisions reproduisent celles du contrôleur")
+
+
+def test_csv_with_timestamps_and_gaps(tmp_path):
+    path = tmp_path / "sensor.csv"
+    path.write_text(
+        "device,time,glucose\n"
+        "a,2024-10-01T08:00:00,150\n"
+        "a,2024-10-01T08:05:00,\n"
+        "a,2024-10-01T08:10:00,190\n"
+        "a,2024-10-01T09:00:00,120\n"
+    )
+    engine = ReplayEngine()
+    results = concatenate(engine.replay(read_csv_chunks(path, chunk_size=2)))
+
+    assert results["glucose"].tolist() == [150, 190, 120], "Les valeurs manquantes devraient être ignorées"
+    assert np.diff(results["time"]).tolist() == [10, 50], "Les horodatages irréguliers devraient être conservés"
+    assert results["gap"].tolist() == [False, False, True], "La coupure de 50 minutes devrait être signalée"
+    assert engine.dropped == 1, "Une lecture manquante devrait être comptée"
+    print("Relecture : les horodatages irréguliers et les coupures sont gérés")
+
+
+def test_jsonl_and_config_sources(tmp_path):
+    path = tmp_path / "sensor.jsonl"
+    times, glucose = read_config_readings()
+    path.write_text("\n".join(json.dumps({"time": t, "glucose": g}) for t, g in zip(times.tolist(), glucose.tolist())))
+
+    from_file = summarize_replay(ReplayEngine().replay(read_jsonl_chunks(path)))
+    from_config = summarize_replay(ReplayEngine().replay([(times, glucose)]))
+
+    assert from_file == from_config, "Les deux sources devraient donner le même résultat"
+    assert from_file["readings"] == 6, "Les 6 mesures du fichier de configuration devraient être rejouées"
+    assert len(read_config_readings("simulation")[0]) == 7, "Les données horaires de simulation devraient être lisibles"
+    print("Relecture : les sources JSON lines et configuration sont lues")
@@ -0,0 +1,108 @@
+import sqlite3
+import threading
+import numpy as np
+import pytest
+from insulin_pump_simulator.results import ResultsStore, run_metadata
+from insulin_pump_simulator.simulator import Simulator
+from insulin_pump_simulator.patient import Patient
+from insulin_pump_simulator.sweep import run_sweep, build_config
+
+
+def test_record_simulation_roundtrip(tmp_path):
+    simulator = Simulator(6, patient=Patient(180, 35))
+    simulator.run_simulation()
+    with ResultsStore(tmp_path / "results.db") as store:
+        run_id = store.record_simulation(simulator, seed=3, label="essai")
+        store.flush()
+        run = store.run(run_id)
+        series = store.series(run_id)
+        window = store.series(run_id, 60, 120)
+
+    assert run["seed"] == 3 and run["label"] == "essai", "Les métadonnées de l'exécution sont incorrectes"
+    assert run["basal_rates"] == simulator.initial_pump_config["basal_rates"], "Le planning basal initial devrait être conservé"
+    assert run["insulin_sensitivity"] == 35 and run["initial_glucose"] == 180, "Les paramètres du patient sont incorrects"
+    assert run["time_in_range"] == simulator.metrics.summary()["time_in_range"], "Les métriques de synthèse sont incorrectes"
+    assert series["glucose"].tolist() == simulator.log.glucose.tolist(), "La série de glycémie devrait être identique au journal"
+    assert np.array_equal(series["insulin"], simulator.log.insulin), "La série d'insuline devrait être identique au journal"
+    assert window["time"].tolist() == list(range(60, 120)), "La fenêtre de temps est incorrecte"
+    print("Résultats : une simulation est enregistrée et relue à l'identique")
+
+
+def test_sweep_results_are_queryable(tmp_path):
+    grid = {"insulin_sensitivity_factor": [20, 35, 50], "target_glucose": [100, 140]}
+    with ResultsStore(tmp_path / "results.db") as store:
+        rows = run_sweep(grid, duration=6, max_workers=1, store=store)
+        store.flush()
+        runs = store.find_runs(insulin_sensitivity_factor=(30, 40), target_glucose=100)
+        above = store.find_runs(time_below_range=(5, None))
+        with pytest.raises(ValueError):
+            store.find_runs(unknown=1)
+
+    assert len(runs) == 1 and runs[0]["parameters"] == {"insulin_sensitivity_factor": 35, "target_glucose": 100}, "Le filtre sur les paramètres est incorrect"
+    expected = sorted(row["run"] + 1 for row in rows if row["time_below_range"] >= 5)
+    assert [run["id"] for run in above] == expected, "Le filtre sur les métriques est incorrect"
+    print("Résultats : les exécutions d'un balayage sont filtrables par paramètres et métriques")
+
+
+def test_concurrent_producers(tmp_path):
+    simulator = Simulator(1)
+    simulator.run_simulation()
+    ids = []
+    with ResultsStore(tmp_path / "results.db", queue_size=4) as store:
+        def produce():
+            for _ in range(25):
+                ids.append(store.record_simulation(simulator))
+        threads = [threading.Thread(target=produce) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        store.flush()
+        count = store.count()
+        rows = len(store.series(ids[-1])["time"])
+
+    assert len(set(ids)) == 100 and count == 100, "Chaque exécution devrait être écrite une fois, avec son propre identifiant"
+    assert rows == 60, "La série de chaque exécution devrait être complète"
+    with ResultsStore(tmp_path / "results.db") as store:
+        assert store.record_simulation(simulator, series=False) == 101, "Les identifiants devraient reprendre après la base existante"
+    print("Résultats : plusieurs producteurs écrivent sans conflit via le fil d'écriture")
+
+
+def test_simulation_rows_store_the_programmed_schedule(tmp_path):
+    params = {"basal_rates": [1.0] * 24, "modes.Sport": 0.5, "active_mode": "Sport"}
+    config = build_config(params)
+    simulator = Simulator(1, config=config)
+    simulator.run_simulation()
+    with ResultsStore(tmp_path / "results.db") as store:
+        simulated_id = store.record_simulation(simulator)
+        swept_id = store.record_run(run_metadata(build_config(params), Patient(), 120), {})
+        store.flush()
+        simulated, swept = store.run(simulated_id), store.run(swept_id)
+
+    assert simulated["basal_rates"] == [1.0] * 24, "Le planning enregistré est le planning programmé, sans le mode"
+    assert simulated["basal_rates"] == swept["basal_rates"] and simulated["active_mode"] == swept["active_mode"], \
+        "Une simulation et une ligne de balayage de même configuration doivent donner les mêmes colonnes"
+    print("Résultats : le planning basal enregistré a le même sens pour toutes les exécutions")
+
+
+def test_stores_sharing_a_database(tmp_path):
+    path = tmp_path / "results.db"
+    metadata = run_metadata(build_config({}), Patient(), 120)
+    with ResultsStore(path) as first, ResultsStore(path) as second:
+        ids = [store.record_run(metadata, {}) for _ in range(3) for store in (first, second)]
+        first.flush()
+        second.flush()
+        assert len(set(ids)) == 6 and first.count() == 6, "Deux stores sur la même base ne doivent pas partager d'identifiant"
+
+    with ResultsStore(path) as store:
+        store.record_run(metadata, {})
+        conflict = store.record_run(metadata, {})
+        with sqlite3.connect(path) as connection:
+            connection.execute("INSERT INTO runs (id) VALUES (?)", (conflict + 1,))
+        store.record_run(metadata, {})
+        with pytest.raises(RuntimeError, match=str(conflict + 1)):
+            store.flush()
+        store.record_run(metadata, {})
+        store.flush()
+        assert store.count() == 10, "Une exécution refusée ne doit pas empêcher l'écriture des autres"
+    print("Résultats : plusieurs stores partagent une base sans conflit d'identifiants")
@@ -0,0 +1,53 @@
+import numpy as np
+from insulin_pump_simulator.recorder import EVENT_MEASURE, EVENT_MEAL
+from insulin_pump_simulator.scenario import generate_scenario, generate_scenarios, run_monte_carlo
+
+
+def same_scenario(a, b) -> bool:
+    return all(np.array_equal(getattr(a, name), getattr(b, name)) for name in
+               ("meal_times", "meal_carbs", "sensor_noise", "dropouts", "insulin_sensitivity", "battery_drain"))
+
+
+def test_scenarios_are_reproducible():
+    whole = generate_scenarios(7, 6, 2880)
+    split = generate_scenarios(7, 2, 2880) + generate_scenarios(7, 4, 2880, start=2)
+    assert all(same_scenario(a, b) for a, b in zip(whole, split)), "Le découpage en lots ne devrait pas changer les scénarios"
+    assert same_scenario(generate_scenario(7, 3, 2880), whole[3]), "Un scénario ne devrait dépendre que de la graine et de son indice"
+    assert not same_scenario(whole[0], whole[1]), "Deux répliques devraient avoir des flux indépendants"
+    assert not same_scenario(generate_scenario(8, 0, 2880), whole[0]), "Une autre graine devrait donner un autre scénario"
+    print("Scénario : tirages reproductibles, indépendants du découpage en lots")
+
+
+def test_monte_carlo_independent_of_workers():
+    sequential = run_monte_carlo(4, 600, seed=3, max_workers=1)
+    parallel = run_monte_carlo(4, 600, seed=3, max_workers=2, chunksize=1)
+    assert sequential == parallel, "Les résultats ne devraient pas dépendre du nombre de processus"
+    assert [result["replicate"] for result in parallel] == [0, 1, 2, 3], "Les répliques devraient rester dans l'ordre"
+    print("Scénario : Monte-Carlo identique en séquentiel et en parallèle")
+
+
+def test_scenario_drives_simulator():
+    scenario = generate_scenario(11, 0, 1440, dropout_rate=1 / 240, battery_drain_per_hour=4, battery_drain_sd=0)
+    simulator = scenario.simulator()
+    simulator.run_simulation()
+    log = simulator.log
+    assert log.time[(log.events & EVENT_MEAL) != 0].tolist() == scenario.meal_times.tolist(), "Les repas devraient suivre le scénario"
+    base = scenario.simulator().patient.insulin_sensitivity
+    assert simulator.patient.insulin_sensitivity == base * scenario.insulin_sensitivity[-1], "La sensibilité de la dernière heure devrait être appliquée"
+    measured = set(log.time[(log.events & EVENT_MEASURE) != 0].tolist())
+    start, end = scenario.dropouts[0].tolist()
+    assert not measured & set(range(start, end)), "Aucune mesure pendant une perte du signal"
+    assert simulator.pump.battery_level == 100 - 4 * 24, "La batterie devrait se décharger selon le scénario"
+    assert any("batterie" in alarm.lower() or "battery" in alarm.lower() for alarm in simulator.pump.alarms), "Une alarme de batterie faible devrait être levée"
+    print("Scénario : repas, pertes du signal et batterie appliqués au simulateur")
+
+
+def test_sensor_noise_changes_measurements():
+    quiet = generate_scenario(5, 0, 600, sensor_noise_sd=0).simulator()
+    noisy = generate_scenario(5, 0, 600, sensor_noise_sd=10).simulator()
+    quiet.run(600)
+    noisy.run(600)
+    difference = np.abs(noisy.log.glucose[:30] - quiet.log.glucose[:30])
+    assert difference.max() > 0, "Le bruit du capteur devrait modifier les mesures"
+    assert difference.max() < 60, "Le bruit devrait rester de l'ordre de son écart-type"
+    print("Scénario : le bruit du capteur s'ajoute aux mesures")
@@ -0,0 +1,98 @@
+import pytest
+from insulin_pump_simulator.simulator import Simulator
+from insulin_pump_simulator.snapshot import SimulationSnapshot
+from insulin_pump_simulator.patient import Patient
+from insulin_pump_simulator.kinetics import Absorption
+
+
+def make_simulator():
+    simulator = Simulator(24, patient=Patient(200, 35, 1.5, insulin_absorption=Absorption(75), carb_absorption=Absorption(45)),
+                          record_history=True)
+    simulator.schedule_battery_drain(300, 90)
+    simulator.schedule_sensor_gap(700, 760)
+    return simulator
+
+
+def test_fork_matches_full_run():
+    full = make_simulator()
+    full.schedule_mode(600, "Sport")
+    full.skip_meal(720)
+    full.run_simulation()
+
+    prefix = make_simulator()
+    prefix.run(500)
+    branch = prefix.fork()
+    branch.schedule_mode(600, "Sport")
+    branch.skip_meal(720)
+    branch.run(940)
+
+    assert branch.generate_final_log() == full.generate_final_log(), "La branche devrait reproduire la simulation complète"
+    assert branch.pdm.glucose_summary(3) == full.pdm.glucose_summary(3), "L'historique du PDM devrait être identique"
+    assert branch.pump.alarms == full.pump.alarms and branch.pump.battery_level == 10, "Alarmes et batterie devraient être conservées"
+    assert not any(branch.log.meal[branch.log.time == 720]), "Le repas de la minute 720 devrait être annulé"
+    print("Snapshot : une branche reprend exactement là où le préfixe s'est arrêté")
+
+
+def test_branches_are_independent():
+    simulator = make_simulator()
+    simulator.run(600)
+    snapshot = simulator.snapshot()
+    sport = simulator.fork(snapshot)
+    sport.pdm.activate_mode("Sport")
+    sport.run(120)
+    day = simulator.fork(snapshot)
+    day.run(120)
+    simulator.run(120)
+
+    assert day.generate_final_log() == simulator.generate_final_log(), "Une branche sans changement suit le simulateur d'origine"
+    assert sport.pump.config.basal_rates != day.pump.config.basal_rates, "Le mode Sport ne devrait concerner que sa branche"
+    assert len(day.log) == len(sport.log) == 720, "Chaque branche garde le préfixe commun"
+    print("Snapshot : les branches sont indépendantes")
+
+
+def test_snapshot_keeps_its_own_initial_config():
+    simulator = make_simulator()
+    simulator.run(300)
+    snapshot = simulator.snapshot()
+    simulator.initial_pump_config["basal_rates"][0] = 9.9
+    simulator.initial_pump_config["personalized_modes"].clear()
+    branch = simulator.fork(snapshot)
+
+    assert snapshot.initial_pump_config["basal_rates"][0] != 9.9, "Le snapshot ne devrait pas suivre le simulateur d'origine"
+    assert branch.initial_pump_config == make_simulator().initial_pump_config, "La branche devrait repartir de la configuration initiale"
+    print("Snapshot : la configuration initiale est copiée au moment du snapshot")
+
+
+def test_snapshot_serialization():
+    simulator = make_simulator()
+    simulator.run(500)
+    snapshot = simulator.snapshot()
+    data = snapshot.to_bytes()
+    restored = Simulator.from_snapshot(SimulationSnapshot.from_bytes(data))
+    restored.run(300)
+    simulator.run(300)
+
+    assert len(data) < 4096, "Le snapshot devrait rester compact"
+    assert SimulationSnapshot.from_bytes(data).to_bytes() == data, "Le snapshot devrait être sérialisable"
+    assert restored.log.glucose.tolist() == simulator.log.glucose[500:].tolist(), "La reprise devrait continuer la simulation à l'identique"
+    print("Snapshot : sérialisé puis repris sans le simulateur d'origine")
+
+
+def test_skipped_meal_is_kept_and_validated():
+    simulator = Simulator(13)
+    simulator.skip_meal(360)
+    simulator.schedule_meal(720, 20)
+    simulator.skip_meal(720)
+    simulator.run(400)
+    branch = Simulator.from_snapshot(simulator.snapshot())
+    branch.run(380)
+    with pytest.raises(ValueError):
+        Simulator(3).skip_meal(30)
+    with pytest.raises(ValueError):
+        Simulator(3, meal_interval=None).skip_meal(360)
+
+    assert not any(simulator.log.meal), "Le repas automatique annulé ne devrait produire aucun bolus"
+    meals = branch.log.meal[branch.log.time == 720]
+    assert meals.tolist() == [2.0], "Le repas planifié à la minute d'un repas annulé devrait être conservé"
+    assert (branch.log.meal >= 0).all(), "Aucun bolus négatif ne devrait être administré"
+    print("Snapshot : les repas annulés sont conservés, et seuls les repas automatiques peuvent l'être")
@@ -0,0 +1,43 @@
+from insulin_pump_simulator.config import PumpConfig, BasalSchedule
+from insulin_pump_simulator.controller import ClosedLoopController
+from insulin_pump_simulator.insulin_pump import InsulinPump
+from insulin_pump_simulator.patient import Patient
+from insulin_pump_simulator.pdm import PDM
+from benchmarks.bench_memory import bytes_per_instance
+import pickle
+import pytest
+
+
+def test_state_objects_have_no_instance_dict():
+    for instance in (Patient(), InsulinPump(), PumpConfig()):
+        assert not hasattr(instance, "__dict__"), f"{type(instance).__name__} ne devrait pas avoir de __dict__"
+        with pytest.raises(AttributeError):
+            instance.unknown_attribute = 1
+    assert isinstance(PumpConfig().basal_rates, BasalSchedule), "Les taux basaux devraient être un tableau de doubles"
+    print("État compact : Patient, InsulinPump et PumpConfig utilisent __slots__")
+
+
+def test_basal_schedules_are_isolated():
+    first, second = InsulinPump(), InsulinPump()
+    controller = ClosedLoopController(target_glucose=120, pump=first)
+    controller.adjust_basal_rate(240)
+    PDM(120, pump=first).activate_mode("Sport")
+    rates = [0.9] * 24
+    config = PumpConfig(basal_rates=rates)
+    config.basal_rates[0] = 2.0
+
+    assert second.config.basal_rates == PumpConfig().basal_rates, "Le planning basal d'une autre pompe ne doit pas changer"
+    assert second.config.modes["Sport"]["basal_rate_adjustment"] == 0.8, "Les modes d'une autre pompe ne doivent pas changer"
+    assert first.config.basal_rates == [round(0.97 * 0.8, 2)] * 24, "L'ajustement et le mode Sport s'appliquent à la pompe pilotée"
+    assert rates == [0.9] * 24, "La liste fournie par l'appelant ne doit pas être modifiée"
+    assert pickle.loads(pickle.dumps(config)).basal_rates == config.basal_rates, "La configuration devrait rester sérialisable"
+    print("État compact : chaque pompe a son propre planning basal")
+
+
+def test_memory_per_pump():
+    pump = bytes_per_instance(InsulinPump, 2_000)
+    patient = bytes_per_instance(Patient, 2_000)
+
+    assert pump < 700, f"Une pompe occupe {pump:.0f} octets"
+    assert patient < 150, f"Un patient occupe {patient:.0f} octets"
+    print(f"État compact : {pump:.0f} octets par pompe, {patient:.0f} octets par patient")
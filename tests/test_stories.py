@@ -4,9 +4,10 @@ from insulin_pump_simulator.cgm import CGM
 from insulin_pump_simulator.controller import ClosedLoopController
 from insulin_pump_simulator.patient import Patient
 from insulin_pump_simulator.insulin_pump import InsulinPump
+from insulin_pump_simulator.registry import DEFAULT_CONFIG_PATH
 import json
 
-with open('data/sample_input_data.json', 'r') as file:
+with open(DEFAULT_CONFIG_PATH, 'r') as file:
     data = json.load(file)
     config = data['pump_configuration']
 
@@ -0,0 +1,35 @@
+from insulin_pump_simulator.sweep import parameter_grid, build_config, run_sweep
+import pytest
+
+
+def test_parameter_grid_order():
+    grid = parameter_grid({"insulin_to_carb_ratio": [8, 10], "max_bolus": [5, 10, 15]})
+
+    assert len(grid) == 6, "La grille devrait contenir 6 configurations"
+    assert grid[0] == {"insulin_to_carb_ratio": 8, "max_bolus": 5}, "La première configuration est incorrecte"
+    assert grid[-1] == {"insulin_to_carb_ratio": 10, "max_bolus": 15}, "La dernière configuration est incorrecte"
+    print("Balayage : la grille de paramètres est ordonnée de façon déterministe")
+
+
+def test_build_config_with_mode_multiplier():
+    config = build_config({"basal_rates": [1.0] * 24, "modes.Sport": 0.5, "active_mode": "Sport"})
+
+    assert config.active_mode == "Sport", "Le mode actif devrait être 'Sport'"
+    assert config.basal_rates == [0.5] * 24, "Le multiplicateur du mode n'a pas été appliqué"
+    assert build_config({}).modes["Sport"]["basal_rate_adjustment"] == 0.8, "Les modes par défaut ne doivent pas être modifiés"
+    with pytest.raises(ValueError):
+        build_config({"unknown": 1})
+    print("Balayage : les multiplicateurs de modes sont appliqués")
+
+
+def test_run_sweep_is_deterministic_across_workers():
+    grid = {"insulin_sensitivity_factor": [25, 40], "insulin_to_carb_ratio": [8, 12]}
+
+    serial = run_sweep(grid, duration=2, max_workers=1, seed=7)
+    parallel = run_sweep(grid, duration=2, max_workers=2, chunksize=1, seed=7)
+
+    assert [row["run"] for row in parallel] == [0, 1, 2, 3], "Les résultats doivent suivre l'ordre de la grille"
+    assert serial == parallel, "Les résultats doivent être identiques quel que soit le nombre de processus"
+    assert len({row["seed"] for row in serial}) == 4, "Chaque exécution doit avoir sa propre graine"
+    assert "time_in_range" in serial[0], "Les métriques de synthèse sont manquantes"
+    print("Balayage : les résultats sont déterministes et ordonnés")
@@ -0,0 +1,55 @@
+from insulin_pump_simulator.tracefile import TraceReader, TraceWriter, TRACE_DTYPE
+from insulin_pump_simulator.recorder import ALARM_HIGH_GLUCOSE
+from insulin_pump_simulator.simulator import Simulator
+from insulin_pump_simulator.patient import Patient
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pytest
+
+
+def window_mean(path, start, end):
+    return float(TraceReader(path).window(start, end)["glucose"].mean())
+
+
+def test_simulator_trace_round_trip(tmp_path):
+    simulator = Simulator(6, patient=Patient(300, 35, 1.5))
+    simulator.run_simulation()
+    path = tmp_path / "run.trace"
+    simulator.export_trace(path)
+
+    reader = TraceReader(path)
+    assert len(reader) == 360, "Une ligne par minute simulée est attendue"
+    assert reader.metadata["patient"]["initial_glucose"] == 300, "Les paramètres du patient sont absents de l'en-tête"
+    assert reader.metadata["pump_config"]["basal_rates"][0] == 0.8, "La configuration initiale de la pompe est absente de l'en-tête"
+    assert reader.column("glucose").tolist() == simulator.log.glucose.tolist(), "Les glycémies de la trace sont incorrectes"
+    assert reader.records["alarms"][0] == ALARM_HIGH_GLUCOSE, "L'alarme de glycémie élevée devrait être enregistrée"
+    assert reader.mode_name(int(reader.records["mode"][0])) == "Day", "Le mode actif est incorrect"
+    assert reader.records["bolus"].sum() == pytest.approx(simulator.log.correction.sum() + simulator.log.meal.sum()), "Les bolus sont incorrects"
+    print("Trace : la trace binaire reproduit la simulation")
+
+
+def test_window_and_concurrent_readers(tmp_path):
+    path = tmp_path / "long.trace"
+    times = np.arange(1, 100_001)
+    glucose = 100 + (times % 120)
+    with TraceWriter(path, {"patient": {}}) as writer:
+        for start in range(0, len(times), 10_000):
+            writer.append_columns(time=times[start:start + 10_000], glucose=glucose[start:start + 10_000])
+
+    window = TraceReader(path).window(50_000, 50_060)
+    assert isinstance(TraceReader(path).records, np.memmap), "La trace devrait être projetée en mémoire"
+    assert window["time"].tolist() == list(range(50_000, 50_060)), "La fenêtre temporelle est incorrecte"
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        means = list(executor.map(window_mean, [path] * 2, [0, 60_000], [1_000, 61_000]))
+    assert means == [float(glucose[:999].mean()), float(glucose[59_999:60_999].mean())], "Les lectures concurrentes sont incorrectes"
+    print("Trace : les fenêtres sont lues sans charger tout le fichier")
+
+
+def test_rejects_foreign_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a trace at all, just bytes")
+    with pytest.raises(ValueError):
+        TraceReader(path)
+    assert TRACE_DTYPE.itemsize == 30, "Un enregistrement devrait occuper 30 octets"
+    print("Trace : les fichiers étrangers sont refusés")
@@ -0,0 +1,90 @@
+import math
+import numpy as np
+from insulin_pump_simulator.tuning import ProfileTuner, evaluate_tuners, tune_patients, snap
+from insulin_pump_simulator.patient import Patient
+from insulin_pump_simulator.kinetics import Absorption
+
+
+def test_batch_matches_scalar_simulator():
+    tuner = ProfileTuner(Patient(150, 30, 2, insulin_absorption=Absorption(75), carb_absorption=Absorption(45)), duration=12)
+    candidates = [snap({"target_glucose": target, "gain": gain, "basal_scale": scale, "insulin_to_carb_ratio": ratio})
+                  for target, gain, scale, ratio in ((120, 1.0, 1.0, 10), (140, 0.5, 0.8, 15), (100, 1.5, 1.2, 12))]
+    results = tuner.evaluate(candidates)
+
+    for result in results:
+        simulator = tuner.simulator(result)
+        simulator.run_simulation()
+        summary = simulator.metrics.summary()
+        assert result["stopped_at"] is None, "Ces candidats ne devraient pas franchir la borne de sécurité"
+        assert result["time_in_range"] == summary["time_in_range"], "Le lot devrait donner le même temps dans la cible que le simulateur"
+        assert result["time_below_range"] == summary["time_below_range"], "Le lot devrait donner le même temps sous la cible que le simulateur"
+    print("Optimisation : l'évaluation par lot correspond au simulateur scalaire")
+
+
+def test_batch_starts_from_patient_state():
+    insulin, carbs = Absorption(75), Absorption(45)
+    insulin.depot, carbs.active = 3.0, 40.0
+    tuner = ProfileTuner(Patient(160, 30, 2, insulin_absorption=insulin, carb_absorption=carbs), duration=6)
+    result = tuner.evaluate([tuner.initial])[0]
+    simulator = tuner.simulator(result)
+    simulator.run_simulation()
+
+    assert result["time_in_range"] == simulator.metrics.summary()["time_in_range"], "Le lot devrait partir de l'insuline et des glucides en cours"
+    assert tuner.patient.insulin_on_board == 3.0, "Le patient optimisé ne doit pas être modifié"
+    assert tuner._key(tuner.initial) != ProfileTuner(Patient(160, 30, 2, insulin_absorption=Absorption(75), carb_absorption=Absorption(45)))._key(tuner.initial), \
+        "L'état d'absorption devrait faire partie de la clé du cache"
+    print("Optimisation : les lots partent de l'état d'absorption du patient")
+
+
+def test_unsafe_candidates_stop_early():
+    tuner = ProfileTuner(Patient(120, 30))
+    safe, unsafe = tuner.evaluate([snap({"target_glucose": 130, "gain": 0.5, "basal_scale": 1.0, "insulin_to_carb_ratio": 20}),
+                                   snap({"target_glucose": 90, "gain": 1.0, "basal_scale": 1.5, "insulin_to_carb_ratio": 5})])
+
+    assert safe["stopped_at"] is None and safe["minutes"] == 24 * 60, "Un candidat sûr devrait être simulé jusqu'au bout"
+    assert unsafe["stopped_at"] is not None and unsafe["minutes"] < 24 * 60, "Un candidat dangereux devrait être arrêté"
+    assert unsafe["score"] == -math.inf, "Un candidat arrêté ne doit jamais être retenu"
+    simulator = tuner.simulator(unsafe)
+    simulator.run_simulation()
+    glucose = simulator.log.glucose[:unsafe["stopped_at"]]
+    assert np.all(glucose[-15:] < 54) and not np.all(glucose[-16:] < 54), "L'arrêt devrait survenir après 15 minutes consécutives sous 54 mg/dL"
+    print("Optimisation : les candidats dangereux sont arrêtés dès la borne de sécurité franchie")
+
+
+def test_cache_avoids_resimulation():
+    tuner = ProfileTuner(Patient(130, 30), duration=6)
+    candidates = tuner.propose(16)
+    first = tuner.evaluate(candidates)
+    evaluations = tuner.evaluations
+    second = tuner.evaluate(candidates + candidates[:4])
+
+    assert evaluations == len({tuple(candidate.values()) for candidate in candidates}), "Chaque candidat distinct devrait être simulé une fois"
+    assert tuner.evaluations == evaluations, "Les candidats déjà évalués devraient venir du cache"
+    assert second[:16] == first, "Le cache devrait rendre les mêmes résultats"
+    print("Optimisation : les configurations déjà évaluées ne sont pas resimulées")
+
+
+def test_shared_cache_keeps_each_tuner_settings():
+    cache = {}
+    short = ProfileTuner(Patient(130, 30), duration=2, cache=cache)
+    long = ProfileTuner(Patient(130, 30), duration=6, safety_minutes=30, cache=cache)
+    candidate = snap({"target_glucose": 120, "gain": 1.0, "basal_scale": 1.0, "insulin_to_carb_ratio": 10})
+    first, second = evaluate_tuners([short, long], [[candidate], [candidate]])
+
+    assert first[0]["minutes"] == 2 * 60 and second[0]["minutes"] == 6 * 60, "Chaque candidat devrait être simulé avec la durée de son optimiseur"
+    assert long.evaluate([candidate])[0] == second[0] and long.evaluations == 1, "Le cache partagé devrait rendre le résultat de chaque optimiseur"
+    print("Optimisation : un cache partagé garde les réglages de chaque optimiseur")
+
+
+def test_tuning_improves_on_current_settings():
+    patients = [Patient(120, 30), Patient(160, 40, 2, insulin_absorption=Absorption(75), carb_absorption=Absorption(45))]
+    tuners = tune_patients(patients, iterations=4, batch_size=24, duration=12, seed=3)
+    again = tune_patients(patients, iterations=4, batch_size=24, duration=12, seed=3)
+
+    for tuner, other in zip(tuners, again):
+        initial = tuner.evaluate([tuner.initial])[0]
+        assert tuner.best["score"] >= initial["score"], "Le meilleur candidat devrait faire au moins aussi bien que les réglages actuels"
+        assert tuner.best["time_below_54"] == 0, "Le meilleur candidat ne devrait pas passer de temps sous 54 mg/dL"
+        assert tuner.best == other.best, "L'optimisation devrait être reproductible avec la même graine"
+        tuner.configuration().validate()
+    print("Optimisation : les réglages trouvés améliorent le score des réglages actuels")